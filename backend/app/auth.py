@@ -6,13 +6,13 @@ from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 import os
 from dotenv import load_dotenv
 
-from .database import get_db
+from .database import get_db, SessionLocal
 from .models import User
 from .schemas import TokenData
 
@@ -101,4 +101,30 @@ async def get_current_teacher(current_user: User = Depends(get_current_active_us
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Teacher access required"
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+async def get_current_stream_user(request: Request, token: Optional[str] = None) -> User:
+    """Authenticate a long-lived stream without holding a database session open"""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    
+    # EventSource cannot set headers, so the token may also come as ?token=
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not token:
+        raise credentials_exception
+    
+    token_data = verify_token(token, credentials_exception)
+    db = SessionLocal()
+    try:
+        user = get_user_by_username(db, username=token_data.username)
+        if user is None or not user.is_active:
+            raise credentials_exception
+        db.expunge(user)
+    finally:
+        db.close()
+    return user
\ No newline at end of file
@@ -2,11 +2,18 @@
 Database configuration and connection management
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, Float, ForeignKey, Text
+from sqlalchemy import create_engine, inspect, Column, Integer, String, Boolean, DateTime, Float, ForeignKey, Text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session, relationship
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.sql import func
+from sqlalchemy.exc import IntegrityError, OperationalError
+from alembic import command
+from alembic.config import Config
+from typing import Callable, TypeVar
 import os
+import random
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -21,6 +28,16 @@ else:
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+MAX_WRITE_ATTEMPTS = 3
+
+MIGRATIONS_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+BASELINE_REVISION = "0001"  # The schema create_all built before migrations existed
+
+T = TypeVar("T")
+
+class WriteConflictError(Exception):
+    """A write kept colliding with concurrent writers and was given up"""
+
 def get_db():
     """Dependency to get database session"""
     db = SessionLocal()
@@ -30,5 +47,44 @@ def get_db():
         db.close()
 
 def create_db_and_tables():
-    """Create database tables"""
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    """Create the schema on a new database, or bring an existing one up to date with the migrations"""
+    from . import models  # noqa: F401  Registers every table on Base.metadata
+    
+    config = Config(MIGRATIONS_CONFIG)
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        tables = inspect(connection).get_table_names()
+        if "users" not in tables:
+            Base.metadata.create_all(bind=connection)
+            command.stamp(config, "head")
+            return
+        if "alembic_version" not in tables:
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, "head")
+
+def upsert_insert(db: Session, table):
+    """INSERT construct with ON CONFLICT support for the bound database"""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+def commit_with_retry(db: Session, operation: Callable[[], T], attempts: int = MAX_WRITE_ATTEMPTS) -> T:
+    """Run operation and commit, re-running it from scratch if a concurrent write conflicts.
+    
+    Conflicts are unique-key races (IntegrityError) and lock or serialization
+    failures (OperationalError). Any other exception rolls back and propagates.
+    """
+    for attempt in range(attempts):
+        try:
+            result = operation()
+            db.commit()
+            return result
+        except (IntegrityError, OperationalError):
+            db.rollback()
+            if attempt == attempts - 1:
+                raise WriteConflictError("Too many concurrent updates, please try again")
+            # Short jittered backoff before re-reading state
+            time.sleep(random.uniform(0.005, 0.02) * (attempt + 1))
+        except Exception:
+            db.rollback()
+            raise
\ No newline at end of file
@@ -2,10 +2,15 @@
 Database models for OpenBanqr
 """
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey, Text, Table
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey, Text, Table, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
+import secrets
+
+def new_seed() -> int:
+    """Random simulation seed that fits a signed 32-bit column"""
+    return secrets.randbits(31)
 
 # Association table for classroom membership
 classroom_members = Table(
@@ -42,11 +47,37 @@ class Classroom(Base):
     invite_code = Column(String, unique=True, index=True)
     teacher_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     is_active = Column(Boolean, default=True)
+    simulation_seed = Column(Integer, default=new_seed)  # Reuse to replay the classroom's weeks exactly
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
     teacher = relationship("User", back_populates="owned_classrooms")
     students = relationship("User", secondary=classroom_members, back_populates="classrooms")
+    leaderboard_entries = relationship("LeaderboardEntry", back_populates="classroom", cascade="all, delete-orphan")
+    events = relationship("FinancialEvent", back_populates="classroom", cascade="all, delete-orphan")
+
+class LeaderboardEntry(Base):
+    __tablename__ = "leaderboard_entries"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    classroom_id = Column(Integer, ForeignKey("classrooms.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    
+    # Denormalized ranking metrics, refreshed when prices tick or a week is simulated
+    net_worth = Column(Float, default=0.0, nullable=False)
+    portfolio_return = Column(Float, default=0.0, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    # Relationships
+    classroom = relationship("Classroom", back_populates="leaderboard_entries")
+    user = relationship("User")
+    
+    __table_args__ = (
+        UniqueConstraint("classroom_id", "user_id", name="uq_leaderboard_entries_classroom_user"),
+        Index("ix_leaderboard_entries_classroom_net_worth", "classroom_id", "net_worth"),
+        Index("ix_leaderboard_entries_classroom_return", "classroom_id", "portfolio_return"),
+        Index("ix_leaderboard_entries_user", "user_id"),
+    )
 
 class Career(Base):
     __tablename__ = "careers"
@@ -117,8 +148,73 @@ class Stock(Base):
     dividend_yield = Column(Float, default=0.0)
     last_updated = Column(DateTime(timezone=True), server_default=func.now())
     
+    # Market simulation parameters (daily)
+    drift = Column(Float, default=0.001)  # Mean daily return
+    volatility = Column(Float, default=0.02)  # Standard deviation of daily return
+    
     # Relationships
     holdings = relationship("StockHolding", back_populates="stock")
+    price_history = relationship("StockPriceHistory", back_populates="stock")
+    price_bars = relationship("StockPriceBar", back_populates="stock")
+
+class StockPriceHistory(Base):
+    __tablename__ = "stock_price_history"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    stock_id = Column(Integer, ForeignKey("stocks.id"), nullable=False)
+    price = Column(Float, nullable=False)  # Closing price for the trading day
+    timestamp = Column(DateTime(timezone=True), nullable=False)
+    
+    # Relationships
+    stock = relationship("Stock", back_populates="price_history")
+    
+    __table_args__ = (
+        Index("ix_stock_price_history_stock_timestamp", "stock_id", "timestamp"),
+    )
+
+class StockPriceBar(Base):
+    __tablename__ = "stock_price_bars"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    stock_id = Column(Integer, ForeignKey("stocks.id"), nullable=False)
+    interval = Column(String, nullable=False)  # day, week
+    period_start = Column(DateTime(timezone=True), nullable=False)
+    
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    
+    # Relationships
+    stock = relationship("Stock", back_populates="price_bars")
+    
+    __table_args__ = (
+        UniqueConstraint("stock_id", "interval", "period_start", name="uq_stock_price_bars_period"),
+    )
+
+class MarketState(Base):
+    __tablename__ = "market_state"
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)  # Bumped on every price update
+    seed = Column(Integer, default=new_seed)  # Seeds every stock's price stream
+    market_day = Column(Integer, default=0)  # Trading days simulated so far; the price stream counter
+    market_date = Column(DateTime(timezone=True))  # Market time of the latest simulated trading day
+    last_tick_at = Column(DateTime(timezone=True))
+    dividends_settled_at = Column(DateTime(timezone=True))  # Market time up to which dividends have been paid
+    replay_position = Column(Integer, default=0)  # Next trading-day ordinal in the replay dataset
+    
+    # Lease held by the worker currently updating prices
+    tick_lock_owner = Column(String)
+    tick_lock_expires_at = Column(DateTime(timezone=True))
+    
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+    
+    name = Column(String, primary_key=True)  # A cache key, such as summary:<user_id>
+    version = Column(Integer, nullable=False, default=0)  # Bumped in the transaction that changes what the key covers
 
 class Portfolio(Base):
     __tablename__ = "portfolios"
@@ -126,16 +222,39 @@ class Portfolio(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     name = Column(String, default="My Portfolio")
-    total_value = Column(Float, default=0.0)
+    total_value = Column(Float, default=0.0)  # cash_balance + market_value
     total_invested = Column(Float, default=0.0)
     cash_balance = Column(Float, default=1000.0)  # Starting cash
     
+    # Maintained incrementally on every trade and price tick
+    market_value = Column(Float, default=0.0)  # Sum of holding values
+    cost_basis = Column(Float, default=0.0)  # Sum of shares * average price
+    
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Relationships
     user = relationship("User", back_populates="portfolios")
     holdings = relationship("StockHolding", back_populates="portfolio")
+    
+    @property
+    def unrealized_pnl(self) -> float:
+        return (self.market_value or 0.0) - (self.cost_basis or 0.0)
+
+class PortfolioSnapshot(Base):
+    __tablename__ = "portfolio_snapshots"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    portfolio_id = Column(Integer, ForeignKey("portfolios.id"), nullable=False)
+    timestamp = Column(DateTime(timezone=True), nullable=False)
+    
+    total_value = Column(Float, nullable=False)
+    market_value = Column(Float, default=0.0)
+    cash_balance = Column(Float, default=0.0)
+    
+    __table_args__ = (
+        Index("ix_portfolio_snapshots_portfolio_timestamp", "portfolio_id", "timestamp"),
+    )
 
 class StockHolding(Base):
     __tablename__ = "stock_holdings"
@@ -154,6 +273,10 @@ class StockHolding(Base):
     # Relationships
     portfolio = relationship("Portfolio", back_populates="holdings")
     stock = relationship("Stock", back_populates="holdings")
+    
+    __table_args__ = (
+        UniqueConstraint("portfolio_id", "stock_id", name="uq_stock_holdings_portfolio_stock"),
+    )
 
 class Transaction(Base):
     __tablename__ = "transactions"
@@ -172,7 +295,83 @@ class Transaction(Base):
     shares = Column(Float)
     price_per_share = Column(Float)
     
+    week_number = Column(Integer)  # Game week the row belongs to, for weekly simulation rows
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # Keyset pagination walks (user_id, created_at, id); filtered pages get the same order
+        Index("ix_transactions_user_created", "user_id", "created_at", "id"),
+        Index("ix_transactions_user_category_created", "user_id", "category", "created_at", "id"),
+        Index("ix_transactions_user_type_created", "user_id", "transaction_type", "created_at", "id"),
+    )
+
+class WeeklyStatement(Base):
+    __tablename__ = "weekly_statements"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    week_number = Column(Integer, nullable=False)
+    
+    # Category totals for the week, signed like transaction amounts
+    income = Column(Float, default=0.0, nullable=False)
+    tax = Column(Float, default=0.0, nullable=False)
+    housing = Column(Float, default=0.0, nullable=False)
+    expense = Column(Float, default=0.0, nullable=False)
+    debt = Column(Float, default=0.0, nullable=False)
+    investment = Column(Float, default=0.0, nullable=False)
+    other = Column(Float, default=0.0, nullable=False)  # Any category without its own column
+    transaction_count = Column(Integer, default=0, nullable=False)
+    
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        UniqueConstraint("user_id", "week_number", name="uq_weekly_statements_user_week"),
+    )
+
+class CategoryRollup(Base):
+    __tablename__ = "category_rollups"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    week_number = Column(Integer, nullable=False)  # Game week; ad-hoc rows count toward the week in progress
+    category = Column(String, nullable=False)  # Uncategorized rows are totalled under "other"
+    
+    total = Column(Float, default=0.0, nullable=False)  # Signed like transaction amounts
+    transaction_count = Column(Integer, default=0, nullable=False)
+    
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        UniqueConstraint("user_id", "week_number", "category", name="uq_category_rollups_user_week_category"),
+    )
+
+class Order(Base):
+    __tablename__ = "orders"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    portfolio_id = Column(Integer, ForeignKey("portfolios.id"), nullable=False)
+    stock_id = Column(Integer, ForeignKey("stocks.id"), nullable=False)
+    
+    side = Column(String, nullable=False)  # buy, sell
+    order_type = Column(String, nullable=False)  # limit, stop
+    shares = Column(Float, nullable=False)
+    trigger_price = Column(Float, nullable=False)
+    status = Column(String, default="open", nullable=False)  # open, filled, cancelled, rejected
+    
+    # Set when the order is filled or rejected
+    fill_price = Column(Float)
+    transaction_id = Column(Integer, ForeignKey("transactions.id"))
+    reject_reason = Column(String)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    closed_at = Column(DateTime(timezone=True))
+    
+    __table_args__ = (
+        # Range scans over open orders by trigger price, per stock and order kind
+        Index("ix_orders_open_trigger", "stock_id", "status", "side", "order_type", "trigger_price"),
+        Index("ix_orders_user_status", "user_id", "status"),
+    )
 
 class FinancialEvent(Base):
     __tablename__ = "financial_events"
@@ -185,5 +384,9 @@ class FinancialEvent(Base):
     amount_max = Column(Float, default=0.0)
     probability = Column(Float, default=0.1)  # Chance of happening each week
     is_active = Column(Boolean, default=True)
+    classroom_id = Column(Integer, ForeignKey("classrooms.id"), index=True)  # None for events every student can draw
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
     
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    # Relationships
+    classroom = relationship("Classroom", back_populates="events")
\ No newline at end of file
@@ -60,7 +60,8 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         portfolio = Portfolio(
             user_id=db_user.id,
             name="My Portfolio",
-            cash_balance=1000.0  # Starting cash
+            cash_balance=1000.0,  # Starting cash
+            total_value=1000.0
         )
         db.add(portfolio)
         
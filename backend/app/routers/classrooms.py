@@ -2,22 +2,30 @@
 Classroom management routes
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Literal
 import secrets
 import string
 
 from ..database import get_db
-from ..models import User, Classroom
+from ..models import User, Classroom, FinancialEvent, classroom_members
 from ..schemas import (
     Classroom as ClassroomSchema, 
     ClassroomCreate, 
     ClassroomUpdate,
     ClassroomWithMembers,
-    User as UserSchema
+    Leaderboard,
+    FinancialEvent as FinancialEventSchema,
+    FinancialEventCreate,
+    FinancialEventUpdate
 )
 from ..auth import get_current_active_user, get_current_teacher
+from ..services.leaderboard import add_entries, get_top, get_rank, count_entries
+from ..services.ledger import EXPORT_MEDIA_TYPES, classroom_ledger_query, stream_ledger
+
+MAX_LEADERBOARD_SIZE = 100
 
 router = APIRouter()
 
@@ -86,6 +94,44 @@ async def get_classroom(
     
     return classroom
 
+@router.get("/{classroom_id}/leaderboard", response_model=Leaderboard)
+async def get_leaderboard(
+    classroom_id: int,
+    metric: str = Query("net_worth", pattern="^(net_worth|portfolio_return)$"),
+    limit: int = Query(10, ge=1, le=MAX_LEADERBOARD_SIZE),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get the top students of a classroom and the caller's own rank"""
+    classroom = db.query(Classroom).filter(Classroom.id == classroom_id).first()
+    if not classroom:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Classroom not found"
+        )
+    
+    # Check access permissions without loading the member list
+    if current_user.is_teacher:
+        allowed = classroom.teacher_id == current_user.id
+    else:
+        allowed = db.query(classroom_members).filter(
+            classroom_members.c.classroom_id == classroom_id,
+            classroom_members.c.user_id == current_user.id
+        ).first() is not None
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied"
+        )
+    
+    return Leaderboard(
+        classroom_id=classroom_id,
+        metric=metric,
+        total=count_entries(db, classroom_id),
+        entries=get_top(db, classroom_id, metric, limit),
+        me=None if current_user.is_teacher else get_rank(db, classroom_id, current_user.id, metric)
+    )
+
 @router.post("/join/{invite_code}", response_model=ClassroomSchema)
 async def join_classroom(
     invite_code: str,
@@ -118,6 +164,8 @@ async def join_classroom(
         )
     
     classroom.students.append(current_user)
+    db.flush()
+    add_entries(db, classroom.id)
     db.commit()
     return classroom
 
@@ -168,4 +216,120 @@ async def delete_classroom(
     
     db.delete(classroom)
     db.commit()
-    return {"message": "Classroom deleted successfully"}
\ No newline at end of file
+    return {"message": "Classroom deleted successfully"}
+
+def get_owned_classroom(db: Session, classroom_id: int, teacher: User) -> Classroom:
+    """A classroom owned by the teacher, or a 404"""
+    classroom = db.query(Classroom).filter(
+        Classroom.id == classroom_id,
+        Classroom.teacher_id == teacher.id
+    ).first()
+    
+    if not classroom:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Classroom not found or access denied"
+        )
+    return classroom
+
+def get_deck_event(db: Session, classroom_id: int, event_id: int) -> FinancialEvent:
+    """An event from a classroom's own deck, or a 404"""
+    event = db.query(FinancialEvent).filter(
+        FinancialEvent.id == event_id,
+        FinancialEvent.classroom_id == classroom_id
+    ).first()
+    
+    if not event:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Event not found"
+        )
+    return event
+
+@router.get("/{classroom_id}/events", response_model=List[FinancialEventSchema])
+async def list_classroom_events(
+    classroom_id: int,
+    current_user: User = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """List a classroom's own event deck (teacher only)"""
+    get_owned_classroom(db, classroom_id, current_user)
+    return db.query(FinancialEvent).filter(
+        FinancialEvent.classroom_id == classroom_id
+    ).order_by(FinancialEvent.id).all()
+
+@router.post("/{classroom_id}/events", response_model=FinancialEventSchema)
+async def create_classroom_event(
+    classroom_id: int,
+    event_data: FinancialEventCreate,
+    current_user: User = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """Add an event that only this classroom's students can draw (teacher only)"""
+    get_owned_classroom(db, classroom_id, current_user)
+    if event_data.amount_min > event_data.amount_max:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="amount_min cannot exceed amount_max"
+        )
+    
+    event = FinancialEvent(classroom_id=classroom_id, **event_data.dict())
+    db.add(event)
+    db.commit()
+    db.refresh(event)
+    return event
+
+@router.put("/{classroom_id}/events/{event_id}", response_model=FinancialEventSchema)
+async def update_classroom_event(
+    classroom_id: int,
+    event_id: int,
+    event_update: FinancialEventUpdate,
+    current_user: User = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """Update an event in a classroom's deck (teacher only)"""
+    get_owned_classroom(db, classroom_id, current_user)
+    event = get_deck_event(db, classroom_id, event_id)
+    
+    for field, value in event_update.dict(exclude_unset=True).items():
+        setattr(event, field, value)
+    
+    if event.amount_min > event.amount_max:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="amount_min cannot exceed amount_max"
+        )
+    
+    db.commit()
+    db.refresh(event)
+    return event
+
+@router.delete("/{classroom_id}/events/{event_id}")
+async def delete_classroom_event(
+    classroom_id: int,
+    event_id: int,
+    current_user: User = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """Remove an event from a classroom's deck (teacher only)"""
+    get_owned_classroom(db, classroom_id, current_user)
+    db.delete(get_deck_event(db, classroom_id, event_id))
+    db.commit()
+    return {"message": "Event deleted successfully"}
+
+@router.get("/{classroom_id}/transactions/export")
+async def export_classroom_transactions(
+    classroom_id: int,
+    format: Literal["csv", "ndjson"] = "csv",
+    current_user: User = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """Stream every student's transaction history as CSV or NDJSON (teacher only)"""
+    get_owned_classroom(db, classroom_id, current_user)
+    return StreamingResponse(
+        stream_ledger(classroom_ledger_query(classroom_id), format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="classroom-{classroom_id}-transactions.{format}"'
+        }
+    )
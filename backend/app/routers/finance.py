@@ -2,43 +2,45 @@
 Financial simulation and management routes
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
-import random
+from typing import List, Literal, Optional
+import asyncio
+import time
 
-from ..database import get_db
-from ..models import User, FinancialProfile, Career, Transaction, FinancialEvent
+from ..database import get_db, commit_with_retry, WriteConflictError
+from ..models import User, FinancialProfile, Career, Transaction, Classroom, CategoryRollup, classroom_members
 from ..schemas import (
     FinancialProfile as FinancialProfileSchema,
-    FinancialProfileCreate,
     FinancialProfileUpdate,
     WeeklySimulation,
+    ClassroomWeekSimulation,
+    FastForwardSimulation,
+    Projection,
+    Budget,
     Transaction as TransactionSchema,
     TransactionCreate
 )
-from ..auth import get_current_active_user
+from ..auth import get_current_active_user, get_current_teacher
+from ..services.leaderboard import refresh_entries
+from ..services.ledger import (
+    MAX_PAGE_SIZE, EXPORT_MEDIA_TYPES, page_transactions, stream_ledger, user_ledger_query
+)
+from ..services.projection import projection_state, get_projection
+from ..services.rollups import add_rows, stamp_weeks
+from ..services.events import deck_for_user, decks_for_users
+from ..services.rng import student_stream, student_streams
+from ..services.weekly import (
+    calculate_nz_tax, simulate_profiles_week, fast_forward_profile
+)
 
 router = APIRouter()
 
-def calculate_nz_tax(annual_income: float) -> float:
-    """Calculate New Zealand PAYE tax (simplified)"""
-    if annual_income <= 14000:
-        return annual_income * 0.105  # 10.5%
-    elif annual_income <= 48000:
-        return 1470 + (annual_income - 14000) * 0.175  # 17.5%
-    elif annual_income <= 70000:
-        return 7420 + (annual_income - 48000) * 0.30   # 30%
-    elif annual_income <= 180000:
-        return 14020 + (annual_income - 70000) * 0.33  # 33%
-    else:
-        return 50320 + (annual_income - 180000) * 0.39 # 39%
-
-def calculate_student_loan_payment(loan_balance: float, annual_income: float) -> float:
-    """Calculate student loan repayment (simplified NZ system)"""
-    if annual_income < 22828 or loan_balance <= 0:
-        return 0
-    return max(0, (annual_income - 22828) * 0.12)  # 12% of income over threshold
+MAX_FAST_FORWARD_WEEKS = 520  # Ten years
+MAX_PROJECTION_WEEKS = 1040  # Twenty years
+MAX_PROJECTION_PATHS = 20000
+MAX_BUDGET_WEEKS = 520
 
 @router.get("/profile", response_model=FinancialProfileSchema)
 async def get_financial_profile(
@@ -109,6 +111,8 @@ async def update_financial_profile(
             if career.requires_student_loan:
                 profile.student_loan_balance = career.student_loan_amount
     
+    db.flush()
+    refresh_entries(db, [current_user.id])
     db.commit()
     db.refresh(profile)
     return profile
@@ -135,122 +139,227 @@ async def simulate_week(
             detail="Financial profile not found"
         )
     
-    # Calculate weekly amounts
-    gross_income = profile.weekly_income
-    annual_tax = calculate_nz_tax(profile.current_salary)
-    tax_amount = annual_tax / 52
+    current_user_id = current_user.id
+    events, eligible = decks_for_users(db, [current_user_id])
+    streams = student_streams(db, [current_user_id])
     
-    # Student loan payment
-    annual_loan_payment = calculate_student_loan_payment(
-        profile.student_loan_balance, 
-        profile.current_salary
-    )
-    student_loan_payment = annual_loan_payment / 52
+    def apply_week():
+        # Profile is updated with in-SQL increments so concurrent weeks cannot lose updates
+        outcome = simulate_profiles_week(db, [profile], events, eligible, streams)
+        refresh_entries(db, [current_user_id])
+        return outcome
     
-    # Net income after tax and student loan
-    net_income = gross_income - tax_amount - student_loan_payment
+    try:
+        outcome = commit_with_retry(db, apply_week)
+    except WriteConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     
-    # Fixed expenses
-    housing_cost = profile.housing_weekly_cost
-    other_expenses = profile.weekly_expenses
+    week, result = outcome["week"], outcome["results"][0]
+    return WeeklySimulation(
+        gross_income=week.gross_income[0],
+        tax_amount=week.tax_amount[0],
+        net_income=week.net_income[0],
+        student_loan_payment=week.student_loan_payment[0],
+        housing_cost=week.housing_cost[0],
+        other_expenses=week.other_expenses[0],
+        remaining_amount=week.remaining_amount[0],
+        events=[event for event, occurred in zip(events.events, week.occurred[0]) if occurred],
+        new_savings_balance=result["new_savings_balance"],
+        new_student_loan_balance=result["new_student_loan_balance"]
+    )
+
+@router.post("/simulate-weeks", response_model=FastForwardSimulation)
+async def fast_forward_weeks(
+    weeks: int = Query(..., ge=1, le=MAX_FAST_FORWARD_WEEKS),
+    summary: bool = False,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Simulate several weeks in one step, optionally keeping weekly statements instead of transactions"""
+    started = time.perf_counter()
+    if current_user.is_teacher:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Teachers cannot simulate financial weeks"
+        )
     
-    # Random financial events
-    events = []
-    active_events = db.query(FinancialEvent).filter(FinancialEvent.is_active == True).all()
-    for event in active_events:
-        if random.random() < event.probability:
-            events.append(event)
+    current_user_id = current_user.id
     
-    # Calculate event impact
-    event_impact = 0
-    for event in events:
-        if event.event_type in ["bonus", "opportunity"]:
-            amount = random.uniform(event.amount_min, event.amount_max)
-            event_impact += amount
-        else:  # fine, emergency
-            amount = random.uniform(event.amount_min, event.amount_max)
-            event_impact -= amount
+    def apply_weeks():
+        profile = db.query(FinancialProfile).filter(
+            FinancialProfile.user_id == current_user_id
+        ).first()
+        if not profile:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Financial profile not found"
+            )
+        
+        outcome = fast_forward_profile(
+            db, profile, weeks,
+            events=deck_for_user(db, current_user_id),
+            stream=student_stream(db, current_user_id),
+            summary=summary
+        )
+        refresh_entries(db, [current_user_id])
+        return outcome
     
-    # Calculate remaining amount
-    remaining_amount = net_income - housing_cost - other_expenses + event_impact
+    try:
+        outcome = commit_with_retry(db, apply_weeks)
+    except WriteConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     
-    # Update profile
-    profile.weeks_played += 1
-    profile.total_tax_paid += tax_amount
-    profile.savings_balance += max(0, remaining_amount)  # Can't have negative savings
-    profile.student_loan_balance = max(0, profile.student_loan_balance - student_loan_payment)
+    return FastForwardSimulation(**outcome, elapsed_ms=round((time.perf_counter() - started) * 1000, 2))
+
+@router.get("/projection", response_model=Projection)
+async def project_finances(
+    weeks: int = Query(260, ge=1, le=MAX_PROJECTION_WEEKS),
+    paths: int = Query(2000, ge=100, le=MAX_PROJECTION_PATHS),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Project net worth and savings over many simulated futures"""
+    started = time.perf_counter()
+    if current_user.is_teacher:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Teachers don't have financial profiles"
+        )
     
-    db.commit()
+    profile = db.query(FinancialProfile).filter(
+        FinancialProfile.user_id == current_user.id
+    ).first()
     
-    # Create transaction records
-    transactions = [
-        Transaction(
-            user_id=current_user.id,
-            transaction_type="salary",
-            amount=gross_income,
-            description="Weekly salary",
-            category="income"
-        ),
-        Transaction(
-            user_id=current_user.id,
-            transaction_type="tax",
-            amount=-tax_amount,
-            description="PAYE tax",
-            category="tax"
-        ),
-        Transaction(
-            user_id=current_user.id,
-            transaction_type="housing",
-            amount=-housing_cost,
-            description="Housing cost",
-            category="housing"
-        ),
-        Transaction(
-            user_id=current_user.id,
-            transaction_type="expense",
-            amount=-other_expenses,
-            description="Other expenses",
-            category="expense"
+    if not profile:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Financial profile not found"
         )
-    ]
     
-    if student_loan_payment > 0:
-        transactions.append(Transaction(
-            user_id=current_user.id,
-            transaction_type="student_loan",
-            amount=-student_loan_payment,
-            description="Student loan payment",
-            category="debt"
-        ))
+    state = projection_state(db, profile)
+    # Simulation is CPU-bound; keep it off the event loop
+    projection = await asyncio.to_thread(get_projection, state, weeks, paths)
+    return Projection(**projection, elapsed_ms=round((time.perf_counter() - started) * 1000, 2))
+
+@router.post("/classrooms/{classroom_id}/simulate-week", response_model=ClassroomWeekSimulation)
+async def simulate_classroom_week(
+    classroom_id: int,
+    current_user: User = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """Simulate one week for every student in a classroom at once (teacher only)"""
+    started = time.perf_counter()
+    classroom = db.query(Classroom).filter(
+        Classroom.id == classroom_id,
+        Classroom.teacher_id == current_user.id
+    ).first()
+    
+    if not classroom:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Classroom not found or access denied"
+        )
     
-    for transaction in transactions:
-        db.add(transaction)
+    def apply_classroom_week():
+        # All student profiles in one query
+        profiles = db.query(FinancialProfile).join(
+            classroom_members, classroom_members.c.user_id == FinancialProfile.user_id
+        ).join(
+            User, User.id == FinancialProfile.user_id
+        ).filter(
+            classroom_members.c.classroom_id == classroom_id,
+            User.is_teacher == False
+        ).order_by(FinancialProfile.id).all()
+        
+        if not profiles:
+            return {"transactions_created": 0, "results": []}
+        
+        # Each student draws from their own deck and stream, exactly as when simulated alone
+        user_ids = [profile.user_id for profile in profiles]
+        events, eligible = decks_for_users(db, user_ids)
+        outcome = simulate_profiles_week(db, profiles, events, eligible, student_streams(db, user_ids))
+        refresh_entries(db, user_ids)
+        return outcome
     
-    db.commit()
+    try:
+        outcome = commit_with_retry(db, apply_classroom_week)
+    except WriteConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     
-    return WeeklySimulation(
-        gross_income=gross_income,
-        tax_amount=tax_amount,
-        net_income=net_income,
-        student_loan_payment=student_loan_payment,
-        housing_cost=housing_cost,
-        other_expenses=other_expenses,
-        remaining_amount=remaining_amount,
-        events=events,
-        new_savings_balance=profile.savings_balance,
-        new_student_loan_balance=profile.student_loan_balance
+    return ClassroomWeekSimulation(
+        classroom_id=classroom_id,
+        students_simulated=len(outcome["results"]),
+        transactions_created=outcome["transactions_created"],
+        results=outcome["results"],
+        elapsed_ms=round((time.perf_counter() - started) * 1000, 2)
     )
 
+@router.get("/budget", response_model=Budget)
+async def get_budget(
+    weeks: int = Query(12, ge=1, le=MAX_BUDGET_WEEKS),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Category totals for each of the last few game weeks, read from the rollups"""
+    if current_user.is_teacher:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Teachers don't have financial profiles"
+        )
+    
+    weeks_played = db.query(FinancialProfile.weeks_played).filter(
+        FinancialProfile.user_id == current_user.id
+    ).scalar() or 0
+    
+    # The week in progress collects trades and manual entries until it is simulated
+    last_week = weeks_played + 1
+    first_week = max(1, last_week - weeks + 1)
+    rollups = db.query(CategoryRollup).filter(
+        CategoryRollup.user_id == current_user.id,
+        CategoryRollup.week_number.between(first_week, last_week)
+    ).order_by(CategoryRollup.week_number, CategoryRollup.category).all()
+    
+    category_totals = {}
+    for rollup in rollups:
+        category_totals[rollup.category] = category_totals.get(rollup.category, 0.0) + rollup.total
+    return Budget(first_week=first_week, last_week=last_week, rollups=rollups, category_totals=category_totals)
+
 @router.get("/transactions", response_model=List[TransactionSchema])
 async def get_transactions(
-    limit: int = 50,
+    response: Response,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    category: Optional[str] = None,
+    transaction_type: Optional[str] = None,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Get user's transaction history"""
-    return db.query(Transaction).filter(
-        Transaction.user_id == current_user.id
-    ).order_by(Transaction.created_at.desc()).limit(limit).all()
+    """Get user's transaction history, one page at a time; the next page's cursor is in X-Next-Cursor.
+    
+    Compacted weeks appear as one line per weekly statement category.
+    """
+    try:
+        transactions, next_cursor = page_transactions(
+            db, current_user.id, limit, cursor, category, transaction_type
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return transactions
+
+@router.get("/transactions/export")
+async def export_transactions(
+    format: Literal["csv", "ndjson"] = "csv",
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream the user's whole transaction history as CSV or NDJSON"""
+    return StreamingResponse(
+        stream_ledger(user_ledger_query(current_user.id), format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="transactions-{current_user.id}.{format}"'}
+    )
 
 @router.post("/transactions", response_model=TransactionSchema)
 async def create_transaction(
@@ -259,12 +368,11 @@ async def create_transaction(
     db: Session = Depends(get_db)
 ):
     """Create a manual transaction"""
-    transaction = Transaction(
-        user_id=current_user.id,
-        **transaction_data.dict()
-    )
+    row = stamp_weeks(db, [{"user_id": current_user.id, **transaction_data.dict()}])[0]
+    transaction = Transaction(**row)
     
     db.add(transaction)
+    add_rows(db, [row])
     db.commit()
     db.refresh(transaction)
     return transaction
\ No newline at end of file
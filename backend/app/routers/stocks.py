@@ -2,91 +2,282 @@
 Stock market simulation routes
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
-import random
-from datetime import datetime
+from typing import List, Optional
+from datetime import datetime, date
+import asyncio
 
-from ..database import get_db
-from ..models import User, Stock, Portfolio, StockHolding, Transaction
+from ..database import get_db, commit_with_retry, WriteConflictError
+from ..models import User, Stock, Portfolio, Order, MarketState
 from ..schemas import (
     Stock as StockSchema,
-    Portfolio as PortfolioSchema,
+    StockPriceHistory as StockPriceHistorySchema,
     PortfolioWithHoldings,
+    PortfolioAnalytics,
+    ReconciliationReport,
     StockTransactionCreate,
+    StockOrder,
+    OrderBatch,
+    OrderCreate,
+    Order as OrderSchema,
     Transaction as TransactionSchema
 )
-from ..auth import get_current_active_user
+from ..auth import get_current_active_user, get_current_teacher, get_current_stream_user
+from ..services.market import reconcile_portfolios, ensure_market_state
+from ..services.analytics import get_portfolio_analytics
+from ..services.leaderboard import refresh_entries
+from ..services.replay import (
+    replay_enabled, get_dataset, seek_replay, replay_status, ReplayError
+)
+from ..services.market_clock import market_clock
+from ..services.trading import execute_orders, TradeError
+from ..services.price_history import get_price_bars
+from ..services.quotes import etag_matches, get_snapshot
+from ..services.broadcast import price_broadcaster, format_event
 
 router = APIRouter()
 
-def simulate_stock_price_change(current_price: float) -> tuple[float, float, float]:
-    """Simulate daily stock price change"""
-    # Random walk with slight upward bias (realistic market simulation)
-    change_percent = random.gauss(0.001, 0.02)  # Mean 0.1% daily growth, 2% volatility
-    change_percent = max(-0.15, min(0.15, change_percent))  # Cap at ±15%
-    
-    new_price = current_price * (1 + change_percent)
-    change_amount = new_price - current_price
-    
-    return new_price, change_amount, change_percent * 100
+MAX_SIMULATION_DAYS = 2520  # Ten years of trading days
+MAX_HISTORY_POINTS = 5000
+STREAM_KEEPALIVE_SECONDS = 15
+
+def quote_response(request: Request, etag: str, body: bytes) -> Response:
+    """Serve pre-serialized quotes, or 304 if the client already has this version"""
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 @router.get("/", response_model=List[StockSchema])
 async def list_stocks(
+    request: Request,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """List all available stocks"""
-    return db.query(Stock).all()
+    snapshot = get_snapshot(db)
+    return quote_response(request, snapshot.etag, snapshot.body)
+
+@router.get("/stream")
+async def stream_prices(current_user: User = Depends(get_current_stream_user)):
+    """Stream price deltas after every market tick as server-sent events"""
+    async def events():
+        queue = price_broadcaster.subscribe()
+        try:
+            yield format_event("hello", "{}")
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    message = ": keepalive\n\n"
+                yield message
+        finally:
+            price_broadcaster.unsubscribe(queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/orders", response_model=OrderSchema)
+async def place_order(
+    order_data: OrderCreate,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Place a resting limit or stop order, filled by the market clock when triggered"""
+    if current_user.is_teacher:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Teachers cannot trade stocks"
+        )
+    
+    portfolio = db.query(Portfolio).filter(
+        Portfolio.user_id == current_user.id
+    ).first()
+    
+    if not portfolio:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Portfolio not found"
+        )
+    
+    if not db.query(Stock.id).filter(Stock.id == order_data.stock_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Stock not found"
+        )
+    
+    order = Order(
+        user_id=current_user.id,
+        portfolio_id=portfolio.id,
+        **order_data.dict()
+    )
+    db.add(order)
+    db.commit()
+    db.refresh(order)
+    return order
+
+@router.get("/orders", response_model=List[OrderSchema])
+async def list_orders(
+    order_status: Optional[str] = Query("open", alias="status"),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """List the user's resting orders (all statuses when status is empty)"""
+    query = db.query(Order).filter(Order.user_id == current_user.id)
+    if order_status:
+        query = query.filter(Order.status == order_status)
+    return query.order_by(Order.created_at.desc()).all()
+
+@router.delete("/orders/{order_id}", response_model=OrderSchema)
+async def cancel_order(
+    order_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Cancel an open order"""
+    order = db.query(Order).filter(
+        Order.id == order_id,
+        Order.user_id == current_user.id
+    ).first()
+    
+    if not order:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Order not found"
+        )
+    
+    if order.status != "open":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Order is already {order.status}"
+        )
+    
+    order.status = "cancelled"
+    order.closed_at = datetime.utcnow()
+    db.commit()
+    db.refresh(order)
+    return order
+
+def replay_dataset_or_400():
+    """The replay dataset, or a 400 when replay mode is off or the files are unusable"""
+    if not replay_enabled():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Market replay mode is not enabled"
+        )
+    try:
+        return get_dataset()
+    except ReplayError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.get("/replay")
+async def get_replay_status(
+    current_user: User = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """Get the replay dataset range and cursor (teacher only)"""
+    dataset = replay_dataset_or_400()
+    position = db.query(MarketState.replay_position).filter(MarketState.id == 1).scalar() or 0
+    return replay_status(dataset, position)
+
+@router.post("/replay/seek")
+async def seek_market_replay(
+    to: date,
+    current_user: User = Depends(get_current_teacher),
+    db: Session = Depends(get_db)
+):
+    """Move the replay to the first trading day on or after a date (teacher only)"""
+    replay_dataset_or_400()
+    ensure_market_state(db)
+    try:
+        result = seek_replay(db, to)
+    except ReplayError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    db.commit()
+    return result
 
 @router.get("/{stock_id}", response_model=StockSchema)
 async def get_stock(
     stock_id: int,
+    request: Request,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Get stock details"""
+    snapshot = get_snapshot(db)
+    body = snapshot.stocks.get(stock_id)
+    if body is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Stock not found"
+        )
+    return quote_response(request, snapshot.etag, body)
+
+@router.get("/{stock_id}/history", response_model=StockPriceHistorySchema)
+async def get_stock_history(
+    stock_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: Optional[str] = Query(None, pattern="^(tick|day|week)$"),
+    max_points: int = Query(500, ge=1, le=MAX_HISTORY_POINTS),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get a downsampled OHLC price series for a stock"""
     stock = db.query(Stock).filter(Stock.id == stock_id).first()
     if not stock:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Stock not found"
         )
-    return stock
+    
+    resolution, bars = get_price_bars(db, stock_id, start, end, resolution, max_points)
+    return StockPriceHistorySchema(
+        stock_id=stock.id,
+        symbol=stock.symbol,
+        resolution=resolution,
+        bars=bars
+    )
 
 @router.post("/update-prices")
-async def update_stock_prices(
-    current_user: User = Depends(get_current_active_user),
+async def update_stock_prices(current_user: User = Depends(get_current_teacher)):
+    """Trigger a market tick now (teacher only); concurrent triggers share one tick"""
+    result = await market_clock.tick()
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Prices are already being updated"
+        )
+    return {"message": f"Updated {result['stocks_updated']} stock prices", **result}
+
+@router.post("/simulate-days")
+async def simulate_market_days(
+    days: int = Query(..., ge=1, le=MAX_SIMULATION_DAYS),
+    current_user: User = Depends(get_current_teacher)
+):
+    """Advance the market several trading days in one step (teacher only)"""
+    result = await market_clock.advance(days)
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Prices are already being updated"
+        )
+    return {"message": f"Simulated {result['days']} trading days", **result}
+
+@router.post("/portfolios/reconcile", response_model=ReconciliationReport)
+async def reconcile_portfolio_values(
+    fix: bool = False,
+    current_user: User = Depends(get_current_teacher),
     db: Session = Depends(get_db)
 ):
-    """Simulate daily stock price updates"""
-    stocks = db.query(Stock).all()
-    updated_stocks = []
-    
-    for stock in stocks:
-        new_price, change_amount, change_percent = simulate_stock_price_change(stock.current_price)
-        
-        stock.current_price = round(new_price, 2)
-        stock.daily_change = round(change_amount, 2)
-        stock.daily_change_percent = round(change_percent, 2)
-        stock.last_updated = datetime.utcnow()
-        
-        updated_stocks.append(stock)
-    
-    # Update all stock holdings values
-    holdings = db.query(StockHolding).all()
-    for holding in holdings:
-        holding.current_value = holding.shares * holding.stock.current_price
-    
-    # Update portfolio totals
-    portfolios = db.query(Portfolio).all()
-    for portfolio in portfolios:
-        total_stock_value = sum(holding.current_value for holding in portfolio.holdings)
-        portfolio.total_value = portfolio.cash_balance + total_stock_value
-    
+    """Check stored portfolio aggregates against holdings, repairing drift if fix=true (teacher only)"""
+    report = reconcile_portfolios(db, fix=fix)
     db.commit()
-    return {"message": f"Updated {len(updated_stocks)} stock prices"}
+    return report
 
 @router.get("/portfolio/me", response_model=PortfolioWithHoldings)
 async def get_my_portfolio(
@@ -109,28 +300,29 @@ async def get_my_portfolio(
         portfolio = Portfolio(
             user_id=current_user.id,
             name="My Portfolio",
-            cash_balance=1000.0
+            cash_balance=1000.0,
+            total_value=1000.0
         )
         db.add(portfolio)
+        db.flush()
+        refresh_entries(db, [current_user.id])
         db.commit()
         db.refresh(portfolio)
     
     return portfolio
 
-@router.post("/buy", response_model=TransactionSchema)
-async def buy_stock(
-    transaction_data: StockTransactionCreate,
+@router.get("/portfolio/me/analytics", response_model=PortfolioAnalytics)
+async def get_my_portfolio_analytics(
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Buy stocks"""
+    """Get performance analytics for the user's portfolio"""
     if current_user.is_teacher:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Teachers cannot trade stocks"
+            detail="Teachers don't have portfolios"
         )
     
-    # Get user's portfolio
     portfolio = db.query(Portfolio).filter(
         Portfolio.user_id == current_user.id
     ).first()
@@ -141,75 +333,54 @@ async def buy_stock(
             detail="Portfolio not found"
         )
     
-    # Get stock
-    stock = db.query(Stock).filter(Stock.id == transaction_data.stock_id).first()
-    if not stock:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Stock not found"
-        )
-    
-    # Calculate total cost
-    total_cost = transaction_data.shares * transaction_data.price_per_share
-    
-    # Check if user has enough cash
-    if portfolio.cash_balance < total_cost:
+    return get_portfolio_analytics(db, portfolio.id)
+
+def execute_for_user(db: Session, user: User, orders: List[StockOrder]) -> List[TransactionSchema]:
+    """Run orders against the user's portfolio and commit them as one transaction"""
+    if user.is_teacher:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Insufficient funds"
+            detail="Teachers cannot trade stocks"
         )
     
-    # Update portfolio cash
-    portfolio.cash_balance -= total_cost
-    portfolio.total_invested += total_cost
-    
-    # Find or create stock holding
-    holding = db.query(StockHolding).filter(
-        StockHolding.portfolio_id == portfolio.id,
-        StockHolding.stock_id == stock.id
+    # Get user's portfolio
+    portfolio = db.query(Portfolio).filter(
+        Portfolio.user_id == user.id
     ).first()
     
-    if holding:
-        # Update existing holding (average price calculation)
-        total_shares = holding.shares + transaction_data.shares
-        total_cost_basis = (holding.shares * holding.average_price) + total_cost
-        holding.average_price = total_cost_basis / total_shares
-        holding.shares = total_shares
-    else:
-        # Create new holding
-        holding = StockHolding(
-            portfolio_id=portfolio.id,
-            stock_id=stock.id,
-            shares=transaction_data.shares,
-            average_price=transaction_data.price_per_share
+    if not portfolio:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Portfolio not found"
         )
-        db.add(holding)
-    
-    # Update holding current value
-    holding.current_value = holding.shares * stock.current_price
     
-    # Update portfolio total value
-    total_stock_value = sum(h.current_value for h in portfolio.holdings) + holding.current_value
-    portfolio.total_value = portfolio.cash_balance + total_stock_value
-    
-    # Create transaction record
-    transaction = Transaction(
-        user_id=current_user.id,
-        portfolio_id=portfolio.id,
-        stock_id=stock.id,
-        transaction_type="buy",
-        amount=-total_cost,
+    def execute():
+        transactions = execute_orders(db, user.id, portfolio, orders)
+        refresh_entries(db, [user.id])
+        # Serialize before commit expires the freshly inserted rows
+        return [TransactionSchema.model_validate(transaction) for transaction in transactions]
+    
+    try:
+        return commit_with_retry(db, execute)
+    except TradeError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except WriteConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+@router.post("/buy", response_model=TransactionSchema)
+async def buy_stock(
+    transaction_data: StockTransactionCreate,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Buy stocks"""
+    order = StockOrder(
+        side="buy",
+        stock_id=transaction_data.stock_id,
         shares=transaction_data.shares,
-        price_per_share=transaction_data.price_per_share,
-        description=f"Bought {transaction_data.shares} shares of {stock.symbol}",
-        category="investment"
+        price_per_share=transaction_data.price_per_share
     )
-    
-    db.add(transaction)
-    db.commit()
-    db.refresh(transaction)
-    
-    return transaction
+    return execute_for_user(db, current_user, [order])[0]
 
 @router.post("/sell", response_model=TransactionSchema)
 async def sell_stock(
@@ -218,72 +389,19 @@ async def sell_stock(
     db: Session = Depends(get_db)
 ):
     """Sell stocks"""
-    if current_user.is_teacher:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Teachers cannot trade stocks"
-        )
-    
-    # Get user's portfolio
-    portfolio = db.query(Portfolio).filter(
-        Portfolio.user_id == current_user.id
-    ).first()
-    
-    if not portfolio:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Portfolio not found"
-        )
-    
-    # Get stock holding
-    holding = db.query(StockHolding).filter(
-        StockHolding.portfolio_id == portfolio.id,
-        StockHolding.stock_id == transaction_data.stock_id
-    ).first()
-    
-    if not holding or holding.shares < transaction_data.shares:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Insufficient shares to sell"
-        )
-    
-    # Get stock
-    stock = db.query(Stock).filter(Stock.id == transaction_data.stock_id).first()
-    
-    # Calculate total proceeds
-    total_proceeds = transaction_data.shares * transaction_data.price_per_share
-    
-    # Update portfolio cash
-    portfolio.cash_balance += total_proceeds
-    
-    # Update holding
-    holding.shares -= transaction_data.shares
-    if holding.shares == 0:
-        db.delete(holding)
-    else:
-        holding.current_value = holding.shares * stock.current_price
-    
-    # Update portfolio total value
-    total_stock_value = sum(h.current_value for h in portfolio.holdings if h != holding)
-    if holding.shares > 0:
-        total_stock_value += holding.current_value
-    portfolio.total_value = portfolio.cash_balance + total_stock_value
-    
-    # Create transaction record
-    transaction = Transaction(
-        user_id=current_user.id,
-        portfolio_id=portfolio.id,
-        stock_id=stock.id,
-        transaction_type="sell",
-        amount=total_proceeds,
+    order = StockOrder(
+        side="sell",
+        stock_id=transaction_data.stock_id,
         shares=transaction_data.shares,
-        price_per_share=transaction_data.price_per_share,
-        description=f"Sold {transaction_data.shares} shares of {stock.symbol}",
-        category="investment"
+        price_per_share=transaction_data.price_per_share
     )
-    
-    db.add(transaction)
-    db.commit()
-    db.refresh(transaction)
-    
-    return transaction
\ No newline at end of file
+    return execute_for_user(db, current_user, [order])[0]
+
+@router.post("/orders/batch", response_model=List[TransactionSchema])
+async def execute_order_batch(
+    batch: OrderBatch,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Execute several buys and sells atomically; if any order fails, none are applied"""
+    return execute_for_user(db, current_user, batch.orders)
@@ -7,9 +7,10 @@ from sqlalchemy.orm import Session
 from typing import List
 
 from ..database import get_db
-from ..models import User
+from ..models import User, FinancialProfile
 from ..schemas import User as UserSchema, UserUpdate, FinancialSummary
 from ..auth import get_current_active_user, get_current_teacher
+from ..services.summary import summaries
 
 router = APIRouter()
 
@@ -50,6 +51,26 @@ async def update_current_user(
     db.refresh(current_user)
     return current_user
 
+@router.get("/me/summary", response_model=FinancialSummary)
+async def get_financial_summary(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get the dashboard summary: profile, portfolio, recent transactions and net worth"""
+    if current_user.is_teacher:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Teachers don't have financial profiles"
+        )
+    
+    summary = summaries.get(db, current_user)
+    if summary is None:
+        # Create default profile if it doesn't exist
+        db.add(FinancialProfile(user_id=current_user.id))
+        db.commit()
+        summary = summaries.get(db, current_user)
+    return summary
+
 @router.get("/", response_model=List[UserSchema])
 async def list_users(
     current_user: User = Depends(get_current_teacher),
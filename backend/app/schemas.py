@@ -2,8 +2,8 @@
 Pydantic schemas for request/response validation
 """
 
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field
+from typing import Dict, Optional, List, Literal
 from datetime import datetime
 
 # User schemas
@@ -49,12 +49,14 @@ class ClassroomUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
     is_active: Optional[bool] = None
+    simulation_seed: Optional[int] = Field(None, ge=0, lt=2 ** 31)
 
 class Classroom(ClassroomBase):
     id: int
     invite_code: str
     teacher_id: int
     is_active: bool
+    simulation_seed: Optional[int] = None
     created_at: datetime
     
     class Config:
@@ -64,6 +66,21 @@ class ClassroomWithMembers(Classroom):
     teacher: User
     students: List[User]
 
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: int
+    username: str
+    net_worth: float
+    portfolio_return: float
+
+class Leaderboard(BaseModel):
+    """Top of a classroom ranking plus the caller's own position"""
+    classroom_id: int
+    metric: Literal["net_worth", "portfolio_return"]
+    total: int
+    entries: List[LeaderboardEntry]
+    me: Optional[LeaderboardEntry] = None
+
 # Career schemas
 class CareerBase(BaseModel):
     title: str
@@ -138,6 +155,20 @@ class Stock(StockBase):
     class Config:
         from_attributes = True
 
+class PriceBar(BaseModel):
+    timestamp: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+
+class StockPriceHistory(BaseModel):
+    """Downsampled OHLC series for one stock"""
+    stock_id: int
+    symbol: str
+    resolution: str  # tick, day, week
+    bars: List[PriceBar]
+
 # Portfolio schemas
 class PortfolioBase(BaseModel):
     name: str = "My Portfolio"
@@ -151,6 +182,9 @@ class Portfolio(PortfolioBase):
     total_value: float
     total_invested: float
     cash_balance: float
+    market_value: float = 0.0
+    cost_basis: float = 0.0
+    unrealized_pnl: float = 0.0
     created_at: datetime
     updated_at: Optional[datetime] = None
     
@@ -177,6 +211,32 @@ class StockHolding(StockHoldingBase):
 class PortfolioWithHoldings(Portfolio):
     holdings: List[StockHolding]
 
+class PortfolioAnalytics(BaseModel):
+    """Performance statistics over a portfolio's snapshot history"""
+    portfolio_id: int
+    market_version: int
+    snapshots: int
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    start_value: Optional[float] = None
+    end_value: Optional[float] = None
+    time_weighted_return: Optional[float] = None
+    max_drawdown: Optional[float] = None
+    volatility: Optional[float] = None  # Annualized standard deviation of period returns
+    benchmark_return: Optional[float] = None  # Equal-weighted return of every stock over the same range
+
+class PortfolioDrift(BaseModel):
+    """Difference between a stored portfolio aggregate and its holdings"""
+    portfolio_id: int
+    field: str
+    stored: float
+    actual: float
+
+class ReconciliationReport(BaseModel):
+    portfolios_checked: int
+    fixed: bool
+    drift: List[PortfolioDrift]
+
 # Transaction schemas
 class TransactionBase(BaseModel):
     transaction_type: str
@@ -186,8 +246,40 @@ class TransactionBase(BaseModel):
 
 class StockTransactionCreate(TransactionBase):
     stock_id: int
-    shares: float
-    price_per_share: float
+    shares: float = Field(gt=0)
+    price_per_share: float = Field(gt=0)
+
+class StockOrder(BaseModel):
+    """One leg of a market order"""
+    side: Literal["buy", "sell"]
+    stock_id: int
+    shares: float = Field(gt=0)
+    price_per_share: float = Field(gt=0)
+
+class OrderBatch(BaseModel):
+    orders: List[StockOrder] = Field(min_length=1, max_length=50)
+
+# Resting order schemas
+class OrderCreate(BaseModel):
+    side: Literal["buy", "sell"]
+    order_type: Literal["limit", "stop"]
+    stock_id: int
+    shares: float = Field(gt=0)
+    trigger_price: float = Field(gt=0)
+
+class Order(OrderCreate):
+    id: int
+    user_id: int
+    portfolio_id: int
+    status: str
+    fill_price: Optional[float] = None
+    transaction_id: Optional[int] = None
+    reject_reason: Optional[str] = None
+    created_at: datetime
+    closed_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
 
 class TransactionCreate(TransactionBase):
     pass
@@ -199,6 +291,7 @@ class Transaction(TransactionBase):
     stock_id: Optional[int] = None
     shares: Optional[float] = None
     price_per_share: Optional[float] = None
+    week_number: Optional[int] = None
     created_at: datetime
     
     class Config:
@@ -213,9 +306,25 @@ class FinancialEventBase(BaseModel):
     amount_max: float = 0.0
     probability: float = 0.1
 
+class FinancialEventCreate(FinancialEventBase):
+    event_type: Literal["bonus", "fine", "emergency", "opportunity"]
+    amount_min: float = Field(0.0, ge=0)
+    amount_max: float = Field(0.0, ge=0)
+    probability: float = Field(0.1, ge=0, le=1)
+
+class FinancialEventUpdate(BaseModel):
+    title: Optional[str] = None
+    description: Optional[str] = None
+    event_type: Optional[Literal["bonus", "fine", "emergency", "opportunity"]] = None
+    amount_min: Optional[float] = Field(None, ge=0)
+    amount_max: Optional[float] = Field(None, ge=0)
+    probability: Optional[float] = Field(None, ge=0, le=1)
+    is_active: Optional[bool] = None
+
 class FinancialEvent(FinancialEventBase):
     id: int
     is_active: bool
+    classroom_id: Optional[int] = None
     created_at: datetime
     
     class Config:
@@ -235,6 +344,70 @@ class WeeklySimulation(BaseModel):
     new_savings_balance: float
     new_student_loan_balance: float
 
+class StudentWeekResult(BaseModel):
+    """One student's outcome in a classroom-wide week"""
+    user_id: int
+    net_income: float
+    remaining_amount: float
+    event_ids: List[int]
+    new_savings_balance: float
+    new_student_loan_balance: float
+
+class ClassroomWeekSimulation(BaseModel):
+    """Results of running one week for a whole classroom"""
+    classroom_id: int
+    students_simulated: int
+    transactions_created: int
+    results: List[StudentWeekResult]
+    elapsed_ms: float
+
+class FastForwardSimulation(BaseModel):
+    """Totals for several weeks of financial simulation run in one step"""
+    weeks: int
+    first_week: int
+    last_week: int
+    gross_income: float
+    tax_amount: float
+    student_loan_payment: float
+    housing_cost: float
+    other_expenses: float
+    event_impact: float
+    saved_amount: float
+    events_occurred: int
+    new_savings_balance: float
+    new_student_loan_balance: float
+    transactions_created: int
+    statements_created: int
+    elapsed_ms: float
+
+class CategoryRollup(BaseModel):
+    """Ledger total for one category in one game week"""
+    week_number: int
+    category: str
+    total: float
+    transaction_count: int
+    
+    class Config:
+        from_attributes = True
+
+class Budget(BaseModel):
+    """Per-week category totals over a range of game weeks"""
+    first_week: int
+    last_week: int
+    rollups: List[CategoryRollup]
+    category_totals: Dict[str, float]
+
+class Projection(BaseModel):
+    """Percentile bands over simulated futures, keyed p5 ... p95"""
+    state_hash: str
+    weeks: int
+    paths: int
+    points: List[int]  # Weeks from now that each band value refers to
+    net_worth: Dict[str, List[float]]
+    savings: Dict[str, List[float]]
+    cached: bool
+    elapsed_ms: float
+
 class FinancialSummary(BaseModel):
     """Overall financial summary for dashboard"""
     user: User
@@ -0,0 +1,123 @@
+"""
+Portfolio performance analytics over snapshot history
+"""
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+import threading
+import numpy as np
+
+from ..models import PortfolioSnapshot, StockPriceBar
+from .market import get_market_version
+
+TRADING_DAYS_PER_YEAR = 252
+ANALYTICS_CACHE_SIZE = 4096
+
+_cache: Dict[Tuple[int, int], dict] = {}
+_cache_lock = threading.Lock()
+
+def time_weighted_return(values: np.ndarray) -> Tuple[float, np.ndarray]:
+    """Chain period returns; returns the total and the period returns.
+    
+    Cash only enters a portfolio when it opens and trades move value between cash
+    and holdings, so there are no external flows to remove between snapshots.
+    """
+    previous = values[:-1]
+    returns = np.divide(values[1:], previous, out=np.ones_like(previous), where=previous != 0) - 1
+    return float(np.prod(1 + returns) - 1), returns
+
+def max_drawdown(values: np.ndarray) -> float:
+    """Largest peak-to-trough fall as a fraction of the peak"""
+    peaks = np.maximum.accumulate(values)
+    drawdowns = np.divide(peaks - values, peaks, out=np.zeros_like(values), where=peaks > 0)
+    return float(drawdowns.max())
+
+def benchmark_return(db: Session, start: datetime, end: datetime) -> Optional[float]:
+    """Equal-weighted return of every stock between two dates, from daily bars"""
+    first = db.query(
+        StockPriceBar.stock_id, func.min(StockPriceBar.period_start).label("period_start")
+    ).filter(
+        StockPriceBar.interval == "day",
+        StockPriceBar.period_start >= start.replace(hour=0, minute=0, second=0, microsecond=0)
+    ).group_by(StockPriceBar.stock_id).subquery()
+    last = db.query(
+        StockPriceBar.stock_id, func.max(StockPriceBar.period_start).label("period_start")
+    ).filter(
+        StockPriceBar.interval == "day",
+        StockPriceBar.period_start <= end
+    ).group_by(StockPriceBar.stock_id).subquery()
+    
+    opens = dict(db.query(StockPriceBar.stock_id, StockPriceBar.open).join(
+        first,
+        (StockPriceBar.stock_id == first.c.stock_id)
+        & (StockPriceBar.period_start == first.c.period_start)
+    ).filter(StockPriceBar.interval == "day").all())
+    closes = dict(db.query(StockPriceBar.stock_id, StockPriceBar.close).join(
+        last,
+        (StockPriceBar.stock_id == last.c.stock_id)
+        & (StockPriceBar.period_start == last.c.period_start)
+    ).filter(StockPriceBar.interval == "day").all())
+    
+    stock_ids = [stock_id for stock_id in opens if opens[stock_id] and stock_id in closes]
+    if not stock_ids:
+        return None
+    
+    open_prices = np.array([opens[stock_id] for stock_id in stock_ids])
+    close_prices = np.array([closes[stock_id] for stock_id in stock_ids])
+    return float(np.mean(close_prices / open_prices - 1))
+
+def compute_analytics(db: Session, portfolio_id: int) -> dict:
+    """Compute performance statistics from a portfolio's full snapshot history"""
+    rows = db.query(
+        PortfolioSnapshot.timestamp, PortfolioSnapshot.total_value
+    ).filter(
+        PortfolioSnapshot.portfolio_id == portfolio_id
+    ).order_by(PortfolioSnapshot.timestamp, PortfolioSnapshot.id).all()
+    
+    analytics = {"portfolio_id": portfolio_id, "snapshots": len(rows)}
+    if not rows:
+        return analytics
+    
+    timestamps = [row.timestamp for row in rows]
+    values = np.array([row.total_value for row in rows], dtype=float)
+    
+    analytics.update(
+        start=timestamps[0],
+        end=timestamps[-1],
+        start_value=float(values[0]),
+        end_value=float(values[-1]),
+        max_drawdown=max_drawdown(values)
+    )
+    if len(rows) < 2:
+        return analytics
+    
+    twr, returns = time_weighted_return(values)
+    analytics.update(
+        time_weighted_return=twr,
+        volatility=float(np.std(returns, ddof=1) * np.sqrt(TRADING_DAYS_PER_YEAR)) if len(returns) > 1 else None,
+        benchmark_return=benchmark_return(db, timestamps[0], timestamps[-1])
+    )
+    return analytics
+
+def get_portfolio_analytics(db: Session, portfolio_id: int) -> dict:
+    """Portfolio analytics, computed once per market version"""
+    version = get_market_version(db)
+    key = (portfolio_id, version)
+    
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is not None:
+        return cached
+    
+    analytics = {**compute_analytics(db, portfolio_id), "market_version": version}
+    with _cache_lock:
+        # Entries from older market versions can never be served again
+        stale = [entry for entry in _cache if entry[1] < version]
+        for entry in stale:
+            del _cache[entry]
+        if len(_cache) >= ANALYTICS_CACHE_SIZE:
+            _cache.clear()
+        _cache[key] = analytics
+    return analytics
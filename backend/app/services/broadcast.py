@@ -0,0 +1,67 @@
+"""
+In-process fan-out of market price deltas to streaming clients
+"""
+
+from typing import Optional
+import asyncio
+import os
+
+# Messages buffered per client before it is treated as a slow consumer
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "16"))
+
+RESYNC_MESSAGE = "event: resync\ndata: {}\n\n"
+
+class PriceBroadcaster:
+    """Fans pre-encoded server-sent events out to every subscriber queue"""
+    
+    def __init__(self, queue_size: int = STREAM_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: set[asyncio.Queue] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+    
+    def subscribe(self) -> asyncio.Queue:
+        """Register a new client and return its message queue"""
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+    
+    def unsubscribe(self, queue: asyncio.Queue):
+        """Forget a disconnected client"""
+        self._subscribers.discard(queue)
+    
+    def publish(self, message: str):
+        """Send a message to every client; safe to call from any thread"""
+        loop = self._loop
+        if loop is None or not self._subscribers or loop.is_closed():
+            return
+        
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        
+        if running is loop:
+            self._fan_out(message)
+        else:
+            loop.call_soon_threadsafe(self._fan_out, message)
+    
+    def _fan_out(self, message: str):
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Slow consumer: drop its backlog and tell it to refetch quotes
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC_MESSAGE)
+
+def format_event(event: str, data: str) -> str:
+    """Encode one server-sent event"""
+    return f"event: {event}\ndata: {data}\n\n"
+
+price_broadcaster = PriceBroadcaster()
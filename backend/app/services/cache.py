@@ -0,0 +1,116 @@
+"""
+Cache invalidation shared by every worker through versions stored in the database
+"""
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, ORMExecuteState
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..database import upsert_insert
+from ..models import CacheVersion
+
+@dataclass(frozen=True)
+class Watch:
+    """Models whose writes change cached data, and the cache keys each write covers"""
+    models: Tuple[type, ...]
+    keys: Callable[[object], Iterable[Optional[str]]]  # Keys for an object flushed by the ORM
+    statement_keys: Callable[[ORMExecuteState], Iterable[Optional[str]]]  # Keys for a bulk statement on a model
+
+_watches: List[Watch] = []
+_TOUCHED = "cache_keys_touched"
+
+def watch(
+    models: Tuple[type, ...],
+    keys: Callable[[object], Iterable[Optional[str]]],
+    statement_keys: Callable[[ORMExecuteState], Iterable[Optional[str]]]
+):
+    """Bump the version of every key a committed write to one of the models covers"""
+    _watches.append(Watch(models, keys, statement_keys))
+
+def statement_rows(orm_execute_state: ORMExecuteState) -> List[dict]:
+    """Parameter rows of a bulk statement, one dict per row"""
+    parameters = orm_execute_state.parameters or []
+    return [parameters] if isinstance(parameters, dict) else list(parameters)
+
+def statement_values(orm_execute_state: ORMExecuteState, column: str) -> List:
+    """Values of one column over the rows a bulk statement writes: its parameter rows, its
+    INSERT ... SELECT, or the rows its WHERE clause matches, read before the statement runs"""
+    statement = orm_execute_state.statement
+    if orm_execute_state.is_insert and statement.select is None:
+        return [row[column] for row in statement_rows(orm_execute_state) if row.get(column) is not None]
+    if orm_execute_state.is_insert:
+        rows = statement.select.subquery()
+        if column not in rows.c:
+            return []
+        query = select(rows.c[column])
+    else:
+        query = select(orm_execute_state.bind_mapper.local_table.c[column])
+        if statement.whereclause is not None:
+            query = query.where(statement.whereclause)
+    return [value for value in orm_execute_state.session.scalars(query.distinct()) if value is not None]
+
+def cache_versions(db: Session, names: Iterable[str]) -> Dict[str, int]:
+    """Current version of each cache key (0 before its first bump)"""
+    names = list(names)
+    versions = dict(db.execute(
+        select(CacheVersion.name, CacheVersion.version).where(CacheVersion.name.in_(names))
+    ).all())
+    return {name: versions.get(name, 0) for name in names}
+
+def _object_keys(items) -> Iterable[Optional[str]]:
+    for item in items:
+        for cache_watch in _watches:
+            if isinstance(item, cache_watch.models):
+                yield from cache_watch.keys(item)
+
+def has_pending_writes(db: Session, name: str) -> bool:
+    """Whether the session has uncommitted writes covered by a cache key; what it reads must not be cached"""
+    if name in db.info.get(_TOUCHED, ()):
+        return True
+    # Objects not flushed yet (sessions do not autoflush)
+    return name in set(_object_keys((*db.new, *db.dirty, *db.deleted)))
+
+def bump_cache_versions(db: Session, names: Iterable[str]):
+    """Increment cache key versions in the caller's transaction"""
+    # Sorted so concurrent bumps lock rows in the same order
+    rows = [{"name": name, "version": 1} for name in sorted(set(names))]
+    if not rows:
+        return
+    table = CacheVersion.__table__
+    stmt = upsert_insert(db, table).values(rows)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.name],
+        set_={"version": table.c.version + 1}
+    ))
+
+# Keys touched in a transaction are bumped just before it commits, so the new
+# version becomes visible to other workers together with the data it covers
+def _touch(session, keys):
+    session.info.setdefault(_TOUCHED, set()).update(key for key in keys if key is not None)
+
+@event.listens_for(Session, "after_flush")
+def _flag_flushed_changes(session, flush_context):
+    _touch(session, _object_keys((*session.new, *session.dirty, *session.deleted)))
+
+@event.listens_for(Session, "do_orm_execute")
+def _flag_bulk_changes(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete) \
+            or orm_execute_state.bind_mapper is None:
+        return
+    model = orm_execute_state.bind_mapper.class_
+    for cache_watch in _watches:
+        if issubclass(model, cache_watch.models):
+            _touch(orm_execute_state.session, cache_watch.statement_keys(orm_execute_state))
+
+@event.listens_for(Session, "before_commit")
+def _bump_before_commit(session):
+    # The commit's own flush runs after this hook, so flush here to see every write
+    session.flush()
+    keys = session.info.pop(_TOUCHED, None)
+    if keys:
+        bump_cache_versions(session, keys)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop(_TOUCHED, None)
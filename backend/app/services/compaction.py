@@ -0,0 +1,89 @@
+"""
+Ledger compaction: old weekly-simulation transactions rolled into weekly statements
+"""
+
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.orm import Session
+import os
+import sys
+
+from ..database import commit_with_retry, upsert_insert
+from ..models import FinancialProfile, Transaction, WeeklyStatement
+from .weekly import STATEMENT_CATEGORIES
+
+LEDGER_COMPACTION_WEEKS = int(os.getenv("LEDGER_COMPACTION_WEEKS", "52"))  # Game weeks kept as raw rows
+COMPACTION_BATCH_SIZE = int(os.getenv("LEDGER_COMPACTION_BATCH_SIZE", "5000"))
+
+def compact_batch(db: Session, horizon_weeks: int, batch_size: int) -> int:
+    """Fold one batch of old rows into their statements and delete them; nothing is committed.
+    
+    Rows are compacted once the student has played horizon_weeks further weeks. Trades
+    and dividends keep their stock details and are never compacted. Categories without
+    a statement column add to other.
+    """
+    ids = db.execute(
+        select(Transaction.id)
+        .join(FinancialProfile, FinancialProfile.user_id == Transaction.user_id)
+        .where(
+            Transaction.week_number.is_not(None),
+            Transaction.stock_id.is_(None),
+            Transaction.week_number <= FinancialProfile.weeks_played - horizon_weeks
+        )
+        .order_by(Transaction.id)
+        .limit(batch_size)
+    ).scalars().all()
+    if not ids:
+        return 0
+    
+    totals = select(
+        Transaction.user_id,
+        Transaction.week_number,
+        *[
+            func.sum(case((Transaction.category == category, Transaction.amount), else_=0.0))
+            for category in STATEMENT_CATEGORIES
+        ],
+        func.sum(case((Transaction.category.in_(STATEMENT_CATEGORIES), 0.0), else_=Transaction.amount)),
+        func.count(Transaction.id),
+        # New statements sort where their rows did in the history
+        func.max(Transaction.created_at)
+    ).where(Transaction.id.in_(ids)).group_by(Transaction.user_id, Transaction.week_number)
+    
+    table = WeeklyStatement.__table__
+    totalled = (*STATEMENT_CATEGORIES, "other", "transaction_count")
+    stmt = upsert_insert(db, table).from_select(["user_id", "week_number", *totalled, "created_at"], totals)
+    # A week can be compacted in several batches, or already hold a fast-forward summary
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "week_number"],
+        set_={column: table.c[column] + stmt.excluded[column] for column in totalled}
+    )
+    db.execute(stmt)
+    db.execute(
+        delete(Transaction).where(Transaction.id.in_(ids)).execution_options(synchronize_session=False)
+    )
+    return len(ids)
+
+def compact_ledger(
+    db: Session,
+    horizon_weeks: int = LEDGER_COMPACTION_WEEKS,
+    batch_size: int = COMPACTION_BATCH_SIZE
+) -> dict:
+    """Compact every eligible row, committing each batch on its own so locks stay short"""
+    compacted = batches = 0
+    while True:
+        count = commit_with_retry(db, lambda: compact_batch(db, horizon_weeks, batch_size))
+        if not count:
+            break
+        compacted += count
+        batches += 1
+    return {"transactions_compacted": compacted, "batches": batches}
+
+if __name__ == "__main__":
+    from ..database import SessionLocal
+    
+    if len(sys.argv) > 2:
+        sys.exit("usage: python -m app.services.compaction [horizon weeks]")
+    session = SessionLocal()
+    try:
+        print(compact_ledger(session, int(sys.argv[1]) if len(sys.argv) == 2 else LEDGER_COMPACTION_WEEKS))
+    finally:
+        session.close()
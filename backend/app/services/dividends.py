@@ -0,0 +1,111 @@
+"""
+Quarterly dividend payouts with set-based statements
+"""
+
+from sqlalchemy import select, update, insert, literal, func
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import List
+
+from ..models import MarketState, Stock, StockHolding, StockPriceHistory, Portfolio, Transaction
+from .rollups import add_select, current_week
+
+DIVIDENDS_PER_YEAR = 4
+
+def quarter_start(timestamp: datetime) -> datetime:
+    """Start of the calendar quarter containing a timestamp"""
+    return timestamp.replace(
+        month=3 * ((timestamp.month - 1) // 3) + 1, day=1,
+        hour=0, minute=0, second=0, microsecond=0
+    )
+
+def due_payout_dates(db: Session, timestamps: List[datetime]) -> List[datetime]:
+    """Timestamps of a run that open a new quarter, marking the run as settled"""
+    settled = db.query(MarketState.dividends_settled_at).filter(MarketState.id == 1).scalar()
+    reference = timestamps[0] if settled is None else settled.replace(tzinfo=None)
+    
+    due = []
+    for timestamp in timestamps:
+        if quarter_start(timestamp) > quarter_start(reference):
+            due.append(timestamp)
+        reference = timestamp
+    
+    db.execute(
+        update(MarketState)
+        .where(MarketState.id == 1)
+        .values(dividends_settled_at=timestamps[-1])
+        .execution_options(synchronize_session=False)
+    )
+    return due
+
+def pay_dividends(db: Session, paid_at: datetime) -> int:
+    """Credit one quarterly dividend on every holding, priced at the close recorded at paid_at.
+    
+    Transactions are written with one INSERT ... SELECT and cash with one UPDATE,
+    both in the caller's transaction.
+    """
+    per_share = StockPriceHistory.price * Stock.dividend_yield / (100.0 * DIVIDENDS_PER_YEAR)
+    payable = (
+        select(
+            Portfolio.user_id,
+            StockHolding.portfolio_id,
+            literal("dividend"),
+            StockHolding.shares * per_share,
+            literal("Dividend from ") + Stock.symbol,
+            literal("investment"),
+            StockHolding.stock_id,
+            StockHolding.shares,
+            per_share,
+            current_week(Portfolio.user_id)
+        )
+        .join(Portfolio, Portfolio.id == StockHolding.portfolio_id)
+        .join(Stock, Stock.id == StockHolding.stock_id)
+        .join(StockPriceHistory, (StockPriceHistory.stock_id == Stock.id) & (StockPriceHistory.timestamp == paid_at))
+        .where(Stock.dividend_yield > 0, StockHolding.shares > 0)
+    )
+    inserted = db.execute(
+        insert(Transaction).from_select(
+            [
+                "user_id", "portfolio_id", "transaction_type", "amount", "description",
+                "category", "stock_id", "shares", "price_per_share", "week_number"
+            ],
+            payable
+        ).execution_options(market_wide=True)
+    ).rowcount
+    if not inserted:
+        return 0
+    
+    # Same rows again, totalled into each holder's current week
+    add_select(db, payable.with_only_columns(
+        Portfolio.user_id.label("user_id"),
+        current_week(Portfolio.user_id).label("week_number"),
+        literal("investment").label("category"),
+        (StockHolding.shares * per_share).label("amount")
+    ))
+    
+    # Same payout expression, summed per portfolio and correlated on portfolio id
+    payout = (
+        select(func.sum(StockHolding.shares * per_share))
+        .join(Stock, Stock.id == StockHolding.stock_id)
+        .join(StockPriceHistory, (StockPriceHistory.stock_id == Stock.id) & (StockPriceHistory.timestamp == paid_at))
+        .where(
+            StockHolding.portfolio_id == Portfolio.id,
+            Stock.dividend_yield > 0,
+            StockHolding.shares > 0
+        )
+        .scalar_subquery()
+    )
+    db.execute(
+        update(Portfolio)
+        .where(payout.is_not(None))
+        .values(
+            cash_balance=Portfolio.cash_balance + payout,
+            total_value=Portfolio.total_value + payout
+        )
+        .execution_options(synchronize_session=False, market_wide=True)
+    )
+    return inserted
+
+def settle_dividends(db: Session, timestamps: List[datetime]) -> int:
+    """Pay every quarterly dividend falling due within a run of timestamps"""
+    return sum(pay_dividends(db, paid_at) for paid_at in due_payout_dates(db, timestamps))
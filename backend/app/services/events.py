@@ -0,0 +1,113 @@
+"""
+Compiled, cached financial event decks for vectorized sampling
+"""
+
+from sqlalchemy.orm import Session
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import threading
+import numpy as np
+
+from ..models import FinancialEvent, classroom_members
+from ..schemas import FinancialEvent as FinancialEventSchema
+from .cache import cache_versions, has_pending_writes, watch
+
+EVENT_DECKS_KEY = "event_decks"
+POSITIVE_EVENT_TYPES = ("bonus", "opportunity")
+
+@dataclass
+class EventTable:
+    """Active financial events as parallel arrays"""
+    events: List[FinancialEventSchema]
+    probability: np.ndarray
+    amount_min: np.ndarray
+    amount_max: np.ndarray
+    sign: np.ndarray  # +1 for bonuses and opportunities, -1 for fines and emergencies
+    
+    @classmethod
+    def compile(cls, events: List[FinancialEvent]) -> "EventTable":
+        return cls(
+            events=[FinancialEventSchema.model_validate(item) for item in events],
+            probability=np.array([item.probability or 0.0 for item in events], dtype=float),
+            amount_min=np.array([item.amount_min or 0.0 for item in events], dtype=float),
+            amount_max=np.array([item.amount_max or 0.0 for item in events], dtype=float),
+            sign=np.array([1.0 if item.event_type in POSITIVE_EVENT_TYPES else -1.0 for item in events])
+        )
+    
+    @classmethod
+    def combine(cls, tables: List["EventTable"]) -> "EventTable":
+        if len(tables) == 1:
+            return tables[0]
+        return cls(
+            events=[item for table in tables for item in table.events],
+            probability=np.concatenate([table.probability for table in tables]),
+            amount_min=np.concatenate([table.amount_min for table in tables]),
+            amount_max=np.concatenate([table.amount_max for table in tables]),
+            sign=np.concatenate([table.sign for table in tables])
+        )
+
+class EventDeckCache:
+    """Compiled event tables per classroom (None for the global deck), valid for one version of the events"""
+    
+    def __init__(self):
+        self._tables: Dict[Optional[int], Tuple[int, EventTable]] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, db: Session, classroom_ids: List[Optional[int]]) -> List[EventTable]:
+        # The version is read before compiling, so a table is never older than the version it is cached under.
+        # A session with uncommitted event changes compiles its own tables and keeps them out of the cache
+        version = cache_versions(db, [EVENT_DECKS_KEY])[EVENT_DECKS_KEY]
+        shared = not has_pending_writes(db, EVENT_DECKS_KEY)
+        with self._lock:
+            cached = {classroom_id: self._tables.get(classroom_id) for classroom_id in classroom_ids}
+        
+        tables = []
+        for classroom_id in classroom_ids:
+            if shared and cached[classroom_id] is not None and cached[classroom_id][0] == version:
+                tables.append(cached[classroom_id][1])
+                continue
+            query = db.query(FinancialEvent).filter(FinancialEvent.is_active == True)
+            if classroom_id is None:
+                query = query.filter(FinancialEvent.classroom_id.is_(None))
+            else:
+                query = query.filter(FinancialEvent.classroom_id == classroom_id)
+            table = EventTable.compile(query.order_by(FinancialEvent.id).all())
+            if shared:
+                with self._lock:
+                    self._tables[classroom_id] = (version, table)
+            tables.append(table)
+        return tables
+
+event_decks = EventDeckCache()
+
+def decks_for_users(db: Session, user_ids: List[int]) -> Tuple[EventTable, np.ndarray]:
+    """Global events plus every classroom deck of the students, with a (students, events) mask of what each can draw"""
+    memberships = db.query(classroom_members.c.user_id, classroom_members.c.classroom_id).filter(
+        classroom_members.c.user_id.in_(user_ids)
+    ).all()
+    classroom_ids = sorted({row.classroom_id for row in memberships})
+    tables = event_decks.get(db, [None, *classroom_ids])
+    
+    # Each classroom's events occupy one column range of the combined deck
+    bounds = np.cumsum([0] + [len(table.events) for table in tables])
+    columns = {
+        classroom_id: (bounds[index + 1], bounds[index + 2]) for index, classroom_id in enumerate(classroom_ids)
+    }
+    rows = {user_id: index for index, user_id in enumerate(user_ids)}
+    eligible = np.zeros((len(user_ids), bounds[-1]), dtype=bool)
+    eligible[:, :bounds[1]] = True
+    for user_id, classroom_id in memberships:
+        start, end = columns[classroom_id]
+        eligible[rows[user_id], start:end] = True
+    return EventTable.combine(tables), eligible
+
+def deck_for_user(db: Session, user_id: int) -> EventTable:
+    """Global events plus the decks of every classroom the student is in"""
+    return decks_for_users(db, [user_id])[0]
+
+# Any committed change to financial events moves the deck version
+watch(
+    (FinancialEvent,),
+    keys=lambda item: [EVENT_DECKS_KEY],
+    statement_keys=lambda orm_execute_state: [EVENT_DECKS_KEY]
+)
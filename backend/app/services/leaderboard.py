@@ -0,0 +1,140 @@
+"""
+Precomputed classroom leaderboards
+"""
+
+from sqlalchemy import select, update, func, or_, and_
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from ..database import upsert_insert
+from ..models import (
+    User, LeaderboardEntry, FinancialProfile, Portfolio, StockHolding, Order, classroom_members
+)
+
+STARTING_CASH = 1000.0  # Cash every new portfolio is opened with
+LEADERBOARD_METRICS = ("net_worth", "portfolio_return")
+
+def metric_values(user_id):
+    """Net worth and portfolio return for the user in user_id, as correlated subqueries"""
+    profile_worth = (
+        select(
+            FinancialProfile.savings_balance
+            + FinancialProfile.emergency_fund
+            + FinancialProfile.property_value
+            - FinancialProfile.student_loan_balance
+        )
+        .where(FinancialProfile.user_id == user_id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    portfolio_worth = (
+        select(func.sum(Portfolio.total_value))
+        .where(Portfolio.user_id == user_id)
+        .scalar_subquery()
+    )
+    portfolio_return = (
+        select(func.sum(Portfolio.total_value) / (func.count(Portfolio.id) * STARTING_CASH) - 1)
+        .where(Portfolio.user_id == user_id)
+        .scalar_subquery()
+    )
+    return {
+        "net_worth": func.coalesce(profile_worth, 0.0) + func.coalesce(portfolio_worth, 0.0),
+        "portfolio_return": func.coalesce(portfolio_return, 0.0)
+    }
+
+def refresh_entries(db: Session, user_ids) -> int:
+    """Recompute the metrics of the given users' entries in every classroom with one UPDATE.
+    
+    user_ids may be a list or a SELECT of user ids.
+    """
+    result = db.execute(
+        update(LeaderboardEntry)
+        .where(LeaderboardEntry.user_id.in_(user_ids))
+        .values(**metric_values(LeaderboardEntry.user_id))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+def refresh_after_tick(db: Session, since) -> int:
+    """Refresh entries of users whose portfolio value a price tick can have changed"""
+    has_holdings = select(StockHolding.id).where(StockHolding.portfolio_id == Portfolio.id).exists()
+    had_fills = select(Order.id).where(
+        Order.portfolio_id == Portfolio.id,
+        Order.status == "filled",
+        Order.closed_at >= since
+    ).exists()
+    return refresh_entries(
+        db, select(Portfolio.user_id).where(or_(has_holdings, had_fills))
+    )
+
+def add_entries(db: Session, classroom_id: Optional[int] = None) -> int:
+    """Create missing entries for classroom members with one INSERT ... SELECT"""
+    members = select(
+        classroom_members.c.classroom_id,
+        classroom_members.c.user_id,
+        *metric_values(classroom_members.c.user_id).values()
+    ).join(User, User.id == classroom_members.c.user_id).where(User.is_teacher == False)
+    if classroom_id is not None:
+        members = members.where(classroom_members.c.classroom_id == classroom_id)
+    
+    stmt = upsert_insert(db, LeaderboardEntry.__table__).from_select(
+        ["classroom_id", "user_id", *LEADERBOARD_METRICS], members
+    ).on_conflict_do_nothing(index_elements=["classroom_id", "user_id"])
+    return db.execute(stmt).rowcount
+
+def get_top(db: Session, classroom_id: int, metric: str, limit: int) -> List[dict]:
+    """Best entries by metric, read in index order"""
+    column = getattr(LeaderboardEntry, metric)
+    rows = db.query(LeaderboardEntry, User.username).join(
+        User, User.id == LeaderboardEntry.user_id
+    ).filter(
+        LeaderboardEntry.classroom_id == classroom_id
+    ).order_by(column.desc(), LeaderboardEntry.user_id).limit(limit).all()
+    
+    # Standard competition ranking: ties share a rank and the next rank is skipped
+    entries = []
+    for position, (entry, username) in enumerate(rows, start=1):
+        if entries and getattr(entry, metric) == getattr(rows[position - 2][0], metric):
+            rank = entries[-1]["rank"]
+        else:
+            rank = position
+        entries.append(_entry_dict(entry, username, rank))
+    return entries
+
+def get_rank(db: Session, classroom_id: int, user_id: int, metric: str) -> Optional[dict]:
+    """A user's entry and rank, counted over the (classroom, metric) index range above it.
+    
+    The count reads one index entry per student ahead, so it costs O(rank) within a
+    single classroom rather than O(log n); a classroom holds at most a few hundred students.
+    """
+    row = db.query(LeaderboardEntry, User.username).join(
+        User, User.id == LeaderboardEntry.user_id
+    ).filter(
+        LeaderboardEntry.classroom_id == classroom_id,
+        LeaderboardEntry.user_id == user_id
+    ).first()
+    if row is None:
+        return None
+    
+    entry, username = row
+    column = getattr(LeaderboardEntry, metric)
+    # count(*) needs nothing outside the index, so the range is read index-only
+    ahead = db.query(func.count()).select_from(LeaderboardEntry).filter(
+        and_(LeaderboardEntry.classroom_id == classroom_id, column > getattr(entry, metric))
+    ).scalar()
+    return _entry_dict(entry, username, ahead + 1)
+
+def count_entries(db: Session, classroom_id: int) -> int:
+    """Number of ranked students in a classroom"""
+    return db.query(func.count(LeaderboardEntry.id)).filter(
+        LeaderboardEntry.classroom_id == classroom_id
+    ).scalar()
+
+def _entry_dict(entry: LeaderboardEntry, username: str, rank: int) -> dict:
+    return {
+        "rank": rank,
+        "user_id": entry.user_id,
+        "username": username,
+        "net_worth": entry.net_worth,
+        "portfolio_return": entry.portfolio_return
+    }
@@ -0,0 +1,201 @@
+"""
+Transaction ledger reads: keyset pagination and streaming export.
+
+Compacted weeks live on as weekly statements; every read merges each statement's
+category totals in as ledger lines alongside the raw transactions.
+"""
+
+from sqlalchemy import Float, Integer, String, bindparam, cast, literal, null, select, tuple_, union_all
+from sqlalchemy.orm import Session
+from typing import Callable, Iterator, List, Optional, Tuple
+import base64
+import binascii
+import csv
+import io
+import json
+
+from ..database import SessionLocal
+from ..models import Transaction, User, WeeklyStatement, classroom_members
+
+MAX_PAGE_SIZE = 500
+EXPORT_BATCH_SIZE = 2000  # Rows fetched and written per chunk while streaming an export
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# Weekly statement columns in line order, with the transaction type their rows carried
+STATEMENT_LINES = (
+    ("income", "salary"),
+    ("tax", "tax"),
+    ("housing", "housing"),
+    ("expense", "expense"),
+    ("debt", "student_loan"),
+    ("investment", "investment"),
+    ("other", "other"),
+)
+LEDGER_FIELDS = (
+    "id", "user_id", "portfolio_id", "transaction_type", "category", "amount", "description",
+    "stock_id", "shares", "price_per_share", "week_number", "created_at"
+)
+EXPORT_FIELDS = ("id", "user_id", "username") + LEDGER_FIELDS[2:]
+
+def encode_cursor(created_at: str, transaction_id: int) -> str:
+    """Opaque cursor for the row after which the next page starts"""
+    raw = json.dumps([created_at, transaction_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Split a cursor back into its stored timestamp and id, raising ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, transaction_id = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(created_at, str) or not isinstance(transaction_id, int):
+        raise ValueError("Invalid cursor")
+    return created_at, transaction_id
+
+def statement_line_id(statement_id, position):
+    """Ledger id of a statement line; negative so it never collides with a transaction id"""
+    return -(statement_id * len(STATEMENT_LINES) + position + 1)
+
+def _ledger_arms(
+    scope: Callable,
+    category: Optional[str] = None,
+    transaction_type: Optional[str] = None,
+    after: Optional[Tuple[str, int]] = None,
+    with_username: bool = False
+) -> list:
+    """One SELECT of raw transactions plus one per statement column, all shaped like ledger rows.
+    
+    scope(select, model) narrows an arm to the wanted users; after is a (stored created_at,
+    id) key that every returned row must sort strictly before.
+    """
+    def shape(model, id_column, columns):
+        arm = select(
+            id_column.label("id"),
+            model.user_id.label("user_id"),
+            *([User.username.label("username")] if with_username else []),
+            *columns,
+            model.week_number.label("week_number"),
+            model.created_at.label("created_at"),
+            # Stored text form of the key; see page_transactions
+            cast(model.created_at, String).label("stored_at")
+        )
+        if with_username:
+            arm = arm.join(User, User.id == model.user_id)
+        arm = scope(arm, model)
+        if after is not None:
+            arm = arm.where(
+                tuple_(model.created_at, id_column)
+                < tuple_(bindparam("after_created_at", after[0], type_=String), bindparam("after_id", after[1]))
+            )
+        return arm
+    
+    raw = shape(Transaction, Transaction.id, [
+        Transaction.portfolio_id.label("portfolio_id"),
+        Transaction.transaction_type.label("transaction_type"),
+        Transaction.category.label("category"),
+        Transaction.amount.label("amount"),
+        Transaction.description.label("description"),
+        Transaction.stock_id.label("stock_id"),
+        Transaction.shares.label("shares"),
+        Transaction.price_per_share.label("price_per_share"),
+    ])
+    # Equality filters sit between user_id and created_at in their own composite indexes,
+    # so the filtered walk stays an ordered index range scan
+    if category is not None:
+        raw = raw.where(Transaction.category == category)
+    if transaction_type is not None:
+        raw = raw.where(Transaction.transaction_type == transaction_type)
+    arms = [raw]
+    
+    for position, (column, line_type) in enumerate(STATEMENT_LINES):
+        if category not in (None, column) or transaction_type not in (None, line_type):
+            continue
+        amount = WeeklyStatement.__table__.c[column]
+        arms.append(shape(WeeklyStatement, statement_line_id(WeeklyStatement.id, position), [
+            cast(null(), Integer).label("portfolio_id"),
+            literal(line_type).label("transaction_type"),
+            literal(column).label("category"),
+            amount.label("amount"),
+            ("Week " + cast(WeeklyStatement.week_number, String) + " " + column).label("description"),
+            cast(null(), Integer).label("stock_id"),
+            cast(null(), Float).label("shares"),
+            cast(null(), Float).label("price_per_share"),
+        ]).where(amount != 0))
+    return arms
+
+def page_transactions(
+    db: Session,
+    user_id: int,
+    limit: int,
+    cursor: Optional[str] = None,
+    category: Optional[str] = None,
+    transaction_type: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """One page of a user's ledger, newest first, and the cursor for the next page"""
+    # The key is compared in the column's stored text form: SQLite keeps CURRENT_TIMESTAMP
+    # defaults without fractional seconds, so a bound datetime would not compare equal to them
+    after = decode_cursor(cursor) if cursor else None
+    ledger = union_all(*_ledger_arms(
+        lambda arm, model: arm.where(model.user_id == user_id),
+        category, transaction_type, after
+    ))
+    rows = db.execute(
+        ledger.order_by(ledger.selected_columns.created_at.desc(), ledger.selected_columns.id.desc())
+        .limit(limit + 1)
+    ).all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].stored_at, rows[-1].id)
+    return [{field: getattr(row, field) for field in LEDGER_FIELDS} for row in rows], next_cursor
+
+def user_ledger_query(user_id: int):
+    """Every ledger row of one user, oldest first"""
+    ledger = union_all(*_ledger_arms(
+        lambda arm, model: arm.where(model.user_id == user_id), with_username=True
+    ))
+    return ledger.order_by(ledger.selected_columns.created_at, ledger.selected_columns.id)
+
+def classroom_ledger_query(classroom_id: int):
+    """Every ledger row of a classroom's students, grouped by student and oldest first"""
+    def in_classroom(arm, model):
+        return arm.join(
+            classroom_members, classroom_members.c.user_id == model.user_id
+        ).where(classroom_members.c.classroom_id == classroom_id, User.is_teacher == False)
+    
+    ledger = union_all(*_ledger_arms(in_classroom, with_username=True))
+    return ledger.order_by(
+        ledger.selected_columns.user_id, ledger.selected_columns.created_at, ledger.selected_columns.id
+    )
+
+def _json_default(value):
+    """Encode the timestamps json cannot serialise on its own"""
+    return value.isoformat()
+
+def stream_ledger(statement, fmt: str) -> Iterator[str]:
+    """Encode a ledger query as CSV or NDJSON chunks, holding one batch of rows at a time"""
+    # The request's session is closed once the handler returns, so the stream owns its own
+    db = SessionLocal()
+    try:
+        # Plain Core rows; yield_per streams from a server-side cursor where the driver supports one
+        result = db.connection().execution_options(yield_per=EXPORT_BATCH_SIZE).execute(statement)
+        width = len(EXPORT_FIELDS)  # Leaves off the trailing stored_at key column
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_FIELDS)
+            for rows in result.partitions():
+                writer.writerows(row[:width] for row in rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+        else:
+            encode = json.JSONEncoder(separators=(",", ":"), default=_json_default).encode
+            for rows in result.partitions():
+                yield "".join(encode(dict(zip(EXPORT_FIELDS, row))) + "\n" for row in rows)
+    finally:
+        db.close()
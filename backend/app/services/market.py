@@ -0,0 +1,309 @@
+"""
+Stock market engine: price simulation or replay, and portfolio revaluation
+"""
+
+from sqlalchemy import select, update, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import List
+import time
+import numpy as np
+
+from ..models import Stock, StockPriceHistory, MarketState, Portfolio, StockHolding
+from .price_history import record_prices
+from .orders import match_orders
+from .snapshots import snapshot_portfolios, snapshot_intermediate_days
+from .leaderboard import refresh_after_tick
+from .dividends import settle_dividends
+from .replay import replay_enabled, replay_closes
+from .rng import market_seed, market_shocks
+
+DEFAULT_DRIFT = 0.001  # Mean 0.1% daily growth
+DEFAULT_VOLATILITY = 0.02  # 2% daily volatility
+MAX_DAILY_MOVE = 0.15  # Cap daily moves at ±15%
+
+def simulate_price_paths(
+    prices: np.ndarray,
+    drift: np.ndarray,
+    volatility: np.ndarray,
+    shocks: np.ndarray
+) -> np.ndarray:
+    """Simulate daily closes for every stock from (days, stocks) standard normal shocks.
+    
+    Each close is rounded to cents before the next day, as a single-day tick stores
+    it, so one n-day run matches n single-day runs exactly.
+    """
+    # Random walk with slight upward bias, one row per trading day
+    returns = drift + volatility * shocks
+    np.clip(returns, -MAX_DAILY_MOVE, MAX_DAILY_MOVE, out=returns)
+    
+    closes = np.empty_like(returns)
+    close = np.round(prices, 2)
+    for day, day_returns in enumerate(1 + returns):
+        close = np.round(close * day_returns, 2)
+        closes[day] = close
+    return closes
+
+def advance_market(db: Session, days: int = 1) -> dict:
+    """Advance every stock by a number of trading days and revalue portfolios"""
+    started = time.perf_counter()
+    tick_started_at = datetime.utcnow()
+    ensure_market_state(db)
+    
+    stocks = db.query(
+        Stock.id, Stock.symbol, Stock.current_price, Stock.drift, Stock.volatility
+    ).order_by(Stock.id).all()
+    
+    stock_ids = [stock.id for stock in stocks]
+    prices = np.array([stock.current_price for stock in stocks], dtype=float)
+    replay_date = None
+    
+    if stocks and replay_enabled():
+        # Replay real closes from the dataset cursor; the run ends early if the data does
+        dates, closes = replay_closes(db, [stock.symbol for stock in stocks], prices, days)
+        days = len(dates)
+        replay_date = dates[-1] if dates else None
+    elif stocks:
+        drift = np.array([
+            DEFAULT_DRIFT if stock.drift is None else stock.drift for stock in stocks
+        ])
+        volatility = np.array([
+            DEFAULT_VOLATILITY if stock.volatility is None else stock.volatility for stock in stocks
+        ])
+        seed, market_day = market_seed(db)
+        closes = simulate_price_paths(
+            prices, drift, volatility, market_shocks(seed, stock_ids, market_day, days)
+        )
+    
+    if not stocks or days == 0:
+        return {
+            "market_version": get_market_version(db),
+            "days": 0,
+            "replay_date": replay_date,
+            "stocks_updated": 0,
+            "prices_recorded": 0,
+            "dividends_paid": 0,
+            "orders_filled": 0,
+            "orders_rejected": 0,
+            "holdings_updated": 0,
+            "portfolios_updated": 0,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+    
+    closes = np.round(closes, 2)
+    previous = closes[-2] if days > 1 else np.round(prices, 2)
+    change = closes[-1] - previous
+    change_percent = np.divide(change, previous, out=np.zeros_like(change), where=previous != 0) * 100
+    
+    # Each simulated trading day gets its own market date, after the last recorded one
+    timestamps = market_timestamps(db, days)
+    
+    # Persist the final state of each stock
+    db.execute(update(Stock), [
+        {
+            "id": stock_id,
+            "current_price": price,
+            "daily_change": round(delta, 2),
+            "daily_change_percent": round(percent, 2),
+            "last_updated": timestamps[-1]
+        }
+        for stock_id, price, delta, percent in zip(
+            stock_ids, closes[-1].tolist(), change.tolist(), change_percent.tolist()
+        )
+    ])
+    
+    # Persist every intermediate close and its OHLC rollups in bulk
+    record_prices(db, stock_ids, timestamps, closes)
+    snapshot_intermediate_days(db, timestamps[:-1])
+    
+    # Quarterly dividends on the holdings carried through the run
+    dividends_paid = settle_dividends(db, timestamps)
+    
+    # Fill resting orders crossed anywhere along the simulated path
+    matching = match_orders(
+        db,
+        prices=dict(zip(stock_ids, closes[-1].tolist())),
+        lows=dict(zip(stock_ids, closes.min(axis=0).tolist())),
+        highs=dict(zip(stock_ids, closes.max(axis=0).tolist()))
+    )
+    
+    revaluation = revalue_portfolios(db)
+    snapshot_portfolios(db, timestamps[-1])
+    refresh_after_tick(db, tick_started_at)
+    
+    return {
+        "market_version": bump_market_version(db, days),
+        "days": days,
+        "replay_date": replay_date,
+        "stocks_updated": len(stock_ids),
+        "prices_recorded": len(stock_ids) * days,
+        "dividends_paid": dividends_paid,
+        **matching,
+        "holdings_updated": revaluation["holdings_updated"],
+        "portfolios_updated": revaluation["portfolios_updated"],
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+
+def next_trading_day(day: datetime) -> datetime:
+    """The next weekday after a date, at the same time of day"""
+    day += timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return day
+
+def market_timestamps(db: Session, days: int) -> List[datetime]:
+    """Timestamps for the next trading days, advancing the market date cursor one day per tick"""
+    cursor = db.query(MarketState.market_date).filter(MarketState.id == 1).scalar()
+    if cursor is None:
+        # Carry on from recorded history, or open the market today
+        cursor = db.query(func.max(StockPriceHistory.timestamp)).scalar()
+    
+    timestamps = []
+    day = None if cursor is None else cursor.replace(tzinfo=None)
+    for _ in range(days):
+        day = datetime.utcnow() if day is None else next_trading_day(day)
+        timestamps.append(day)
+    
+    db.execute(
+        update(MarketState)
+        .where(MarketState.id == 1)
+        .values(market_date=timestamps[-1])
+        .execution_options(synchronize_session=False)
+    )
+    return timestamps
+
+def get_market_version(db: Session) -> int:
+    """Current market version (0 before the first price update)"""
+    version = db.query(MarketState.version).filter(MarketState.id == 1).scalar()
+    return version or 0
+
+def ensure_market_state(db: Session):
+    """Create the singleton market state row if it does not exist yet"""
+    if db.query(MarketState.id).filter(MarketState.id == 1).first() is None:
+        try:
+            db.add(MarketState(id=1, version=0))
+            db.commit()
+        except IntegrityError:
+            # Another worker created it first
+            db.rollback()
+
+def bump_market_version(db: Session, days: int = 0) -> int:
+    """Atomically increment the market version, advance the market day and return the new version"""
+    db.execute(
+        update(MarketState)
+        .where(MarketState.id == 1)
+        .values(
+            version=MarketState.version + 1,
+            market_day=func.coalesce(MarketState.market_day, 0) + days,
+            last_tick_at=datetime.utcnow()
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return get_market_version(db)
+
+def revalue_portfolios(db: Session) -> dict:
+    """Apply a price tick to holdings and portfolio aggregates with set-based UPDATEs"""
+    started = time.perf_counter()
+    
+    stock_price = (
+        select(Stock.current_price)
+        .where(Stock.id == StockHolding.stock_id)
+        .scalar_subquery()
+    )
+    
+    # Portfolio delta = sum of (new holding value - stored holding value), taken
+    # before the holdings themselves are updated
+    value_delta = (
+        select(func.coalesce(func.sum(StockHolding.shares * stock_price - StockHolding.current_value), 0.0))
+        .where(StockHolding.portfolio_id == Portfolio.id)
+        .scalar_subquery()
+    )
+    has_holdings = (
+        select(StockHolding.id)
+        .where(StockHolding.portfolio_id == Portfolio.id)
+        .exists()
+    )
+    portfolios_result = db.execute(
+        update(Portfolio)
+        .where(has_holdings)
+        .values(
+            market_value=Portfolio.market_value + value_delta,
+            total_value=Portfolio.total_value + value_delta
+        )
+        .execution_options(synchronize_session=False, market_wide=True)
+    )
+    
+    # Holding value = shares * latest price, correlated on stock_id
+    holdings_result = db.execute(
+        update(StockHolding)
+        .values(current_value=StockHolding.shares * stock_price)
+        .execution_options(synchronize_session=False)
+    )
+    
+    return {
+        "holdings_updated": holdings_result.rowcount,
+        "portfolios_updated": portfolios_result.rowcount,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+
+def reconcile_portfolios(db: Session, fix: bool = False, tolerance: float = 0.01) -> dict:
+    """Compare stored portfolio aggregates with their holdings and optionally repair drift"""
+    actual = (
+        select(
+            StockHolding.portfolio_id,
+            func.sum(StockHolding.current_value).label("market_value"),
+            func.sum(StockHolding.shares * StockHolding.average_price).label("cost_basis")
+        )
+        .group_by(StockHolding.portfolio_id)
+        .subquery()
+    )
+    rows = db.execute(
+        select(
+            Portfolio.id,
+            Portfolio.cash_balance,
+            Portfolio.market_value,
+            Portfolio.cost_basis,
+            Portfolio.total_value,
+            func.coalesce(actual.c.market_value, 0.0),
+            func.coalesce(actual.c.cost_basis, 0.0)
+        ).outerjoin(actual, actual.c.portfolio_id == Portfolio.id)
+    ).all()
+    
+    drift = []
+    drifted_ids = set()
+    for portfolio_id, cash, market_value, cost_basis, total_value, actual_market, actual_cost in rows:
+        expected = {
+            "market_value": (market_value or 0.0, actual_market),
+            "cost_basis": (cost_basis or 0.0, actual_cost),
+            "total_value": (total_value or 0.0, (cash or 0.0) + actual_market)
+        }
+        for field, (stored, value) in expected.items():
+            if abs(stored - value) > tolerance:
+                drift.append({"portfolio_id": portfolio_id, "field": field, "stored": stored, "actual": value})
+                drifted_ids.add(portfolio_id)
+    
+    if fix and drifted_ids:
+        # Recompute in SQL so trades committed since the scan are not overwritten
+        market_value = (
+            select(func.coalesce(func.sum(StockHolding.current_value), 0.0))
+            .where(StockHolding.portfolio_id == Portfolio.id)
+            .scalar_subquery()
+        )
+        cost_basis = (
+            select(func.coalesce(func.sum(StockHolding.shares * StockHolding.average_price), 0.0))
+            .where(StockHolding.portfolio_id == Portfolio.id)
+            .scalar_subquery()
+        )
+        db.execute(
+            update(Portfolio)
+            .where(Portfolio.id.in_(drifted_ids))
+            .values(
+                market_value=market_value,
+                cost_basis=cost_basis,
+                total_value=Portfolio.cash_balance + market_value
+            )
+            .execution_options(synchronize_session=False)
+        )
+    
+    return {"portfolios_checked": len(rows), "fixed": fix, "drift": drift}
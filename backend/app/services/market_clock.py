@@ -0,0 +1,181 @@
+"""
+Background market clock: one price tick at a time across all workers
+"""
+
+from sqlalchemy import update, or_
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import Optional
+import asyncio
+import logging
+import os
+import socket
+import uuid
+
+from ..database import SessionLocal
+from ..models import MarketState
+from .compaction import compact_ledger
+from .market import advance_market, ensure_market_state, reconcile_portfolios
+from .quotes import get_snapshot, rebuild_snapshot
+
+logger = logging.getLogger(__name__)
+
+MARKET_TICK_SECONDS = float(os.getenv("MARKET_TICK_SECONDS", "300"))  # 0 disables the clock
+MARKET_TICK_LOCK_SECONDS = float(os.getenv("MARKET_TICK_LOCK_SECONDS", "300"))
+RECONCILE_EVERY_TICKS = int(os.getenv("RECONCILE_EVERY_TICKS", "100"))  # 0 disables reconciliation
+COMPACT_EVERY_TICKS = int(os.getenv("COMPACT_EVERY_TICKS", "288"))  # 0 disables ledger compaction
+
+def acquire_tick_lock(db: Session, owner: str, min_gap: float = 0) -> bool:
+    """Take the market lease unless another worker holds it or ticked within min_gap seconds"""
+    ensure_market_state(db)
+    now = datetime.utcnow()
+    
+    conditions = [
+        MarketState.id == 1,
+        or_(
+            MarketState.tick_lock_owner.is_(None),
+            MarketState.tick_lock_expires_at < now,
+            MarketState.tick_lock_owner == owner
+        )
+    ]
+    if min_gap > 0:
+        conditions.append(or_(
+            MarketState.last_tick_at.is_(None),
+            MarketState.last_tick_at <= now - timedelta(seconds=min_gap)
+        ))
+    
+    result = db.execute(
+        update(MarketState)
+        .where(*conditions)
+        .values(
+            tick_lock_owner=owner,
+            tick_lock_expires_at=now + timedelta(seconds=MARKET_TICK_LOCK_SECONDS)
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+def release_tick_lock(db: Session, owner: str):
+    """Give up the market lease if this worker still holds it"""
+    db.execute(
+        update(MarketState)
+        .where(MarketState.id == 1, MarketState.tick_lock_owner == owner)
+        .values(tick_lock_owner=None, tick_lock_expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+class MarketClock:
+    """Ticks prices on an interval and serializes every manual price update"""
+    
+    def __init__(self, interval: float = MARKET_TICK_SECONDS):
+        self.interval = interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock: Optional[asyncio.Lock] = None
+        self._pending_tick: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+        self._ticks_since_reconcile = 0
+        self._ticks_since_compaction = 0
+    
+    async def start(self):
+        """Start ticking in the background (called from the app lifespan)"""
+        self._lock = asyncio.Lock()
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the background loop"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def tick(self) -> Optional[dict]:
+        """Run one trading day, joining a tick that is already queued or running"""
+        if self._pending_tick is None or self._pending_tick.done():
+            self._pending_tick = asyncio.create_task(self._run_exclusive(days=1))
+        return await asyncio.shield(self._pending_tick)
+    
+    async def advance(self, days: int) -> Optional[dict]:
+        """Run several trading days once no other update is in progress"""
+        return await self._run_exclusive(days=days)
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                # Skip if any worker ticked within the last half interval
+                result = await self._run_exclusive(days=1, min_gap=self.interval / 2)
+                if result is not None:
+                    self._ticks_since_reconcile += 1
+                    if RECONCILE_EVERY_TICKS and self._ticks_since_reconcile >= RECONCILE_EVERY_TICKS:
+                        self._ticks_since_reconcile = 0
+                        await asyncio.to_thread(self._reconcile)
+                    self._ticks_since_compaction += 1
+                    if COMPACT_EVERY_TICKS and self._ticks_since_compaction >= COMPACT_EVERY_TICKS:
+                        self._ticks_since_compaction = 0
+                        await asyncio.to_thread(self._compact)
+                # Followers pick up the leader's tick and stream it to their clients
+                await asyncio.to_thread(self._refresh_quotes)
+            except Exception:
+                logger.exception("Market clock tick failed")
+    
+    async def _run_exclusive(self, days: int, min_gap: float = 0) -> Optional[dict]:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            return await asyncio.to_thread(self._advance, days, min_gap)
+    
+    def _advance(self, days: int, min_gap: float) -> Optional[dict]:
+        """Advance the market under the database lease; None if another worker holds it"""
+        db = SessionLocal()
+        try:
+            if not acquire_tick_lock(db, self.worker_id, min_gap):
+                return None
+            try:
+                result = advance_market(db, days=days)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                release_tick_lock(db, self.worker_id)
+            
+            rebuild_snapshot(db)
+            return result
+        finally:
+            db.close()
+    
+    def _reconcile(self):
+        """Repair any drift in incrementally maintained portfolio aggregates"""
+        db = SessionLocal()
+        try:
+            report = reconcile_portfolios(db, fix=True)
+            db.commit()
+            if report["drift"]:
+                logger.warning("Repaired drift in %d portfolio aggregates", len(report["drift"]))
+        finally:
+            db.close()
+    
+    def _compact(self):
+        """Roll old weekly-simulation transactions into weekly statements"""
+        db = SessionLocal()
+        try:
+            report = compact_ledger(db)
+            if report["transactions_compacted"]:
+                logger.info("Compacted %d transactions", report["transactions_compacted"])
+        finally:
+            db.close()
+    
+    def _refresh_quotes(self):
+        db = SessionLocal()
+        try:
+            get_snapshot(db)
+        finally:
+            db.close()
+
+market_clock = MarketClock()
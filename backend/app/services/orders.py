@@ -0,0 +1,110 @@
+"""
+Matching engine for resting limit and stop orders
+"""
+
+from sqlalchemy import select, update, union_all
+from sqlalchemy.orm import Session
+from datetime import datetime
+from collections import defaultdict
+
+from ..models import Order, Portfolio
+from ..schemas import StockOrder
+from .trading import execute_orders
+
+# (side, order_type, fires when the trigger is at or above the low / at or below the high)
+#   buy limit:  price fell to the limit    -> trigger_price >= low
+#   sell stop:  price fell to the stop     -> trigger_price >= low
+#   sell limit: price rose to the limit    -> trigger_price <= high
+#   buy stop:   price rose to the stop     -> trigger_price <= high
+FALLING_TRIGGERS = (("buy", "limit"), ("sell", "stop"))
+RISING_TRIGGERS = (("sell", "limit"), ("buy", "stop"))
+
+# Stocks per query: four arms each, within SQLite's 500-term compound SELECT limit
+TRIGGER_QUERY_STOCKS = 125
+
+def trigger_query(lows: dict[int, float], highs: dict[int, float]):
+    """One arm per stock and order kind, each with constant bounds so it seeks
+    ix_orders_open_trigger on (stock_id, status, side, order_type) and a trigger_price range"""
+    return union_all(*[
+        select(Order.id).where(
+            Order.stock_id == stock_id,
+            Order.status == "open",
+            Order.side == side,
+            Order.order_type == order_type,
+            Order.trigger_price >= lows[stock_id] if (side, order_type) in FALLING_TRIGGERS
+            else Order.trigger_price <= highs[stock_id]
+        )
+        for stock_id in lows
+        for side, order_type in FALLING_TRIGGERS + RISING_TRIGGERS
+    ])
+
+def triggered_order_ids(db: Session, lows: dict[int, float], highs: dict[int, float]) -> list[int]:
+    """Ids of open orders whose trigger was crossed; reads only the crossed index entries"""
+    stock_ids = list(lows)
+    order_ids = []
+    for first in range(0, len(stock_ids), TRIGGER_QUERY_STOCKS):
+        batch = stock_ids[first:first + TRIGGER_QUERY_STOCKS]
+        order_ids.extend(db.scalars(trigger_query(
+            {stock_id: lows[stock_id] for stock_id in batch},
+            {stock_id: highs[stock_id] for stock_id in batch}
+        )))
+    return order_ids
+
+def fill_price(order: Order, price: float) -> float:
+    """Market price at the tick, never worse than a limit order's limit"""
+    if order.order_type == "limit":
+        return min(price, order.trigger_price) if order.side == "buy" else max(price, order.trigger_price)
+    return price
+
+def match_orders(db: Session, prices: dict[int, float], lows: dict[int, float], highs: dict[int, float]) -> dict:
+    """Fill every open order crossed by the latest move; work scales with triggered orders"""
+    order_ids = triggered_order_ids(db, lows, highs)
+    if not order_ids:
+        return {"orders_filled": 0, "orders_rejected": 0}
+    
+    # Oldest orders fill first within each portfolio
+    orders = db.query(Order).filter(Order.id.in_(order_ids)).order_by(Order.created_at, Order.id).all()
+    by_portfolio = defaultdict(list)
+    for order in orders:
+        by_portfolio[order.portfolio_id].append(order)
+    portfolios = db.query(Portfolio).filter(Portfolio.id.in_(by_portfolio)).all()
+    
+    now = datetime.utcnow()
+    updates = []
+    rejected = 0
+    for portfolio in portfolios:
+        pending = by_portfolio[portfolio.id]
+        legs = [
+            StockOrder(
+                side=order.side,
+                stock_id=order.stock_id,
+                shares=order.shares,
+                price_per_share=fill_price(order, prices[order.stock_id])
+            )
+            for order in pending
+        ]
+        
+        rejections = {}
+        transactions = iter(execute_orders(db, portfolio.user_id, portfolio, legs, rejections=rejections))
+        
+        for index, (order, leg) in enumerate(zip(pending, legs)):
+            if index in rejections:
+                rejected += 1
+                updates.append({
+                    "id": order.id,
+                    "status": "rejected",
+                    "reject_reason": rejections[index],
+                    "closed_at": now
+                })
+            else:
+                updates.append({
+                    "id": order.id,
+                    "status": "filled",
+                    "fill_price": leg.price_per_share,
+                    "transaction_id": next(transactions).id,
+                    "closed_at": now
+                })
+    
+    db.execute(update(Order), updates)
+    db.flush()
+    return {"orders_filled": len(updates) - rejected, "orders_rejected": rejected}
@@ -0,0 +1,155 @@
+"""
+Append-only stock price history with daily and weekly OHLC rollups
+"""
+
+from sqlalchemy import insert, case, func
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+import numpy as np
+
+from ..database import upsert_insert
+from ..models import StockPriceHistory, StockPriceBar
+
+BAR_INTERVALS = ("day", "week")
+
+def naive_utc(timestamp: Optional[datetime]) -> Optional[datetime]:
+    """A timestamp as naive UTC, the form market times are stored and compared in"""
+    if timestamp is None or timestamp.tzinfo is None:
+        return timestamp
+    return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+
+def period_start(timestamp: datetime, interval: str) -> datetime:
+    """Start of the day or ISO week (Monday) containing a timestamp"""
+    day = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+def record_prices(db: Session, stock_ids: List[int], timestamps: List[datetime], closes: np.ndarray):
+    """Append closes (timestamps x stocks) to history and roll them into OHLC bars"""
+    db.execute(insert(StockPriceHistory), [
+        {"stock_id": stock_id, "price": price, "timestamp": timestamp}
+        for timestamp, day_closes in zip(timestamps, closes.tolist())
+        for stock_id, price in zip(stock_ids, day_closes)
+    ])
+    
+    for interval in BAR_INTERVALS:
+        _rollup(db, interval, stock_ids, timestamps, closes)
+
+def _rollup(db: Session, interval: str, stock_ids: List[int], timestamps: List[datetime], closes: np.ndarray):
+    """Merge new closes into the bars of one interval with a single upsert"""
+    # Timestamps are ascending, so each period is a contiguous block of rows
+    periods = [period_start(timestamp, interval) for timestamp in timestamps]
+    boundaries = [0] + [i for i in range(1, len(periods)) if periods[i] != periods[i - 1]] + [len(periods)]
+    
+    rows = []
+    for first, last in zip(boundaries[:-1], boundaries[1:]):
+        block = closes[first:last]
+        for stock_id, open_, high, low, close in zip(
+            stock_ids,
+            block[0].tolist(),
+            block.max(axis=0).tolist(),
+            block.min(axis=0).tolist(),
+            block[-1].tolist()
+        ):
+            rows.append({
+                "stock_id": stock_id,
+                "interval": interval,
+                "period_start": periods[first],
+                "open": open_,
+                "high": high,
+                "low": low,
+                "close": close
+            })
+    
+    # Existing bars keep their open and widen their range
+    stmt = upsert_insert(db, StockPriceBar.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["stock_id", "interval", "period_start"],
+        set_={
+            "high": case((stmt.excluded.high > StockPriceBar.high, stmt.excluded.high), else_=StockPriceBar.high),
+            "low": case((stmt.excluded.low < StockPriceBar.low, stmt.excluded.low), else_=StockPriceBar.low),
+            "close": stmt.excluded.close
+        }
+    )
+    db.execute(stmt, rows)
+
+def get_price_bars(
+    db: Session,
+    stock_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: Optional[str] = None,
+    max_points: int = 500
+) -> tuple[str, list[dict]]:
+    """Return (resolution, bars) for a range, picking the coarsest series that fits"""
+    # Query strings may carry an offset; stored and aggregated timestamps are naive UTC
+    start, end = naive_utc(start), naive_utc(end)
+    if resolution is None:
+        resolution = _pick_resolution(db, stock_id, start, end, max_points)
+    
+    if resolution == "tick":
+        query = db.query(StockPriceHistory.timestamp, StockPriceHistory.price).filter(
+            StockPriceHistory.stock_id == stock_id
+        )
+        if start:
+            query = query.filter(StockPriceHistory.timestamp >= start)
+        if end:
+            query = query.filter(StockPriceHistory.timestamp <= end)
+        # Most recent ticks first so the limit keeps the latest ones
+        rows = query.order_by(StockPriceHistory.timestamp.desc()).limit(max_points).all()
+        bars = [
+            {"timestamp": row.timestamp, "open": row.price, "high": row.price, "low": row.price, "close": row.price}
+            for row in reversed(rows)
+        ]
+        return resolution, bars
+    
+    query = db.query(StockPriceBar).filter(
+        StockPriceBar.stock_id == stock_id,
+        StockPriceBar.interval == resolution
+    )
+    if start:
+        query = query.filter(StockPriceBar.period_start >= period_start(start, resolution))
+    if end:
+        query = query.filter(StockPriceBar.period_start <= end)
+    
+    bars = [
+        {"timestamp": bar.period_start, "open": bar.open, "high": bar.high, "low": bar.low, "close": bar.close}
+        for bar in query.order_by(StockPriceBar.period_start).all()
+    ]
+    return resolution, _downsample(bars, max_points)
+
+def _pick_resolution(db: Session, stock_id: int, start: Optional[datetime], end: Optional[datetime], max_points: int) -> str:
+    """Use daily bars when the range fits in max_points days, otherwise weekly"""
+    if start is None or end is None:
+        first, last = db.query(
+            func.min(StockPriceBar.period_start), func.max(StockPriceBar.period_start)
+        ).filter(
+            StockPriceBar.stock_id == stock_id,
+            StockPriceBar.interval == "day"
+        ).one()
+        start = start or first
+        end = end or last
+    
+    if start is None or end is None or (end - start).days + 1 <= max_points:
+        return "day"
+    return "week"
+
+def _downsample(bars: list[dict], max_points: int) -> list[dict]:
+    """Merge consecutive bars so that at most max_points remain"""
+    if len(bars) <= max_points:
+        return bars
+    
+    size = -(-len(bars) // max_points)  # Ceiling division
+    merged = []
+    for i in range(0, len(bars), size):
+        group = bars[i:i + size]
+        merged.append({
+            "timestamp": group[0]["timestamp"],
+            "open": group[0]["open"],
+            "high": max(bar["high"] for bar in group),
+            "low": min(bar["low"] for bar in group),
+            "close": group[-1]["close"]
+        })
+    return merged
@@ -0,0 +1,190 @@
+"""
+Monte Carlo projections of a student's finances
+"""
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+
+from ..models import FinancialProfile, Portfolio, StockHolding, Stock
+from .market import DEFAULT_DRIFT, DEFAULT_VOLATILITY
+from .weekly import WEEKS_PER_YEAR
+from .events import deck_for_user
+from .tax_rules import get_tax_rules
+
+TRADING_DAYS_PER_WEEK = 5
+PROJECTION_PERCENTILES = (5, 25, 50, 75, 95)
+MAX_PROJECTION_POINTS = 105  # Points returned per band, evenly spaced over the horizon
+PATHS_PER_CHUNK = 1000  # Bounds the (paths, weeks, events) draw held in memory at once
+PROJECTION_WORKERS = int(os.getenv("PROJECTION_WORKERS", str(min(4, os.cpu_count() or 1))))
+PARALLEL_MIN_PATH_WEEKS = int(os.getenv("PROJECTION_PARALLEL_MIN_PATH_WEEKS", "2000000"))
+PROJECTION_CACHE_SIZE = 256
+
+_cache: "OrderedDict[str, dict]" = OrderedDict()
+_cache_lock = threading.Lock()
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def projection_state(db: Session, profile: FinancialProfile) -> dict:
+    """Everything a projection depends on, as plain JSON-serializable values"""
+    career = profile.career
+    portfolio = db.query(
+        func.coalesce(func.sum(Portfolio.cash_balance), 0.0),
+        func.coalesce(func.sum(Portfolio.market_value), 0.0)
+    ).filter(Portfolio.user_id == profile.user_id).one()
+    
+    # Expected weekly return and volatility of the holdings, weighted by value
+    holdings = db.query(StockHolding.current_value, Stock.drift, Stock.volatility).join(
+        Stock, Stock.id == StockHolding.stock_id
+    ).join(
+        Portfolio, Portfolio.id == StockHolding.portfolio_id
+    ).filter(Portfolio.user_id == profile.user_id).all()
+    weights = np.array([holding.current_value or 0.0 for holding in holdings], dtype=float)
+    if weights.sum() > 0:
+        weights = weights / weights.sum()
+        drift = float(np.dot(weights, [DEFAULT_DRIFT if h.drift is None else h.drift for h in holdings]))
+        volatility = float(np.dot(weights, [DEFAULT_VOLATILITY if h.volatility is None else h.volatility for h in holdings]))
+    else:
+        drift, volatility = DEFAULT_DRIFT, DEFAULT_VOLATILITY
+    
+    events = deck_for_user(db, profile.user_id)
+    return {
+        "tax_year": get_tax_rules().tax_year,
+        "salary": profile.current_salary or 0.0,
+        "salary_min": career.base_salary_min if career else profile.current_salary or 0.0,
+        "salary_max": career.base_salary_max if career else profile.current_salary or 0.0,
+        "loan_balance": profile.student_loan_balance or 0.0,
+        "housing_cost": profile.housing_weekly_cost or 0.0,
+        "other_expenses": profile.weekly_expenses or 0.0,
+        "savings": profile.savings_balance or 0.0,
+        "fixed_assets": (profile.emergency_fund or 0.0) + (profile.property_value or 0.0),
+        "portfolio_cash": float(portfolio[0]),
+        "portfolio_market_value": float(portfolio[1]),
+        "weekly_return": drift * TRADING_DAYS_PER_WEEK,
+        "weekly_volatility": volatility * np.sqrt(TRADING_DAYS_PER_WEEK),
+        "events": [
+            [float(p), float(low), float(high), float(sign)]
+            for p, low, high, sign in zip(events.probability, events.amount_min, events.amount_max, events.sign)
+        ]
+    }
+
+def state_hash(state: dict, weeks: int, paths: int) -> str:
+    """Stable hash of a projection's inputs"""
+    payload = json.dumps({"state": state, "weeks": weeks, "paths": paths}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def simulate_paths(state: dict, weeks: int, paths: int, points: np.ndarray, seed: np.random.SeedSequence) -> Dict[str, np.ndarray]:
+    """Simulate paths of weekly finances, returning (paths, points) arrays of net worth and savings"""
+    rng = np.random.default_rng(seed)
+    
+    # Career uncertainty: each future draws its salary from the career's range
+    salary = rng.uniform(state["salary_min"], state["salary_max"], size=paths)
+    weekly_income = salary / WEEKS_PER_YEAR
+    rules = get_tax_rules(state["tax_year"])
+    tax = rules.income_tax(salary) / WEEKS_PER_YEAR
+    loan_payment = rules.student_loan_payment(state["loan_balance"], salary) / WEEKS_PER_YEAR
+    
+    # Opening loan balance of every week; repayments stop once it reaches zero
+    week_index = np.arange(weeks)
+    loan_before = np.maximum(state["loan_balance"] - np.outer(loan_payment, week_index), 0.0)
+    payments = np.where(loan_before > 0, loan_payment[:, None], 0.0)
+    loan_after = np.maximum(loan_before - payments, 0.0)
+    
+    event_impact = np.zeros((paths, weeks))
+    if state["events"]:
+        probability, low, high, sign = np.array(state["events"]).T
+        path, week, event = np.nonzero(rng.random((paths, weeks, len(probability))) < probability)
+        # Amounts are drawn only for the events that fired
+        amounts = rng.uniform(low[event], high[event]) * sign[event]
+        np.add.at(event_impact, (path, week), amounts)
+    
+    remaining = (
+        (weekly_income - tax)[:, None] - payments
+        - state["housing_cost"] - state["other_expenses"] + event_impact
+    )
+    savings = state["savings"] + np.cumsum(np.maximum(remaining, 0.0), axis=1)  # Can't have negative savings
+    
+    returns = rng.normal(state["weekly_return"], state["weekly_volatility"], size=(paths, weeks))
+    market_value = state["portfolio_market_value"] * np.cumprod(1 + returns, axis=1)
+    
+    net_worth = savings + state["fixed_assets"] - loan_after + state["portfolio_cash"] + market_value
+    return {"net_worth": net_worth[:, points], "savings": savings[:, points]}
+
+def _simulate_chunk(args) -> Dict[str, np.ndarray]:
+    return simulate_paths(*args)
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PROJECTION_WORKERS)
+        return _pool
+
+def shutdown_pool():
+    """Stop the worker processes, if any were started"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+def run_projection(state: dict, weeks: int, paths: int) -> dict:
+    """Simulate paths in chunks, in worker processes when the request is large, and reduce to bands.
+    
+    The seed comes from the state hash and every chunk gets its own child seed,
+    so the result is the same however the chunks are scheduled.
+    """
+    key = state_hash(state, weeks, paths)
+    points = np.unique(np.linspace(0, weeks - 1, min(weeks, MAX_PROJECTION_POINTS)).round().astype(int))
+    
+    chunk_sizes = [PATHS_PER_CHUNK] * (paths // PATHS_PER_CHUNK)
+    if paths % PATHS_PER_CHUNK:
+        chunk_sizes.append(paths % PATHS_PER_CHUNK)
+    seeds = np.random.SeedSequence(int(key[:32], 16)).spawn(len(chunk_sizes))
+    jobs = [(state, weeks, size, points, seed) for size, seed in zip(chunk_sizes, seeds)]
+    
+    if len(jobs) > 1 and PROJECTION_WORKERS > 1 and paths * weeks >= PARALLEL_MIN_PATH_WEEKS:
+        chunks = list(_get_pool().map(_simulate_chunk, jobs))
+    else:
+        chunks = [_simulate_chunk(job) for job in jobs]
+    
+    bands = {}
+    for series in ("net_worth", "savings"):
+        values = np.concatenate([chunk[series] for chunk in chunks])
+        percentiles = np.percentile(values, PROJECTION_PERCENTILES, axis=0)
+        bands[series] = {
+            f"p{percentile}": np.round(row, 2).tolist()
+            for percentile, row in zip(PROJECTION_PERCENTILES, percentiles)
+        }
+    
+    return {
+        "state_hash": key,
+        "weeks": weeks,
+        "paths": paths,
+        "points": (points + 1).tolist(),  # Week numbers from now, 1-based
+        "net_worth": bands["net_worth"],
+        "savings": bands["savings"]
+    }
+
+def get_projection(state: dict, weeks: int, paths: int) -> dict:
+    """Projection for a state, reusing the result for an identical state"""
+    key = state_hash(state, weeks, paths)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            return {**cached, "cached": True}
+    
+    projection = run_projection(state, weeks, paths)
+    with _cache_lock:
+        _cache[key] = projection
+        while len(_cache) > PROJECTION_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return {**projection, "cached": False}
@@ -0,0 +1,98 @@
+"""
+Process-local quote snapshot served to stock list and detail reads
+"""
+
+from sqlalchemy.orm import Session
+from dataclasses import dataclass, field
+from typing import Optional
+import json
+import os
+import threading
+import time
+
+from ..models import Stock
+from ..schemas import Stock as StockSchema
+from .market import get_market_version
+from .broadcast import price_broadcaster, format_event
+
+# How often a worker checks the database for price updates made by other workers
+QUOTE_CHECK_SECONDS = float(os.getenv("QUOTE_CHECK_SECONDS", "1"))
+
+@dataclass
+class QuoteSnapshot:
+    """Serialized quotes for one market version"""
+    version: int
+    etag: str
+    body: bytes  # JSON array of every stock
+    stocks: dict[int, bytes]  # JSON object per stock id
+    prices: dict[int, tuple]  # (price, change, change percent) per stock id
+    checked_at: float = field(default_factory=time.monotonic)
+
+_snapshot: Optional[QuoteSnapshot] = None
+_lock = threading.Lock()
+
+def make_etag(version: int) -> str:
+    """ETag for a market version"""
+    return f'"market-{version}"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match list against an ETag; * matches any version"""
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+def rebuild_snapshot(db: Session) -> QuoteSnapshot:
+    """Serialize current quotes and swap them in as the active snapshot"""
+    global _snapshot
+    
+    version = get_market_version(db)
+    stocks = {}
+    prices = {}
+    for stock in db.query(Stock).order_by(Stock.id).all():
+        stocks[stock.id] = StockSchema.model_validate(stock).model_dump_json().encode()
+        prices[stock.id] = (stock.current_price, stock.daily_change, stock.daily_change_percent)
+    
+    snapshot = QuoteSnapshot(
+        version=version,
+        etag=make_etag(version),
+        body=b"[" + b",".join(stocks.values()) + b"]",
+        stocks=stocks,
+        prices=prices
+    )
+    
+    with _lock:
+        # Never replace a newer snapshot with an older one
+        previous = _snapshot
+        if previous is not None and snapshot.version < previous.version:
+            return previous
+        _snapshot = snapshot
+    
+    if previous is None or snapshot.version > previous.version:
+        publish_delta(previous, snapshot)
+    return snapshot
+
+def publish_delta(previous: Optional[QuoteSnapshot], snapshot: QuoteSnapshot):
+    """Push the quotes that changed between two snapshots to streaming clients"""
+    previous_prices = previous.prices if previous else {}
+    changed = [
+        [stock_id, *quote]
+        for stock_id, quote in snapshot.prices.items()
+        if previous_prices.get(stock_id) != quote
+    ]
+    data = json.dumps({"v": snapshot.version, "q": changed}, separators=(",", ":"))
+    price_broadcaster.publish(format_event("prices", data))
+
+def get_snapshot(db: Session) -> QuoteSnapshot:
+    """Return the active snapshot, rebuilding it if the market has moved on"""
+    snapshot = _snapshot
+    if snapshot is None:
+        return rebuild_snapshot(db)
+    
+    if time.monotonic() - snapshot.checked_at >= QUOTE_CHECK_SECONDS:
+        if get_market_version(db) != snapshot.version:
+            return rebuild_snapshot(db)
+        snapshot.checked_at = time.monotonic()
+    
+    return snapshot
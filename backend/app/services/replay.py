@@ -0,0 +1,200 @@
+"""
+Historical market replay from memory-mapped price files
+
+A dataset directory holds:
+    meta.json          {"start": "YYYY-MM-DD", "symbols": [...]}
+    closes.npy         float32 (calendar days, symbols), forward-filled, NaN before a symbol lists
+    trading_days.npy   int32 row index of every trading day, in order
+    trading_rank.npy   int32 per calendar day, number of trading days before it
+
+Rows are one per calendar day, so a date maps straight to a row and from there
+to its trading-day ordinal. Arrays are opened with mmap_mode="r" and only the rows
+being replayed are paged in.
+
+Build a dataset from a long-format CSV (date,symbol,close) with:
+    python -m app.services.replay prices.csv data/replay
+"""
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from datetime import date, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Tuple
+import csv
+import json
+import os
+import sys
+import numpy as np
+
+from ..models import MarketState
+
+MARKET_MODE = os.getenv("MARKET_MODE", "random")  # random or replay
+MARKET_REPLAY_DIR = os.getenv("MARKET_REPLAY_DIR", "data/replay")
+
+class ReplayError(Exception):
+    """Replay mode is misconfigured or the requested date is outside the dataset"""
+
+class ReplayDataset:
+    """Read-only view over a replay dataset directory"""
+    
+    def __init__(self, path: str):
+        root = Path(path)
+        try:
+            meta = json.loads((root / "meta.json").read_text())
+            self.closes = np.load(root / "closes.npy", mmap_mode="r")
+            self.trading_days = np.load(root / "trading_days.npy", mmap_mode="r")
+            self.trading_rank = np.load(root / "trading_rank.npy", mmap_mode="r")
+        except (OSError, ValueError) as e:
+            raise ReplayError(f"Cannot open replay dataset at {path}: {e}")
+        
+        self.start = date.fromisoformat(meta["start"])
+        self.symbols = meta["symbols"]
+        self.columns = {symbol: column for column, symbol in enumerate(self.symbols)}
+    
+    @property
+    def end(self) -> date:
+        return self.start + timedelta(days=len(self.closes) - 1)
+    
+    @property
+    def trading_day_count(self) -> int:
+        return len(self.trading_days)
+    
+    def date_of(self, ordinal: int) -> Optional[date]:
+        """Calendar date of a trading-day ordinal"""
+        if not 0 <= ordinal < len(self.trading_days):
+            return None
+        return self.start + timedelta(days=int(self.trading_days[ordinal]))
+    
+    def seek(self, day: date) -> int:
+        """Ordinal of the first trading day on or after a date, in O(1)"""
+        row = (day - self.start).days
+        if not 0 <= row < len(self.closes):
+            raise ReplayError(f"{day} is outside the dataset ({self.start} to {self.end})")
+        return int(self.trading_rank[row])
+    
+    def window(self, ordinal: int, days: int, symbols: List[str]) -> Tuple[List[date], np.ndarray]:
+        """Dates and closes of up to days trading days from ordinal, one column per symbol.
+        
+        Symbols missing from the dataset come back as NaN columns.
+        """
+        rows = np.asarray(self.trading_days[ordinal:ordinal + days])
+        columns = np.array([self.columns.get(symbol, -1) for symbol in symbols], dtype=np.intp)
+        known = columns >= 0
+        
+        closes = np.full((len(rows), len(symbols)), np.nan)
+        if len(rows) and known.any():
+            # Fancy indexing the memory map pages in only the selected rows
+            closes[:, known] = self.closes[rows][:, columns[known]]
+        
+        dates = [self.start + timedelta(days=int(row)) for row in rows]
+        return dates, closes
+
+def replay_enabled() -> bool:
+    return MARKET_MODE == "replay"
+
+@lru_cache(maxsize=1)
+def get_dataset() -> ReplayDataset:
+    """The configured dataset, opened once per process"""
+    return ReplayDataset(MARKET_REPLAY_DIR)
+
+def replay_closes(db: Session, symbols: List[str], prices: np.ndarray, days: int) -> Tuple[List[date], np.ndarray]:
+    """Next closes from the replay cursor, advancing it past the rows returned.
+    
+    Stocks without data for a day keep their previous close.
+    """
+    dataset = get_dataset()
+    ordinal = db.query(MarketState.replay_position).filter(MarketState.id == 1).scalar() or 0
+    dates, closes = dataset.window(ordinal, days, symbols)
+    if not dates:
+        return dates, closes
+    
+    missing = np.isnan(closes)
+    if missing.any():
+        # Carry each column's last known close forward, starting from the current price
+        filled = np.vstack([prices, closes])
+        for row in range(1, len(filled)):
+            filled[row] = np.where(np.isnan(filled[row]), filled[row - 1], filled[row])
+        closes = filled[1:]
+    
+    db.execute(
+        update(MarketState)
+        .where(MarketState.id == 1)
+        .values(replay_position=ordinal + len(dates))
+        .execution_options(synchronize_session=False)
+    )
+    return dates, closes
+
+def seek_replay(db: Session, day: date) -> dict:
+    """Move the replay cursor to the first trading day on or after a date"""
+    dataset = get_dataset()
+    ordinal = dataset.seek(day)
+    db.execute(
+        update(MarketState)
+        .where(MarketState.id == 1)
+        .values(replay_position=ordinal)
+        .execution_options(synchronize_session=False)
+    )
+    return replay_status(dataset, ordinal)
+
+def replay_status(dataset: ReplayDataset, ordinal: int) -> dict:
+    return {
+        "start": dataset.start,
+        "end": dataset.end,
+        "symbols": len(dataset.symbols),
+        "trading_days": dataset.trading_day_count,
+        "position": ordinal,
+        "next_date": dataset.date_of(ordinal)
+    }
+
+def build_dataset(csv_path: str, out_dir: str):
+    """Convert a long-format CSV of daily closes into a replay dataset.
+    
+    The CSV is read twice so that only the output arrays, written through
+    memory maps, are ever held at full size.
+    """
+    symbols = set()
+    first = last = None
+    with open(csv_path, newline="") as f:
+        for record in csv.DictReader(f):
+            day = date.fromisoformat(record["date"][:10])
+            symbols.add(record["symbol"])
+            first = day if first is None or day < first else first
+            last = day if last is None or day > last else last
+    if first is None:
+        raise ReplayError(f"{csv_path} has no rows")
+    
+    symbols = sorted(symbols)
+    columns = {symbol: column for column, symbol in enumerate(symbols)}
+    calendar_days = (last - first).days + 1
+    
+    root = Path(out_dir)
+    root.mkdir(parents=True, exist_ok=True)
+    closes = np.lib.format.open_memmap(
+        root / "closes.npy", mode="w+", dtype=np.float32, shape=(calendar_days, len(symbols))
+    )
+    closes[:] = np.nan
+    trading = np.zeros(calendar_days, dtype=bool)
+    
+    with open(csv_path, newline="") as f:
+        for record in csv.DictReader(f):
+            row = (date.fromisoformat(record["date"][:10]) - first).days
+            closes[row, columns[record["symbol"]]] = float(record["close"])
+            trading[row] = True
+    
+    # Forward-fill so any calendar day holds the latest close
+    for row in range(1, calendar_days):
+        gaps = np.isnan(closes[row])
+        closes[row, gaps] = closes[row - 1, gaps]
+    closes.flush()
+    
+    trading_days = np.flatnonzero(trading).astype(np.int32)
+    np.save(root / "trading_days.npy", trading_days)
+    np.save(root / "trading_rank.npy", (np.cumsum(trading) - trading).astype(np.int32))
+    (root / "meta.json").write_text(json.dumps({"start": first.isoformat(), "symbols": symbols}))
+    return {"symbols": len(symbols), "calendar_days": calendar_days, "trading_days": len(trading_days)}
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m app.services.replay <prices.csv> <output dir>")
+    print(build_dataset(sys.argv[1], sys.argv[2]))
@@ -0,0 +1,95 @@
+"""
+Counter-based random streams for reproducible simulation
+
+Every draw is a pure function of (seed, stream key, counter): the key names the
+entity (a stock, or a student) and the counter names the step (market day, or game
+week and event). Philox, a counter-based generator, is keyed and positioned
+directly, so results do not depend on batch size, process layout or call order.
+"""
+
+from sqlalchemy.orm import Session
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+
+from ..models import Classroom, MarketState, classroom_members
+
+MARKET_STREAM = 1
+WEEKLY_STREAM = 2
+UNIT = 2.0 ** -53
+EVENT_UNIFORMS = 2  # Whether an event fires, and its amount
+
+def _philox_key(seed: int, key: Sequence[int]) -> np.ndarray:
+    return np.random.SeedSequence([seed, *key]).generate_state(2, np.uint64)
+
+def _philox(seed: int, key: Sequence[int], counter: Sequence[int]) -> np.random.Philox:
+    return np.random.Philox(key=_philox_key(seed, key), counter=np.array(counter, dtype=np.uint64))
+
+def _to_unit(raw: np.ndarray) -> np.ndarray:
+    """Map raw 64-bit words to doubles strictly inside (0, 1)"""
+    return ((raw >> np.uint64(11)).astype(float) + 0.5) * UNIT
+
+def daily_normals(seed: int, key: Sequence[int], first_day: int, days: int) -> np.ndarray:
+    """One standard normal per day from first_day, each taken from that day's Philox block.
+    
+    A run of n days returns exactly what n single-day runs would.
+    """
+    if days == 0:
+        return np.empty(0)
+    raw = _philox(seed, key, [first_day, 0, 0, 0]).random_raw(4 * days).reshape(days, 4)
+    u1, u2 = _to_unit(raw[:, 0]), _to_unit(raw[:, 1])
+    # Box-Muller on the block's first two words
+    return np.sqrt(-2.0 * np.log(u1)) * np.cos(2.0 * np.pi * u2)
+
+def market_shocks(seed: int, stock_ids: List[int], first_day: int, days: int) -> np.ndarray:
+    """Standard normal shocks as a (days, stocks) array, one stream per stock"""
+    if not stock_ids:
+        return np.empty((days, 0))
+    return np.column_stack([
+        daily_normals(seed, (MARKET_STREAM, stock_id), first_day, days) for stock_id in stock_ids
+    ])
+
+def event_uniforms(
+    stream: Tuple[int, int], user_id: int, first_week: int, weeks: int, event_ids: List[int]
+) -> np.ndarray:
+    """EVENT_UNIFORMS uniforms per week and event for one student, as a (weeks, events, EVENT_UNIFORMS) array.
+    
+    Each event owns a Philox block range keyed by its id and each week one block in
+    it, so a draw depends only on (student, week, event): not on the batch, the run
+    length or the other events in the deck.
+    """
+    seed, scope = stream
+    draws = np.empty((weeks, len(event_ids), EVENT_UNIFORMS))
+    if weeks == 0 or not event_ids:
+        return draws
+    key = _philox_key(seed, (WEEKLY_STREAM, scope, user_id))
+    for column, event_id in enumerate(event_ids):
+        philox = np.random.Philox(key=key, counter=np.array([first_week, 0, event_id, 0], dtype=np.uint64))
+        raw = philox.random_raw(4 * weeks).reshape(weeks, 4)
+        draws[:, column] = _to_unit(raw[:, :EVENT_UNIFORMS])
+    return draws
+
+def market_seed(db: Session) -> Tuple[int, int]:
+    """Market seed and the next market day"""
+    row = db.query(MarketState.seed, MarketState.market_day).filter(MarketState.id == 1).one()
+    return row.seed or 0, row.market_day or 0
+
+def student_streams(db: Session, user_ids: List[int]) -> Dict[int, Tuple[int, int]]:
+    """Seed and scope per student: their first classroom's, else the market seed.
+    
+    A student draws from the same stream whether simulated alone or with a classroom.
+    """
+    market = db.query(MarketState.seed).filter(MarketState.id == 1).scalar() or 0
+    streams = {user_id: (market, 0) for user_id in user_ids}
+    rows = db.query(classroom_members.c.user_id, Classroom.id, Classroom.simulation_seed).join(
+        Classroom, Classroom.id == classroom_members.c.classroom_id
+    ).filter(
+        classroom_members.c.user_id.in_(user_ids)
+    ).order_by(Classroom.id.desc())
+    for row in rows:
+        # Descending, so the lowest classroom id is written last
+        streams[row.user_id] = (row.simulation_seed or 0, row.id)
+    return streams
+
+def student_stream(db: Session, user_id: int) -> Tuple[int, int]:
+    """Seed and scope for one student"""
+    return student_streams(db, [user_id])[user_id]
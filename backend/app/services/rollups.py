@@ -0,0 +1,127 @@
+"""
+Spending-by-category rollups per user and game week, kept in step with every ledger write
+"""
+
+from sqlalchemy import delete, func, literal, select, union_all
+from sqlalchemy.orm import Session
+from typing import Iterable, List
+
+from ..database import upsert_insert
+from ..models import CategoryRollup, FinancialProfile, Transaction, WeeklyStatement
+from .ledger import STATEMENT_LINES
+
+UNCATEGORIZED = "other"
+
+def current_week(user_id):
+    """The game week a user is in, as a correlated subquery: rows without a week count toward it"""
+    return func.coalesce(
+        select(FinancialProfile.weeks_played)
+        .where(FinancialProfile.user_id == user_id)
+        .limit(1)
+        .scalar_subquery(),
+        0
+    ) + 1
+
+def _upsert(db: Session):
+    """Upsert adding to the totals of any existing (user, week, category) rollup"""
+    table = CategoryRollup.__table__
+    stmt = upsert_insert(db, table)
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id", "week_number", "category"],
+        set_={
+            "total": table.c.total + stmt.excluded.total,
+            "transaction_count": table.c.transaction_count + stmt.excluded.transaction_count,
+            "updated_at": func.now()
+        }
+    )
+
+def stamp_weeks(db: Session, rows: Iterable[dict]) -> List[dict]:
+    """Tag ledger rows that have no week_number with their user's week in progress"""
+    rows = list(rows)
+    undated = {row["user_id"] for row in rows if row.get("week_number") is None}
+    if undated:
+        weeks = dict(db.execute(
+            select(FinancialProfile.user_id, FinancialProfile.weeks_played)
+            .where(FinancialProfile.user_id.in_(undated))
+        ).all())
+        for row in rows:
+            if row.get("week_number") is None:
+                row["week_number"] = (weeks.get(row["user_id"]) or 0) + 1
+    return rows
+
+def add_rows(db: Session, rows: Iterable[dict]) -> int:
+    """Add ledger rows (dicts with user_id, amount, and optionally category and week_number) in one executemany"""
+    rows = stamp_weeks(db, rows)
+    
+    totals = {}
+    for row in rows:
+        key = (row["user_id"], row["week_number"], row.get("category") or UNCATEGORIZED)
+        total, count = totals.get(key, (0.0, 0))
+        totals[key] = (total + row["amount"], count + 1)
+    if not totals:
+        return 0
+    
+    db.execute(_upsert(db), [
+        {
+            "user_id": user_id,
+            "week_number": week,
+            "category": category,
+            "total": total,
+            "transaction_count": count
+        }
+        for (user_id, week, category), (total, count) in totals.items()
+    ])
+    return len(totals)
+
+def add_statements(db: Session, statements: Iterable[dict]) -> int:
+    """Add weekly statements written instead of transactions, one row per non-zero category total"""
+    return add_rows(db, [
+        {
+            "user_id": statement["user_id"],
+            "week_number": statement["week_number"],
+            "category": column,
+            "amount": statement[column]
+        }
+        for statement in statements
+        for column, _ in STATEMENT_LINES
+        if statement[column]
+    ])
+
+def add_select(db: Session, rows) -> int:
+    """Add the ledger rows a SELECT of (user_id, week_number, category, amount) yields, with one INSERT ... SELECT"""
+    source = rows.subquery()
+    resolved = select(
+        source.c.user_id,
+        func.coalesce(source.c.week_number, current_week(source.c.user_id)).label("week_number"),
+        func.coalesce(source.c.category, UNCATEGORIZED).label("category"),
+        source.c.amount
+    ).subquery()
+    totals = select(
+        resolved.c.user_id,
+        resolved.c.week_number,
+        resolved.c.category,
+        func.sum(resolved.c.amount),
+        func.count()
+    ).where(resolved.c.user_id.is_not(None)).group_by(
+        resolved.c.user_id, resolved.c.week_number, resolved.c.category
+    )
+    return db.execute(
+        _upsert(db).from_select(["user_id", "week_number", "category", "total", "transaction_count"], totals)
+    ).rowcount
+
+def rebuild_rollups(db: Session) -> int:
+    """Recompute every rollup from raw transactions and compacted weekly statements; nothing is committed"""
+    db.execute(delete(CategoryRollup))
+    statement_lines = [
+        select(
+            WeeklyStatement.user_id,
+            WeeklyStatement.week_number,
+            literal(column).label("category"),
+            WeeklyStatement.__table__.c[column].label("amount")
+        ).where(WeeklyStatement.__table__.c[column] != 0)
+        for column, _ in STATEMENT_LINES
+    ]
+    added = add_select(db, select(
+        Transaction.user_id, Transaction.week_number, Transaction.category, Transaction.amount
+    ))
+    return added + add_select(db, union_all(*statement_lines))
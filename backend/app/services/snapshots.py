@@ -0,0 +1,56 @@
+"""
+Portfolio value snapshots written by the price-update path
+"""
+
+from sqlalchemy import select, insert, literal, func
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import List
+
+from ..models import Portfolio, PortfolioSnapshot, StockHolding, StockPriceHistory
+
+SNAPSHOT_COLUMNS = ["portfolio_id", "timestamp", "total_value", "market_value", "cash_balance"]
+
+def snapshot_portfolios(db: Session, timestamp: datetime) -> int:
+    """Record every portfolio's current value with one INSERT ... SELECT"""
+    result = db.execute(
+        insert(PortfolioSnapshot).from_select(
+            SNAPSHOT_COLUMNS,
+            select(
+                Portfolio.id,
+                literal(timestamp),
+                Portfolio.total_value,
+                Portfolio.market_value,
+                Portfolio.cash_balance
+            )
+        )
+    )
+    return result.rowcount
+
+def snapshot_intermediate_days(db: Session, timestamps: List[datetime]) -> int:
+    """Value portfolios at each recorded close between two timestamps with one INSERT ... SELECT.
+    
+    Holdings and cash are taken as they stand, which holds for the days inside a
+    single simulation run. Portfolios without holdings keep a flat value and are skipped.
+    """
+    if not timestamps:
+        return 0
+    
+    holdings_value = func.sum(StockHolding.shares * StockPriceHistory.price)
+    result = db.execute(
+        insert(PortfolioSnapshot).from_select(
+            SNAPSHOT_COLUMNS,
+            select(
+                Portfolio.id,
+                StockPriceHistory.timestamp,
+                Portfolio.cash_balance + holdings_value,
+                holdings_value,
+                Portfolio.cash_balance
+            )
+            .join(StockHolding, StockHolding.portfolio_id == Portfolio.id)
+            .join(StockPriceHistory, StockPriceHistory.stock_id == StockHolding.stock_id)
+            .where(StockPriceHistory.timestamp.between(timestamps[0], timestamps[-1]))
+            .group_by(Portfolio.id, StockPriceHistory.timestamp)
+        )
+    )
+    return result.rowcount
@@ -0,0 +1,109 @@
+"""
+Cached per-user dashboard summaries
+"""
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from collections import OrderedDict
+from typing import Optional, Tuple
+import threading
+
+from ..models import FinancialProfile, Portfolio, Transaction, User, WeeklyStatement
+from ..schemas import FinancialSummary
+from .cache import cache_versions, has_pending_writes, statement_values, watch
+from .ledger import page_transactions
+from .leaderboard import metric_values
+from .market import get_market_version
+
+SUMMARY_CACHE_SIZE = 4096
+RECENT_TRANSACTIONS = 10
+
+def build_summary(db: Session, user: User) -> Optional[FinancialSummary]:
+    """Profile, first portfolio and SQL-computed totals in one query, plus the latest ledger page"""
+    row = db.execute(
+        select(
+            FinancialProfile,
+            Portfolio,
+            metric_values(user.id)["net_worth"].label("net_worth"),
+            (
+                func.coalesce(FinancialProfile.net_weekly_income, 0.0)
+                - func.coalesce(FinancialProfile.housing_weekly_cost, 0.0)
+                - func.coalesce(FinancialProfile.weekly_expenses, 0.0)
+                - func.coalesce(FinancialProfile.student_loan_weekly_payment, 0.0)
+            ).label("weekly_cash_flow")
+        )
+        .outerjoin(Portfolio, Portfolio.user_id == FinancialProfile.user_id)
+        .where(FinancialProfile.user_id == user.id)
+        .order_by(Portfolio.id)
+        .limit(1)
+    ).first()
+    if row is None:
+        return None
+    
+    recent, _ = page_transactions(db, user.id, RECENT_TRANSACTIONS)
+    return FinancialSummary(
+        user=user,
+        financial_profile=row.FinancialProfile,
+        portfolio=row.Portfolio,
+        recent_transactions=recent,
+        net_worth=row.net_worth,
+        weekly_cash_flow=row.weekly_cash_flow
+    )
+
+def summary_key(user_id: int) -> str:
+    return f"summary:{user_id}"
+
+class SummaryCache:
+    """Built summaries per user, valid for one market version and one version of the user's data"""
+    
+    def __init__(self, size: int):
+        self.size = size
+        self._summaries: "OrderedDict[int, Tuple[Tuple[int, int], FinancialSummary]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, db: Session, user: User) -> Optional[FinancialSummary]:
+        # Versions are read before building, so a summary is never older than the version it is cached under.
+        # A session with uncommitted writes for the user builds its own and keeps it out of the cache
+        key = summary_key(user.id)
+        version = (get_market_version(db), cache_versions(db, [key])[key])
+        shared = not has_pending_writes(db, key)
+        with self._lock:
+            cached = self._summaries.get(user.id)
+            if shared and cached is not None and cached[0] == version:
+                self._summaries.move_to_end(user.id)
+                return cached[1]
+        
+        summary = build_summary(db, user)
+        if summary is None or not shared:
+            return summary
+        
+        with self._lock:
+            self._summaries[user.id] = (version, summary)
+            self._summaries.move_to_end(user.id)
+            while len(self._summaries) > self.size:
+                self._summaries.popitem(last=False)
+        return summary
+
+summaries = SummaryCache(SUMMARY_CACHE_SIZE)
+
+# A committed write to a user's account, profile, portfolio or ledger moves their
+# summary version, whether flushed by the ORM or run as a bulk statement. Market-wide
+# writes such as revaluations and dividends are marked market_wide and move the
+# market version instead.
+def _statement_keys(column: str):
+    def keys(orm_execute_state):
+        if orm_execute_state.execution_options.get("market_wide"):
+            return []
+        return [summary_key(user_id) for user_id in statement_values(orm_execute_state, column)]
+    return keys
+
+watch(
+    (FinancialProfile, Portfolio, Transaction, WeeklyStatement),
+    keys=lambda item: [summary_key(item.user_id)] if item.user_id is not None else [],
+    statement_keys=_statement_keys("user_id")
+)
+watch(
+    (User,),
+    keys=lambda item: [summary_key(item.id)] if item.id is not None else [],
+    statement_keys=_statement_keys("id")
+)
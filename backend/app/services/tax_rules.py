@@ -0,0 +1,86 @@
+"""
+Versioned NZ income tax and student loan rules, evaluated on scalars or NumPy arrays
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Union
+import json
+import os
+import numpy as np
+
+TAX_RULES_DIR = Path(__file__).resolve().parent.parent / "data" / "tax_rules"
+DEFAULT_TAX_YEAR = int(os.getenv("TAX_YEAR", "2024"))
+
+Income = Union[float, np.ndarray]
+
+class TaxRulesError(Exception):
+    """No rules file exists for a tax year, or it is malformed"""
+
+@dataclass(frozen=True)
+class TaxRules:
+    """One tax year's brackets with the tax due at the start of each bracket precomputed"""
+    tax_year: int
+    upper_bounds: np.ndarray  # Inclusive top of each bracket, inf for the last
+    lower_bounds: np.ndarray
+    rates: np.ndarray
+    bases: np.ndarray  # Tax on all income below each bracket
+    student_loan_threshold: float
+    student_loan_rate: float
+    
+    @classmethod
+    def from_file(cls, path: Path) -> "TaxRules":
+        try:
+            data = json.loads(path.read_text())
+            brackets = data["income_tax"]["brackets"]
+            upper_bounds = np.array(
+                [np.inf if bracket["up_to"] is None else bracket["up_to"] for bracket in brackets], dtype=float
+            )
+            rates = np.array([bracket["rate"] for bracket in brackets], dtype=float)
+            student_loan = data["student_loan"]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            raise TaxRulesError(f"Invalid tax rules file {path}: {e}")
+        
+        lower_bounds = np.concatenate([[0.0], upper_bounds[:-1]])
+        bases = np.concatenate([[0.0], np.cumsum(np.diff(lower_bounds) * rates[:-1])])
+        return cls(
+            tax_year=int(data["tax_year"]),
+            upper_bounds=upper_bounds,
+            lower_bounds=lower_bounds,
+            rates=rates,
+            bases=bases,
+            student_loan_threshold=float(student_loan["threshold"]),
+            student_loan_rate=float(student_loan["rate"])
+        )
+    
+    def income_tax(self, annual_income: Income) -> Income:
+        """Annual PAYE on one income or an array of incomes"""
+        income = np.asarray(annual_income, dtype=float)
+        # An income exactly on a bracket's upper bound belongs to that bracket
+        bracket = np.searchsorted(self.upper_bounds, income, side="left")
+        tax = self.bases[bracket] + (income - self.lower_bounds[bracket]) * self.rates[bracket]
+        return float(tax) if tax.ndim == 0 else tax
+    
+    def student_loan_payment(self, loan_balance: Income, annual_income: Income) -> Income:
+        """Annual compulsory repayment on the income above the threshold while a balance remains"""
+        income = np.asarray(annual_income, dtype=float)
+        balance = np.asarray(loan_balance, dtype=float)
+        payment = np.where(
+            (income < self.student_loan_threshold) | (balance <= 0),
+            0.0,
+            np.maximum(income - self.student_loan_threshold, 0.0) * self.student_loan_rate
+        )
+        return float(payment) if payment.ndim == 0 else payment
+
+def available_tax_years() -> List[int]:
+    return sorted(int(path.stem) for path in TAX_RULES_DIR.glob("*.json") if path.stem.isdigit())
+
+@lru_cache(maxsize=None)
+def get_tax_rules(tax_year: Optional[int] = None) -> TaxRules:
+    """Rules for a tax year, loaded from its data file once per process"""
+    year = DEFAULT_TAX_YEAR if tax_year is None else tax_year
+    path = TAX_RULES_DIR / f"{year}.json"
+    if not path.exists():
+        raise TaxRulesError(f"No tax rules for {year}; available years: {available_tax_years()}")
+    return TaxRules.from_file(path)
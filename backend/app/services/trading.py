@@ -0,0 +1,167 @@
+"""
+Order execution shared by single trades, batches and resting orders
+"""
+
+from sqlalchemy import insert, update, delete
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from ..models import Stock, Portfolio, StockHolding, Transaction
+from ..schemas import StockOrder
+from .rollups import add_rows, stamp_weeks
+
+class TradeError(Exception):
+    """An order that cannot be executed"""
+    
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+def execute_orders(
+    db: Session,
+    user_id: int,
+    portfolio: Portfolio,
+    orders: List[StockOrder],
+    rejections: Optional[dict] = None
+) -> List[Transaction]:
+    """Apply buys and sells in order within the caller's transaction; nothing is committed.
+    
+    Balances and share counts are changed with guarded in-SQL increments, so
+    concurrent trades on the same portfolio can never overdraw or oversell it.
+    Portfolio aggregates are adjusted by each order's delta, never recomputed.
+    A failing order raises TradeError, unless a rejections dict is passed, in which
+    case the failure is recorded under the order's index and the order is skipped.
+    """
+    stocks = {
+        stock.id: stock
+        for stock in db.query(Stock).filter(Stock.id.in_({order.stock_id for order in orders})).all()
+    }
+    
+    transaction_rows = []
+    for index, order in enumerate(orders):
+        try:
+            transaction_rows.append(_apply_order(db, user_id, portfolio.id, order, stocks))
+        except TradeError as e:
+            if rejections is None:
+                if len(orders) > 1:
+                    e.detail = f"Order {index + 1}: {e.detail}"
+                raise
+            rejections[index] = e.detail
+    
+    if not transaction_rows:
+        return []
+    
+    # Create all transaction records in one statement, in the week in progress
+    transaction_rows = stamp_weeks(db, transaction_rows)
+    add_rows(db, transaction_rows)
+    return db.scalars(
+        insert(Transaction).returning(Transaction, sort_by_parameter_order=True),
+        transaction_rows
+    ).all()
+
+def _apply_order(db: Session, user_id: int, portfolio_id: int, order: StockOrder, stocks: dict) -> dict:
+    """Validate and apply one order with guarded UPDATEs, returning its transaction row"""
+    stock = stocks.get(order.stock_id)
+    if not stock:
+        raise TradeError("Stock not found", status_code=404)
+    
+    total = order.shares * order.price_per_share
+    
+    if order.side == "buy":
+        # Debit cash only if the balance still covers the cost, applying aggregate deltas
+        value = order.shares * stock.current_price
+        debited = db.execute(
+            update(Portfolio)
+            .where(Portfolio.id == portfolio_id, Portfolio.cash_balance >= total)
+            .values(
+                cash_balance=Portfolio.cash_balance - total,
+                total_invested=Portfolio.total_invested + total,
+                cost_basis=Portfolio.cost_basis + total,
+                market_value=Portfolio.market_value + value,
+                total_value=Portfolio.total_value - total + value
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if debited.rowcount == 0:
+            raise TradeError("Insufficient funds")
+        
+        # Update existing holding (average price calculation), or create it
+        updated = db.execute(
+            update(StockHolding)
+            .where(StockHolding.portfolio_id == portfolio_id, StockHolding.stock_id == stock.id)
+            .values(
+                average_price=(StockHolding.shares * StockHolding.average_price + total)
+                / (StockHolding.shares + order.shares),
+                shares=StockHolding.shares + order.shares,
+                current_value=(StockHolding.shares + order.shares) * stock.current_price
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if updated.rowcount == 0:
+            # A concurrent first buy of the same stock hits the unique constraint and is retried
+            db.execute(insert(StockHolding).values(
+                portfolio_id=portfolio_id,
+                stock_id=stock.id,
+                shares=order.shares,
+                average_price=order.price_per_share,
+                current_value=order.shares * stock.current_price
+            ))
+        
+        amount = -total
+        description = f"Bought {order.shares} shares of {stock.symbol}"
+    else:
+        # Remove shares only if enough are still held
+        sold = db.execute(
+            update(StockHolding)
+            .where(
+                StockHolding.portfolio_id == portfolio_id,
+                StockHolding.stock_id == stock.id,
+                StockHolding.shares >= order.shares
+            )
+            .values(
+                shares=StockHolding.shares - order.shares,
+                current_value=(StockHolding.shares - order.shares) * stock.current_price
+            )
+            .returning(StockHolding.average_price)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if sold is None:
+            raise TradeError("Insufficient shares to sell")
+        
+        db.execute(
+            delete(StockHolding)
+            .where(
+                StockHolding.portfolio_id == portfolio_id,
+                StockHolding.stock_id == stock.id,
+                StockHolding.shares <= 0
+            )
+            .execution_options(synchronize_session=False)
+        )
+        value = order.shares * stock.current_price
+        db.execute(
+            update(Portfolio)
+            .where(Portfolio.id == portfolio_id)
+            .values(
+                cash_balance=Portfolio.cash_balance + total,
+                cost_basis=Portfolio.cost_basis - order.shares * sold.average_price,
+                market_value=Portfolio.market_value - value,
+                total_value=Portfolio.total_value + total - value
+            )
+            .execution_options(synchronize_session=False)
+        )
+        
+        amount = total
+        description = f"Sold {order.shares} shares of {stock.symbol}"
+    
+    return {
+        "user_id": user_id,
+        "portfolio_id": portfolio_id,
+        "stock_id": stock.id,
+        "transaction_type": order.side,
+        "amount": amount,
+        "shares": order.shares,
+        "price_per_share": order.price_per_share,
+        "description": description,
+        "category": "investment"
+    }
@@ -0,0 +1,326 @@
+"""
+Weekly financial simulation: income, PAYE tax, student loan, expenses and events
+"""
+
+from sqlalchemy import update, insert, select, case, bindparam, func
+from sqlalchemy.orm import Session
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+from ..models import FinancialProfile, Transaction, WeeklyStatement
+from .events import EventTable
+from .rng import EVENT_UNIFORMS, event_uniforms
+from .rollups import add_rows, add_statements
+from .tax_rules import get_tax_rules
+
+WEEKS_PER_YEAR = 52
+STATEMENT_CATEGORIES = ("income", "tax", "housing", "expense", "debt", "investment")
+
+def calculate_nz_tax(annual_income: float, tax_year: Optional[int] = None) -> float:
+    """Calculate New Zealand PAYE tax"""
+    return get_tax_rules(tax_year).income_tax(annual_income)
+
+def calculate_student_loan_payment(loan_balance: float, annual_income: float, tax_year: Optional[int] = None) -> float:
+    """Calculate annual student loan repayment (simplified NZ system)"""
+    return get_tax_rules(tax_year).student_loan_payment(loan_balance, annual_income)
+
+@dataclass
+class WeekResult:
+    """One simulated week for a set of students, one array element per student"""
+    gross_income: np.ndarray
+    tax_amount: np.ndarray
+    net_income: np.ndarray
+    student_loan_payment: np.ndarray
+    housing_cost: np.ndarray
+    other_expenses: np.ndarray
+    remaining_amount: np.ndarray
+    occurred: np.ndarray  # (students, events) bool
+
+def simulate_week_arrays(
+    salary: np.ndarray,
+    weekly_income: np.ndarray,
+    loan_balance: np.ndarray,
+    housing_cost: np.ndarray,
+    other_expenses: np.ndarray,
+    events: EventTable,
+    draws: np.ndarray,
+    eligible: Optional[np.ndarray] = None
+) -> WeekResult:
+    """Run one week for every row at once; draws come from event_uniforms, eligible masks each row's deck"""
+    rules = get_tax_rules()
+    tax_amount = rules.income_tax(salary) / WEEKS_PER_YEAR
+    loan_payment = rules.student_loan_payment(loan_balance, salary) / WEEKS_PER_YEAR
+    net_income = weekly_income - tax_amount - loan_payment
+    
+    # Every event for every row in one step: each event's first draw decides
+    # whether it fires, the second sets its amount
+    occurred = draws[:, :, 0] < events.probability
+    if eligible is not None:
+        occurred &= eligible
+    amounts = events.amount_min + draws[:, :, 1] * (events.amount_max - events.amount_min)
+    impacts = np.where(occurred, amounts * events.sign, 0.0)
+    
+    # Summed one event at a time, so events outside a row's deck add exact zeros
+    # and a row totals the same in any batch
+    event_impact = np.zeros(len(draws))
+    for column in range(impacts.shape[1]):
+        event_impact += impacts[:, column]
+    
+    return WeekResult(
+        gross_income=weekly_income,
+        tax_amount=tax_amount,
+        net_income=net_income,
+        student_loan_payment=loan_payment,
+        housing_cost=housing_cost,
+        other_expenses=other_expenses,
+        remaining_amount=net_income - housing_cost - other_expenses + event_impact,
+        occurred=occurred
+    )
+
+def week_transactions(user_id: int, week: WeekResult, index: int, week_number: int) -> List[dict]:
+    """Ledger rows for one student's week, as simulate_week writes them"""
+    transactions = [
+        {
+            "user_id": user_id,
+            "transaction_type": "salary",
+            "amount": float(week.gross_income[index]),
+            "description": "Weekly salary",
+            "category": "income"
+        },
+        {
+            "user_id": user_id,
+            "transaction_type": "tax",
+            "amount": -float(week.tax_amount[index]),
+            "description": "PAYE tax",
+            "category": "tax"
+        },
+        {
+            "user_id": user_id,
+            "transaction_type": "housing",
+            "amount": -float(week.housing_cost[index]),
+            "description": "Housing cost",
+            "category": "housing"
+        },
+        {
+            "user_id": user_id,
+            "transaction_type": "expense",
+            "amount": -float(week.other_expenses[index]),
+            "description": "Other expenses",
+            "category": "expense"
+        }
+    ]
+    if week.student_loan_payment[index] > 0:
+        transactions.append({
+            "user_id": user_id,
+            "transaction_type": "student_loan",
+            "amount": -float(week.student_loan_payment[index]),
+            "description": "Student loan payment",
+            "category": "debt"
+        })
+    for transaction in transactions:
+        transaction["week_number"] = week_number
+    return transactions
+
+def claim_weeks(db: Session, profile_ids: List[int], weeks: int = 1) -> Dict[int, int]:
+    """Add weeks to each profile's weeks_played and return the first claimed week per profile id.
+    
+    The week comes back from the increment itself, which holds the row lock, so
+    concurrent simulations of one student never number the same week.
+    """
+    rows = db.execute(
+        update(FinancialProfile)
+        .where(FinancialProfile.id.in_(profile_ids))
+        .values(weeks_played=func.coalesce(FinancialProfile.weeks_played, 0) + weeks)
+        .returning(FinancialProfile.id, FinancialProfile.weeks_played)
+        .execution_options(synchronize_session=False)
+    )
+    return {profile_id: weeks_played - weeks + 1 for profile_id, weeks_played in rows}
+
+def simulate_profiles_week(
+    db: Session,
+    profiles: List[FinancialProfile],
+    events: EventTable,
+    eligible: np.ndarray,
+    streams: Dict[int, Tuple[int, int]]
+) -> dict:
+    """Advance many profiles by one week within the caller's transaction; nothing is committed.
+    
+    Profiles are updated with one executemany of in-SQL increments and all
+    transactions are written with one bulk insert. Draws come from each student's
+    stream at the week claimed for them, so batching does not change them.
+    """
+    week_numbers = claim_weeks(db, [profile.id for profile in profiles]) if profiles else {}
+    event_ids = [item.id for item in events.events]
+    draws = np.concatenate([
+        event_uniforms(streams[profile.user_id], profile.user_id, week_numbers[profile.id], 1, event_ids)
+        for profile in profiles
+    ]) if profiles else np.empty((0, len(event_ids), EVENT_UNIFORMS))
+    
+    week = simulate_week_arrays(
+        salary=np.array([profile.current_salary or 0.0 for profile in profiles], dtype=float),
+        weekly_income=np.array([profile.weekly_income or 0.0 for profile in profiles], dtype=float),
+        loan_balance=np.array([profile.student_loan_balance or 0.0 for profile in profiles], dtype=float),
+        housing_cost=np.array([profile.housing_weekly_cost or 0.0 for profile in profiles], dtype=float),
+        other_expenses=np.array([profile.weekly_expenses or 0.0 for profile in profiles], dtype=float),
+        events=events,
+        draws=draws,
+        eligible=eligible
+    )
+    
+    # Increments rather than absolute values so a concurrent single-student week is not lost
+    table = FinancialProfile.__table__
+    remaining_loan = table.c.student_loan_balance - bindparam("b_loan_payment")
+    db.execute(
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values(
+            total_tax_paid=table.c.total_tax_paid + bindparam("b_tax"),
+            savings_balance=table.c.savings_balance + bindparam("b_saved"),
+            student_loan_balance=case((remaining_loan > 0, remaining_loan), else_=0.0)
+        ),
+        [
+            {
+                "b_id": profile.id,
+                "b_tax": tax,
+                "b_saved": max(0.0, remaining),  # Can't have negative savings
+                "b_loan_payment": loan_payment
+            }
+            for profile, tax, remaining, loan_payment in zip(
+                profiles,
+                week.tax_amount.tolist(),
+                week.remaining_amount.tolist(),
+                week.student_loan_payment.tolist()
+            )
+        ]
+    )
+    
+    transactions = [
+        row
+        for index, profile in enumerate(profiles)
+        for row in week_transactions(profile.user_id, week, index, week_numbers[profile.id])
+    ]
+    if transactions:
+        db.execute(insert(Transaction), transactions)
+        add_rows(db, transactions)
+    
+    balances = dict(
+        (row.id, row) for row in db.execute(
+            select(FinancialProfile.id, FinancialProfile.savings_balance, FinancialProfile.student_loan_balance)
+            .where(FinancialProfile.id.in_([profile.id for profile in profiles]))
+        )
+    )
+    
+    results = []
+    for index, profile in enumerate(profiles):
+        results.append({
+            "user_id": profile.user_id,
+            "net_income": float(week.net_income[index]),
+            "remaining_amount": float(week.remaining_amount[index]),
+            "event_ids": [
+                event.id for event, occurred in zip(events.events, week.occurred[index]) if occurred
+            ],
+            "new_savings_balance": balances[profile.id].savings_balance,
+            "new_student_loan_balance": balances[profile.id].student_loan_balance
+        })
+    return {"transactions_created": len(transactions), "results": results, "week": week}
+
+def week_statement(user_id: int, week: WeekResult, index: int, week_number: int) -> dict:
+    """A weekly statement row carrying the same totals as week_transactions"""
+    has_loan_payment = week.student_loan_payment[index] > 0
+    return {
+        "user_id": user_id,
+        "week_number": week_number,
+        "income": float(week.gross_income[index]),
+        "tax": -float(week.tax_amount[index]),
+        "housing": -float(week.housing_cost[index]),
+        "expense": -float(week.other_expenses[index]),
+        "debt": -float(week.student_loan_payment[index]),
+        "investment": 0.0,
+        "other": 0.0,
+        "transaction_count": 5 if has_loan_payment else 4
+    }
+
+def fast_forward_profile(
+    db: Session,
+    profile: FinancialProfile,
+    weeks: int,
+    events: EventTable,
+    stream: Tuple[int, int],
+    summary: bool = False
+) -> dict:
+    """Run several weeks for one profile in memory and apply the final state once.
+    
+    Salary and expenses do not change between weeks, and repayments depend on the
+    loan balance only through balance > 0, so each week's balance is known up front
+    and every week is simulated as one row of the same vectorized step. Nothing is committed.
+    """
+    first_week = claim_weeks(db, [profile.id], weeks)[profile.id]
+    draws = event_uniforms(stream, profile.user_id, first_week, weeks, [item.id for item in events.events])
+    
+    salary = np.full(weeks, profile.current_salary or 0.0, dtype=float)
+    opening_balance = profile.student_loan_balance or 0.0
+    annual_payment = calculate_student_loan_payment(opening_balance, float(salary[0]))
+    loan_balance = np.maximum(opening_balance - np.arange(weeks) * annual_payment / WEEKS_PER_YEAR, 0.0)
+    week = simulate_week_arrays(
+        salary=salary,
+        weekly_income=np.full(weeks, profile.weekly_income or 0.0, dtype=float),
+        loan_balance=loan_balance,
+        housing_cost=np.full(weeks, profile.housing_weekly_cost or 0.0, dtype=float),
+        other_expenses=np.full(weeks, profile.weekly_expenses or 0.0, dtype=float),
+        events=events,
+        draws=draws
+    )
+    
+    saved = np.maximum(week.remaining_amount, 0.0)  # Can't have negative savings
+    total_tax = float(week.tax_amount.sum())
+    total_loan_payment = float(week.student_loan_payment.sum())
+    
+    remaining_loan = FinancialProfile.student_loan_balance - total_loan_payment
+    new_savings_balance, new_student_loan_balance = db.execute(
+        update(FinancialProfile)
+        .where(FinancialProfile.id == profile.id)
+        .values(
+            total_tax_paid=FinancialProfile.total_tax_paid + total_tax,
+            savings_balance=FinancialProfile.savings_balance + float(saved.sum()),
+            student_loan_balance=case((remaining_loan > 0, remaining_loan), else_=0.0)
+        )
+        .returning(FinancialProfile.savings_balance, FinancialProfile.student_loan_balance)
+        .execution_options(synchronize_session=False)
+    ).one()
+    
+    transactions_created = statements_created = 0
+    if summary:
+        statements = [
+            week_statement(profile.user_id, week, index, first_week + index) for index in range(weeks)
+        ]
+        db.execute(insert(WeeklyStatement), statements)
+        add_statements(db, statements)
+        statements_created = len(statements)
+    else:
+        transactions = [
+            row
+            for index in range(weeks)
+            for row in week_transactions(profile.user_id, week, index, first_week + index)
+        ]
+        db.execute(insert(Transaction), transactions)
+        add_rows(db, transactions)
+        transactions_created = len(transactions)
+    
+    return {
+        "weeks": weeks,
+        "first_week": first_week,
+        "last_week": first_week + weeks - 1,
+        "gross_income": float(week.gross_income.sum()),
+        "tax_amount": total_tax,
+        "student_loan_payment": total_loan_payment,
+        "housing_cost": float(week.housing_cost.sum()),
+        "other_expenses": float(week.other_expenses.sum()),
+        "event_impact": float((week.remaining_amount - week.net_income + week.housing_cost + week.other_expenses).sum()),
+        "saved_amount": float(saved.sum()),
+        "events_occurred": int(week.occurred.sum()),
+        "new_savings_balance": new_savings_balance,
+        "new_student_loan_balance": new_student_loan_balance,
+        "transactions_created": transactions_created,
+        "statements_created": statements_created
+    }
@@ -9,8 +9,11 @@ from contextlib import asynccontextmanager
 import os
 from dotenv import load_dotenv
 
-from app.database import create_db_and_tables
+from app.database import create_db_and_tables, SessionLocal
 from app.routers import auth, users, classrooms, careers, finance, stocks
+from app.services.market_clock import market_clock
+from app.services.leaderboard import add_entries
+from app.services.projection import shutdown_pool
 
 load_dotenv()
 
@@ -19,9 +22,15 @@ async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup
     create_db_and_tables()
+    with SessionLocal() as db:
+        # Rank members who joined before leaderboards existed
+        add_entries(db)
+        db.commit()
+    await market_clock.start()
     yield
     # Shutdown
-    pass
+    await market_clock.stop()
+    shutdown_pool()
 
 app = FastAPI(
     title="OpenBanqr API",
@@ -37,6 +46,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
 # Include routers
@@ -0,0 +1,47 @@
+"""
+Alembic environment: runs migrations against the application's database
+"""
+
+from alembic import context
+from logging.config import fileConfig
+
+from app.database import Base, engine
+from app import models  # noqa: F401  Registers every table on Base.metadata
+
+config = context.config
+target_metadata = Base.metadata
+
+# The app passes its own connection in at startup and keeps its logging setup
+connection = config.attributes.get("connection")
+if connection is None and config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+def run_migrations_offline():
+    """Emit the migration SQL as a script instead of running it"""
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=engine.dialect.name == "sqlite"
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online(connection):
+    """Run the migrations on a live connection"""
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        # SQLite cannot alter constraints in place, so tables are rebuilt in batches
+        render_as_batch=connection.dialect.name == "sqlite"
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+elif connection is not None:
+    run_migrations_online(connection)
+else:
+    with engine.begin() as connection:
+        run_migrations_online(connection)
@@ -0,0 +1,165 @@
+"""
+Baseline schema, as create_all built it before migrations existed
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-16
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("full_name", sa.String()),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("is_teacher", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now())
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+    
+    op.create_table(
+        "classrooms",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("description", sa.Text()),
+        sa.Column("invite_code", sa.String()),
+        sa.Column("teacher_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now())
+    )
+    op.create_index("ix_classrooms_id", "classrooms", ["id"])
+    op.create_index("ix_classrooms_invite_code", "classrooms", ["invite_code"], unique=True)
+    
+    op.create_table(
+        "classroom_members",
+        sa.Column("classroom_id", sa.Integer(), sa.ForeignKey("classrooms.id")),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"))
+    )
+    
+    op.create_table(
+        "careers",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("description", sa.Text()),
+        sa.Column("education_required", sa.String()),
+        sa.Column("requires_student_loan", sa.Boolean()),
+        sa.Column("student_loan_amount", sa.Float()),
+        sa.Column("base_salary_min", sa.Float(), nullable=False),
+        sa.Column("base_salary_max", sa.Float(), nullable=False),
+        sa.Column("industry", sa.String()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now())
+    )
+    op.create_index("ix_careers_id", "careers", ["id"])
+    
+    op.create_table(
+        "financial_profiles",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("career_id", sa.Integer(), sa.ForeignKey("careers.id")),
+        sa.Column("current_salary", sa.Float()),
+        sa.Column("weekly_income", sa.Float()),
+        sa.Column("net_weekly_income", sa.Float()),
+        sa.Column("student_loan_balance", sa.Float()),
+        sa.Column("student_loan_weekly_payment", sa.Float()),
+        sa.Column("savings_balance", sa.Float()),
+        sa.Column("emergency_fund", sa.Float()),
+        sa.Column("housing_type", sa.String()),
+        sa.Column("housing_weekly_cost", sa.Float()),
+        sa.Column("property_value", sa.Float()),
+        sa.Column("weekly_expenses", sa.Float()),
+        sa.Column("weeks_played", sa.Integer()),
+        sa.Column("total_tax_paid", sa.Float()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True))
+    )
+    op.create_index("ix_financial_profiles_id", "financial_profiles", ["id"])
+    
+    op.create_table(
+        "stocks",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("symbol", sa.String(), nullable=False, unique=True),
+        sa.Column("company_name", sa.String(), nullable=False),
+        sa.Column("current_price", sa.Float(), nullable=False),
+        sa.Column("daily_change", sa.Float()),
+        sa.Column("daily_change_percent", sa.Float()),
+        sa.Column("market_cap", sa.Float()),
+        sa.Column("dividend_yield", sa.Float()),
+        sa.Column("last_updated", sa.DateTime(timezone=True), server_default=sa.func.now())
+    )
+    op.create_index("ix_stocks_id", "stocks", ["id"])
+    
+    op.create_table(
+        "portfolios",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("name", sa.String()),
+        sa.Column("total_value", sa.Float()),
+        sa.Column("total_invested", sa.Float()),
+        sa.Column("cash_balance", sa.Float()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True))
+    )
+    op.create_index("ix_portfolios_id", "portfolios", ["id"])
+    
+    op.create_table(
+        "stock_holdings",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("portfolio_id", sa.Integer(), sa.ForeignKey("portfolios.id"), nullable=False),
+        sa.Column("stock_id", sa.Integer(), sa.ForeignKey("stocks.id"), nullable=False),
+        sa.Column("shares", sa.Float(), nullable=False),
+        sa.Column("average_price", sa.Float(), nullable=False),
+        sa.Column("current_value", sa.Float()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True))
+    )
+    op.create_index("ix_stock_holdings_id", "stock_holdings", ["id"])
+    
+    op.create_table(
+        "transactions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("portfolio_id", sa.Integer(), sa.ForeignKey("portfolios.id")),
+        sa.Column("transaction_type", sa.String(), nullable=False),
+        sa.Column("amount", sa.Float(), nullable=False),
+        sa.Column("description", sa.String()),
+        sa.Column("category", sa.String()),
+        sa.Column("stock_id", sa.Integer(), sa.ForeignKey("stocks.id")),
+        sa.Column("shares", sa.Float()),
+        sa.Column("price_per_share", sa.Float()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now())
+    )
+    op.create_index("ix_transactions_id", "transactions", ["id"])
+    
+    op.create_table(
+        "financial_events",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("description", sa.Text()),
+        sa.Column("event_type", sa.String(), nullable=False),
+        sa.Column("amount_min", sa.Float()),
+        sa.Column("amount_max", sa.Float()),
+        sa.Column("probability", sa.Float()),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now())
+    )
+    op.create_index("ix_financial_events_id", "financial_events", ["id"])
+
+def downgrade():
+    for table in (
+        "financial_events", "transactions", "stock_holdings", "portfolios", "stocks",
+        "financial_profiles", "careers", "classroom_members", "classrooms", "users"
+    ):
+        op.drop_table(table)
@@ -0,0 +1,35 @@
+"""
+Per-stock drift and volatility, and daily closing price history
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Existing stocks keep NULL parameters, which the engine reads as the market defaults
+    op.add_column("stocks", sa.Column("drift", sa.Float()))
+    op.add_column("stocks", sa.Column("volatility", sa.Float()))
+    
+    op.create_table(
+        "stock_price_history",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("stock_id", sa.Integer(), sa.ForeignKey("stocks.id"), nullable=False),
+        sa.Column("price", sa.Float(), nullable=False),
+        sa.Column("timestamp", sa.DateTime(timezone=True), nullable=False)
+    )
+    op.create_index("ix_stock_price_history_id", "stock_price_history", ["id"])
+
+def downgrade():
+    op.drop_table("stock_price_history")
+    with op.batch_alter_table("stocks") as batch:
+        batch.drop_column("volatility")
+        batch.drop_column("drift")
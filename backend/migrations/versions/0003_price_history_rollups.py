@@ -0,0 +1,82 @@
+"""
+Price history lookups by stock and time, and OHLC bars
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16
+"""
+
+from alembic import op
+from datetime import timedelta
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+history = sa.table(
+    "stock_price_history",
+    sa.column("id", sa.Integer()),
+    sa.column("stock_id", sa.Integer()),
+    sa.column("price", sa.Float()),
+    sa.column("timestamp", sa.DateTime())
+)
+
+def period_start(timestamp, interval):
+    """Start of the day or ISO week (Monday) containing a timestamp"""
+    day = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+def upgrade():
+    op.create_index("ix_stock_price_history_stock_timestamp", "stock_price_history", ["stock_id", "timestamp"])
+    
+    op.create_table(
+        "stock_price_bars",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("stock_id", sa.Integer(), sa.ForeignKey("stocks.id"), nullable=False),
+        sa.Column("interval", sa.String(), nullable=False),
+        sa.Column("period_start", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("open", sa.Float(), nullable=False),
+        sa.Column("high", sa.Float(), nullable=False),
+        sa.Column("low", sa.Float(), nullable=False),
+        sa.Column("close", sa.Float(), nullable=False),
+        sa.UniqueConstraint("stock_id", "interval", "period_start", name="uq_stock_price_bars_period")
+    )
+    op.create_index("ix_stock_price_bars_id", "stock_price_bars", ["id"])
+    
+    # Roll the closes recorded so far into bars
+    bars = {}
+    for stock_id, price, timestamp in op.get_bind().execute(
+        sa.select(history.c.stock_id, history.c.price, history.c.timestamp)
+        .order_by(history.c.stock_id, history.c.timestamp, history.c.id)
+    ):
+        for interval in ("day", "week"):
+            key = (stock_id, interval, period_start(timestamp, interval))
+            bar = bars.get(key)
+            if bar is None:
+                bars[key] = {
+                    "stock_id": stock_id, "interval": interval, "period_start": key[2],
+                    "open": price, "high": price, "low": price, "close": price
+                }
+            else:
+                bar["high"] = max(bar["high"], price)
+                bar["low"] = min(bar["low"], price)
+                bar["close"] = price
+    if bars:
+        op.bulk_insert(sa.table(
+            "stock_price_bars",
+            sa.column("stock_id", sa.Integer()),
+            sa.column("interval", sa.String()),
+            sa.column("period_start", sa.DateTime()),
+            sa.column("open", sa.Float()),
+            sa.column("high", sa.Float()),
+            sa.column("low", sa.Float()),
+            sa.column("close", sa.Float())
+        ), list(bars.values()))
+
+def downgrade():
+    op.drop_table("stock_price_bars")
+    op.drop_index("ix_stock_price_history_stock_timestamp", table_name="stock_price_history")
@@ -0,0 +1,26 @@
+"""
+Market clock lease and last tick time
+
+Revision ID: 0006
+Revises: 0004
+Create Date: 2026-10-16
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("market_state", sa.Column("last_tick_at", sa.DateTime(timezone=True)))
+    op.add_column("market_state", sa.Column("tick_lock_owner", sa.String()))
+    op.add_column("market_state", sa.Column("tick_lock_expires_at", sa.DateTime(timezone=True)))
+
+def downgrade():
+    with op.batch_alter_table("market_state") as batch:
+        batch.drop_column("tick_lock_expires_at")
+        batch.drop_column("tick_lock_owner")
+        batch.drop_column("last_tick_at")
@@ -0,0 +1,40 @@
+"""
+Resting limit and stop orders
+
+Revision ID: 0008
+Revises: 0006
+Create Date: 2026-10-16
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "orders",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("portfolio_id", sa.Integer(), sa.ForeignKey("portfolios.id"), nullable=False),
+        sa.Column("stock_id", sa.Integer(), sa.ForeignKey("stocks.id"), nullable=False),
+        sa.Column("side", sa.String(), nullable=False),
+        sa.Column("order_type", sa.String(), nullable=False),
+        sa.Column("shares", sa.Float(), nullable=False),
+        sa.Column("trigger_price", sa.Float(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("fill_price", sa.Float()),
+        sa.Column("transaction_id", sa.Integer(), sa.ForeignKey("transactions.id")),
+        sa.Column("reject_reason", sa.String()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("closed_at", sa.DateTime(timezone=True))
+    )
+    op.create_index("ix_orders_id", "orders", ["id"])
+    op.create_index("ix_orders_open_trigger", "orders", ["stock_id", "status", "side", "order_type", "trigger_price"])
+    op.create_index("ix_orders_user_status", "orders", ["user_id", "status"])
+
+def downgrade():
+    op.drop_table("orders")
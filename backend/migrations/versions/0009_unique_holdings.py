@@ -0,0 +1,61 @@
+"""
+One holding row per portfolio and stock
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-16
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+holdings = sa.table(
+    "stock_holdings",
+    sa.column("id", sa.Integer()),
+    sa.column("portfolio_id", sa.Integer()),
+    sa.column("stock_id", sa.Integer()),
+    sa.column("shares", sa.Float()),
+    sa.column("average_price", sa.Float()),
+    sa.column("current_value", sa.Float())
+)
+
+def upgrade():
+    # Racing buys could insert a second row for the same stock; fold each into the oldest
+    connection = op.get_bind()
+    duplicates = connection.execute(
+        sa.select(
+            sa.func.min(holdings.c.id),
+            holdings.c.portfolio_id,
+            holdings.c.stock_id,
+            sa.func.sum(holdings.c.shares),
+            sa.func.sum(holdings.c.shares * holdings.c.average_price),
+            sa.func.sum(sa.func.coalesce(holdings.c.current_value, 0.0))
+        )
+        .group_by(holdings.c.portfolio_id, holdings.c.stock_id)
+        .having(sa.func.count() > 1)
+    ).all()
+    for keep_id, portfolio_id, stock_id, shares, cost, value in duplicates:
+        connection.execute(
+            holdings.update().where(holdings.c.id == keep_id).values(
+                shares=shares,
+                average_price=cost / shares if shares else 0.0,
+                current_value=value
+            )
+        )
+        connection.execute(holdings.delete().where(
+            holdings.c.portfolio_id == portfolio_id,
+            holdings.c.stock_id == stock_id,
+            holdings.c.id != keep_id
+        ))
+    
+    with op.batch_alter_table("stock_holdings") as batch:
+        batch.create_unique_constraint("uq_stock_holdings_portfolio_stock", ["portfolio_id", "stock_id"])
+
+def downgrade():
+    with op.batch_alter_table("stock_holdings") as batch:
+        batch.drop_constraint("uq_stock_holdings_portfolio_stock", type_="unique")
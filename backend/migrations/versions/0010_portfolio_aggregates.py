@@ -0,0 +1,57 @@
+"""
+Incrementally maintained portfolio market value and cost basis
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-16
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+portfolios = sa.table(
+    "portfolios",
+    sa.column("id", sa.Integer()),
+    sa.column("cash_balance", sa.Float()),
+    sa.column("total_value", sa.Float()),
+    sa.column("market_value", sa.Float()),
+    sa.column("cost_basis", sa.Float())
+)
+holdings = sa.table(
+    "stock_holdings",
+    sa.column("portfolio_id", sa.Integer()),
+    sa.column("shares", sa.Float()),
+    sa.column("average_price", sa.Float()),
+    sa.column("current_value", sa.Float())
+)
+
+def upgrade():
+    op.add_column("portfolios", sa.Column("market_value", sa.Float()))
+    op.add_column("portfolios", sa.Column("cost_basis", sa.Float()))
+    
+    # Start the aggregates from the holdings, as reconcile_portfolios computes them
+    market_value = (
+        sa.select(sa.func.coalesce(sa.func.sum(holdings.c.current_value), 0.0))
+        .where(holdings.c.portfolio_id == portfolios.c.id)
+        .scalar_subquery()
+    )
+    cost_basis = (
+        sa.select(sa.func.coalesce(sa.func.sum(holdings.c.shares * holdings.c.average_price), 0.0))
+        .where(holdings.c.portfolio_id == portfolios.c.id)
+        .scalar_subquery()
+    )
+    op.execute(portfolios.update().values(
+        market_value=market_value,
+        cost_basis=cost_basis,
+        total_value=sa.func.coalesce(portfolios.c.cash_balance, 0.0) + market_value
+    ))
+
+def downgrade():
+    with op.batch_alter_table("portfolios") as batch:
+        batch.drop_column("cost_basis")
+        batch.drop_column("market_value")
@@ -0,0 +1,45 @@
+"""
+Portfolio value snapshots for performance analytics, and the market date cursor
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-16
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # History starts at the first tick after the upgrade
+    op.create_table(
+        "portfolio_snapshots",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("portfolio_id", sa.Integer(), sa.ForeignKey("portfolios.id"), nullable=False),
+        sa.Column("timestamp", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("total_value", sa.Float(), nullable=False),
+        sa.Column("market_value", sa.Float()),
+        sa.Column("cash_balance", sa.Float()),
+        sa.Column("net_flow", sa.Float())
+    )
+    op.create_index("ix_portfolio_snapshots_id", "portfolio_snapshots", ["id"])
+    op.create_index(
+        "ix_portfolio_snapshots_portfolio_timestamp", "portfolio_snapshots", ["portfolio_id", "timestamp"]
+    )
+    
+    # The market carries on from the latest recorded close
+    op.add_column("market_state", sa.Column("market_date", sa.DateTime(timezone=True)))
+    market_state = sa.table("market_state", sa.column("market_date", sa.DateTime(timezone=True)))
+    history = sa.table("stock_price_history", sa.column("timestamp", sa.DateTime(timezone=True)))
+    op.execute(market_state.update().values(
+        market_date=sa.select(sa.func.max(history.c.timestamp)).scalar_subquery()
+    ))
+
+def downgrade():
+    with op.batch_alter_table("market_state") as batch:
+        batch.drop_column("market_date")
+    op.drop_table("portfolio_snapshots")
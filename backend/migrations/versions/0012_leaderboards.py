@@ -0,0 +1,39 @@
+"""
+Precomputed classroom leaderboard entries
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-16
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Existing members are ranked by add_entries when the app starts
+    op.create_table(
+        "leaderboard_entries",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("classroom_id", sa.Integer(), sa.ForeignKey("classrooms.id"), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("net_worth", sa.Float(), nullable=False),
+        sa.Column("portfolio_return", sa.Float(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.UniqueConstraint("classroom_id", "user_id", name="uq_leaderboard_entries_classroom_user")
+    )
+    op.create_index("ix_leaderboard_entries_id", "leaderboard_entries", ["id"])
+    op.create_index(
+        "ix_leaderboard_entries_classroom_net_worth", "leaderboard_entries", ["classroom_id", "net_worth"]
+    )
+    op.create_index(
+        "ix_leaderboard_entries_classroom_return", "leaderboard_entries", ["classroom_id", "portfolio_return"]
+    )
+    op.create_index("ix_leaderboard_entries_user", "leaderboard_entries", ["user_id"])
+
+def downgrade():
+    op.drop_table("leaderboard_entries")
@@ -0,0 +1,30 @@
+"""
+Market time up to which quarterly dividends have been paid
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-16
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0013"
+down_revision = "0012"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("market_state", sa.Column("dividends_settled_at", sa.DateTime(timezone=True)))
+    
+    # Quarters that closed before dividends existed are not paid out retroactively
+    market_state = sa.table(
+        "market_state",
+        sa.column("market_date", sa.DateTime(timezone=True)),
+        sa.column("dividends_settled_at", sa.DateTime(timezone=True))
+    )
+    op.execute(market_state.update().values(dividends_settled_at=market_state.c.market_date))
+
+def downgrade():
+    with op.batch_alter_table("market_state") as batch:
+        batch.drop_column("dividends_settled_at")
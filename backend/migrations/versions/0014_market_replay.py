@@ -0,0 +1,23 @@
+"""
+Replay dataset cursor
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-16
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0014"
+down_revision = "0013"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # NULL reads as the start of the dataset
+    op.add_column("market_state", sa.Column("replay_position", sa.Integer()))
+
+def downgrade():
+    with op.batch_alter_table("market_state") as batch:
+        batch.drop_column("replay_position")
@@ -0,0 +1,41 @@
+"""
+Game week on transactions, and compacted weekly statements
+
+Revision ID: 0016
+Revises: 0014
+Create Date: 2026-10-16
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0016"
+down_revision = "0014"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("transactions", sa.Column("week_number", sa.Integer()))
+    
+    op.create_table(
+        "weekly_statements",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("week_number", sa.Integer(), nullable=False),
+        sa.Column("income", sa.Float(), nullable=False),
+        sa.Column("tax", sa.Float(), nullable=False),
+        sa.Column("housing", sa.Float(), nullable=False),
+        sa.Column("expense", sa.Float(), nullable=False),
+        sa.Column("debt", sa.Float(), nullable=False),
+        sa.Column("investment", sa.Float(), nullable=False),
+        sa.Column("other", sa.Float(), nullable=False),
+        sa.Column("transaction_count", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.UniqueConstraint("user_id", "week_number", name="uq_weekly_statements_user_week")
+    )
+    op.create_index("ix_weekly_statements_id", "weekly_statements", ["id"])
+
+def downgrade():
+    op.drop_table("weekly_statements")
+    with op.batch_alter_table("transactions") as batch:
+        batch.drop_column("week_number")
@@ -0,0 +1,30 @@
+"""
+Classroom-specific financial events
+
+Revision ID: 0019
+Revises: 0016
+Create Date: 2026-10-16
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0019"
+down_revision = "0016"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Existing events stay global, drawn by every student
+    with op.batch_alter_table("financial_events") as batch:
+        batch.add_column(sa.Column("classroom_id", sa.Integer()))
+        batch.create_foreign_key(
+            "fk_financial_events_classroom_id", "classrooms", ["classroom_id"], ["id"]
+        )
+        batch.create_index("ix_financial_events_classroom_id", ["classroom_id"])
+
+def downgrade():
+    with op.batch_alter_table("financial_events") as batch:
+        batch.drop_index("ix_financial_events_classroom_id")
+        batch.drop_constraint("fk_financial_events_classroom_id", type_="foreignkey")
+        batch.drop_column("classroom_id")
@@ -0,0 +1,41 @@
+"""
+Simulation seeds for classrooms and the market, and the market day counter
+
+Revision ID: 0020
+Revises: 0019
+Create Date: 2026-10-16
+"""
+
+from alembic import op
+import sqlalchemy as sa
+import secrets
+
+revision = "0020"
+down_revision = "0019"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("classrooms", sa.Column("simulation_seed", sa.Integer()))
+    op.add_column("market_state", sa.Column("seed", sa.Integer()))
+    op.add_column("market_state", sa.Column("market_day", sa.Integer()))
+    
+    # Every existing row gets its own seed, as new rows do; a NULL seed would read as 0 everywhere
+    connection = op.get_bind()
+    for table_name, column_name in (("classrooms", "simulation_seed"), ("market_state", "seed")):
+        table = sa.table(table_name, sa.column("id", sa.Integer()), sa.column(column_name, sa.Integer()))
+        ids = connection.execute(sa.select(table.c.id)).scalars().all()
+        for row_id in ids:
+            connection.execute(
+                table.update().where(table.c.id == row_id).values({column_name: secrets.randbits(31)})
+            )
+    
+    market_state = sa.table("market_state", sa.column("market_day", sa.Integer()))
+    op.execute(market_state.update().values(market_day=0))
+
+def downgrade():
+    with op.batch_alter_table("market_state") as batch:
+        batch.drop_column("market_day")
+        batch.drop_column("seed")
+    with op.batch_alter_table("classrooms") as batch:
+        batch.drop_column("simulation_seed")
@@ -0,0 +1,28 @@
+"""
+Keyset pagination indexes on transaction history
+
+Revision ID: 0021
+Revises: 0020
+Create Date: 2026-10-16
+"""
+
+from alembic import op
+
+revision = "0021"
+down_revision = "0020"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index("ix_transactions_user_created", "transactions", ["user_id", "created_at", "id"])
+    op.create_index(
+        "ix_transactions_user_category_created", "transactions", ["user_id", "category", "created_at", "id"]
+    )
+    op.create_index(
+        "ix_transactions_user_type_created", "transactions", ["user_id", "transaction_type", "created_at", "id"]
+    )
+
+def downgrade():
+    op.drop_index("ix_transactions_user_type_created", "transactions")
+    op.drop_index("ix_transactions_user_category_created", "transactions")
+    op.drop_index("ix_transactions_user_created", "transactions")
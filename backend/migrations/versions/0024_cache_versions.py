@@ -0,0 +1,25 @@
+"""
+Cache key versions shared by every worker
+
+Revision ID: 0024
+Revises: 0021
+Create Date: 2026-10-16
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0024"
+down_revision = "0021"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "cache_versions",
+        sa.Column("name", sa.String(), primary_key=True),
+        sa.Column("version", sa.Integer(), nullable=False)
+    )
+
+def downgrade():
+    op.drop_table("cache_versions")
@@ -0,0 +1,121 @@
+"""
+Game week on every ledger row, and per-week category rollups
+
+Revision ID: 0025
+Revises: 0024
+Create Date: 2026-10-16
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0025"
+down_revision = "0024"
+branch_labels = None
+depends_on = None
+
+STATEMENT_COLUMNS = ("income", "tax", "housing", "expense", "debt", "investment", "other")
+
+def upgrade():
+    op.create_table(
+        "category_rollups",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("week_number", sa.Integer(), nullable=False),
+        sa.Column("category", sa.String(), nullable=False),
+        sa.Column("total", sa.Float(), nullable=False),
+        sa.Column("transaction_count", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.UniqueConstraint("user_id", "week_number", "category", name="uq_category_rollups_user_week_category")
+    )
+    op.create_index("ix_category_rollups_id", "category_rollups", ["id"])
+    
+    transactions = sa.table(
+        "transactions",
+        sa.column("id", sa.Integer()),
+        sa.column("user_id", sa.Integer()),
+        sa.column("week_number", sa.Integer()),
+        sa.column("category", sa.String()),
+        sa.column("amount", sa.Float()),
+        sa.column("created_at", sa.DateTime(timezone=True))
+    )
+    statements = sa.table(
+        "weekly_statements",
+        sa.column("user_id", sa.Integer()),
+        sa.column("week_number", sa.Integer()),
+        sa.column("created_at", sa.DateTime(timezone=True)),
+        *(sa.column(column, sa.Float()) for column in STATEMENT_COLUMNS)
+    )
+    rollups = sa.table(
+        "category_rollups",
+        sa.column("user_id", sa.Integer()),
+        sa.column("week_number", sa.Integer()),
+        sa.column("category", sa.String()),
+        sa.column("total", sa.Float()),
+        sa.column("transaction_count", sa.Integer())
+    )
+    
+    # An undated row (a trade, dividend or manual entry) belongs to the week that was
+    # in progress when it was written: one past the latest week simulated before it
+    earlier = transactions.alias("earlier")
+    last_row_week = (
+        sa.select(sa.func.max(earlier.c.week_number))
+        .where(
+            earlier.c.user_id == transactions.c.user_id,
+            earlier.c.week_number.is_not(None),
+            sa.or_(
+                earlier.c.created_at < transactions.c.created_at,
+                sa.and_(earlier.c.created_at == transactions.c.created_at, earlier.c.id < transactions.c.id)
+            )
+        )
+        .scalar_subquery()
+    )
+    last_statement_week = (
+        sa.select(sa.func.max(statements.c.week_number))
+        .where(statements.c.user_id == transactions.c.user_id, statements.c.created_at <= transactions.c.created_at)
+        .scalar_subquery()
+    )
+    row_week, statement_week = sa.func.coalesce(last_row_week, 0), sa.func.coalesce(last_statement_week, 0)
+    # Read every week before writing any, so backfilled rows do not count as simulated ones
+    connection = op.get_bind()
+    weeks = connection.execute(
+        sa.select(
+            transactions.c.id.label("b_id"),
+            (sa.case((row_week > statement_week, row_week), else_=statement_week) + 1).label("b_week")
+        ).where(transactions.c.week_number.is_(None))
+    ).mappings().all()
+    if weeks:
+        connection.execute(
+            transactions.update()
+            .where(transactions.c.id == sa.bindparam("b_id"))
+            .values(week_number=sa.bindparam("b_week")),
+            [dict(row) for row in weeks]
+        )
+    
+    # Totals per (user, week, category) from every ledger row and compacted statement line
+    lines = [
+        sa.select(
+            transactions.c.user_id,
+            transactions.c.week_number,
+            sa.func.coalesce(transactions.c.category, "other").label("category"),
+            transactions.c.amount
+        )
+    ] + [
+        sa.select(
+            statements.c.user_id,
+            statements.c.week_number,
+            sa.literal(column).label("category"),
+            statements.c[column].label("amount")
+        ).where(statements.c[column] != 0)
+        for column in STATEMENT_COLUMNS
+    ]
+    ledger = sa.union_all(*lines).subquery()
+    op.execute(rollups.insert().from_select(
+        ["user_id", "week_number", "category", "total", "transaction_count"],
+        sa.select(
+            ledger.c.user_id, ledger.c.week_number, ledger.c.category, sa.func.sum(ledger.c.amount), sa.func.count()
+        ).group_by(ledger.c.user_id, ledger.c.week_number, ledger.c.category)
+    ))
+
+def downgrade():
+    op.drop_table("category_rollups")
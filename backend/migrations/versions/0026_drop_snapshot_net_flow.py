@@ -0,0 +1,22 @@
+"""
+Drop portfolio_snapshots.net_flow: portfolios take no external cash after opening
+
+Revision ID: 0026
+Revises: 0025
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0026"
+down_revision = "0025"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table("portfolio_snapshots") as batch:
+        batch.drop_column("net_flow")
+
+def downgrade():
+    op.add_column("portfolio_snapshots", sa.Column("net_flow", sa.Float()))
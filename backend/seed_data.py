@@ -88,42 +88,54 @@ def seed_stocks(db: Session):
             "company_name": "Apple Inc.",
             "current_price": 175.50,
             "market_cap": 2800000000000,
-            "dividend_yield": 0.52
+            "dividend_yield": 0.52,
+            "drift": 0.0008,
+            "volatility": 0.018
         },
         {
             "symbol": "MSFT",
             "company_name": "Microsoft Corporation",
             "current_price": 335.20,
             "market_cap": 2500000000000,
-            "dividend_yield": 0.73
+            "dividend_yield": 0.73,
+            "drift": 0.0008,
+            "volatility": 0.016
         },
         {
             "symbol": "GOOGL",
             "company_name": "Alphabet Inc.",
             "current_price": 125.30,
             "market_cap": 1600000000000,
-            "dividend_yield": 0.0
+            "dividend_yield": 0.0,
+            "drift": 0.0007,
+            "volatility": 0.019
         },
         {
             "symbol": "AMZN",
             "company_name": "Amazon.com Inc.",
             "current_price": 142.80,
             "market_cap": 1500000000000,
-            "dividend_yield": 0.0
+            "dividend_yield": 0.0,
+            "drift": 0.0009,
+            "volatility": 0.021
         },
         {
             "symbol": "TSLA",
             "company_name": "Tesla Inc.",
             "current_price": 238.50,
             "market_cap": 800000000000,
-            "dividend_yield": 0.0
+            "dividend_yield": 0.0,
+            "drift": 0.0012,
+            "volatility": 0.035
         },
         {
             "symbol": "NVDA",
             "company_name": "NVIDIA Corporation",
             "current_price": 445.20,
             "market_cap": 1100000000000,
-            "dividend_yield": 0.13
+            "dividend_yield": 0.13,
+            "drift": 0.0015,
+            "volatility": 0.03
         }
     ]
     
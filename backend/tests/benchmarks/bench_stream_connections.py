@@ -0,0 +1,170 @@
+"""
+Benchmark: server cost of idle price-stream clients and tick fan-out latency
+
+Starts the API in a subprocess on a throwaway SQLite database and holds N idle
+/api/stocks/stream connections open. It then reports the server's resident memory
+and CPU time per connection, and how long one price tick takes to reach every
+client. Linux only (reads /proc).
+
+    python tests/benchmarks/bench_stream_connections.py --connections 2000
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+TEST_DIR = tempfile.mkdtemp(prefix="openbanqr-bench-")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(TEST_DIR, "openbanqr.db")
+os.environ["MARKET_TICK_SECONDS"] = "0"
+sys.path.insert(0, BACKEND_DIR)
+
+from app.auth import create_access_token, get_password_hash  # noqa: E402
+from app.database import SessionLocal, create_db_and_tables  # noqa: E402
+from app.models import User  # noqa: E402
+from seed_data import seed_stocks  # noqa: E402
+
+CONNECT_CONCURRENCY = 200
+
+def seed() -> str:
+    """Create the schema, stocks and a teacher; return the teacher's token"""
+    create_db_and_tables()
+    db = SessionLocal()
+    try:
+        seed_stocks(db)
+        db.add(User(
+            email="bench@example.com", username="bench", hashed_password=get_password_hash("bench"),
+            is_teacher=True
+        ))
+        db.commit()
+    finally:
+        db.close()
+    return create_access_token({"sub": "bench"})
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def rss_kb(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+def cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as stat:
+        fields = stat.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+async def read_event(reader: asyncio.StreamReader, name: str):
+    """Read server-sent events until one with the given name arrives"""
+    # Each event arrives in its own chunk, after the chunk-size line
+    marker = b"event: " + name.encode() + b"\n"
+    while True:
+        chunk = await reader.readuntil(b"\n\n")
+        if marker in chunk:
+            return
+
+async def open_stream(port: int, token: str, gate: asyncio.Semaphore):
+    async with gate:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write((
+            f"GET /api/stocks/stream?token={token} HTTP/1.1\r\n"
+            f"Host: 127.0.0.1:{port}\r\nAccept: text/event-stream\r\n\r\n"
+        ).encode())
+        await writer.drain()
+        await reader.readuntil(b"\r\n\r\n")  # Response headers
+        await read_event(reader, "hello")
+        return reader, writer
+
+async def run(connections: int, idle_seconds: float, port: int, token: str, pid: int):
+    headers = {"Authorization": f"Bearer {token}"}
+    base = f"http://127.0.0.1:{port}"
+    async with httpx.AsyncClient(base_url=base, headers=headers, timeout=60) as client:
+        # Build the first quote snapshot so ticks publish deltas
+        (await client.get("/api/stocks/")).raise_for_status()
+        
+        rss_before = rss_kb(pid)
+        started = time.perf_counter()
+        gate = asyncio.Semaphore(CONNECT_CONCURRENCY)
+        streams = await asyncio.gather(*(open_stream(port, token, gate) for _ in range(connections)))
+        connect_seconds = time.perf_counter() - started
+        await asyncio.sleep(1)
+        rss_after = rss_kb(pid)
+        
+        cpu_before = cpu_seconds(pid)
+        await asyncio.sleep(idle_seconds)
+        idle_cpu = cpu_seconds(pid) - cpu_before
+        
+        started = time.perf_counter()
+        arrivals = []
+        
+        async def receive(reader):
+            await read_event(reader, "prices")
+            arrivals.append(time.perf_counter() - started)
+        
+        receivers = [asyncio.create_task(receive(reader)) for reader, _ in streams]
+        tick = await client.post("/api/stocks/update-prices")
+        tick.raise_for_status()
+        await asyncio.gather(*receivers)
+        
+        for _, writer in streams:
+            writer.close()
+    
+    arrivals.sort()
+    print(f"connections              {connections}")
+    print(f"connect time             {connect_seconds:.2f} s")
+    print(f"server RSS               {rss_before / 1024:.1f} MiB -> {rss_after / 1024:.1f} MiB")
+    print(f"RSS per connection       {(rss_after - rss_before) / connections:.1f} KiB")
+    print(f"idle CPU                 {idle_cpu:.3f} s over {idle_seconds:.0f} s "
+          f"({idle_cpu / idle_seconds * 100:.2f}% of a core)")
+    print(f"tick request             {tick.json()['elapsed_ms']:.1f} ms in advance_market")
+    print(f"fan-out p50 / p99 / max  {arrivals[len(arrivals) // 2] * 1000:.1f} / "
+          f"{arrivals[int(len(arrivals) * 0.99) - 1] * 1000:.1f} / {arrivals[-1] * 1000:.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--idle-seconds", type=float, default=20.0)
+    args = parser.parse_args()
+    
+    # Each connection takes a descriptor on both ends
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    if hard < 2 * args.connections + 100:
+        sys.exit(f"open file limit {hard} is too low for {args.connections} connections")
+    
+    token = seed()
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=os.environ.copy()
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                httpx.get(f"http://127.0.0.1:{port}/health").raise_for_status()
+                break
+            except httpx.HTTPError:
+                if time.monotonic() > deadline or server.poll() is not None:
+                    sys.exit("server did not start")
+                time.sleep(0.2)
+        asyncio.run(run(args.connections, args.idle_seconds, port, token, server.pid))
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    main()
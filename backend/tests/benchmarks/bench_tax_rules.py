@@ -0,0 +1,89 @@
+"""
+Benchmark: vectorized tax engine against the scalar tax functions
+
+Evaluates PAYE and student loan repayments for N annual incomes three ways: one
+array call on the rules engine, the scalar calculate_* functions in a Python loop,
+and the if/elif functions the engine replaced. It reports the time for each and the
+largest difference from the replaced functions.
+
+    python tests/benchmarks/bench_tax_rules.py --incomes 1000000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.services.tax_rules import get_tax_rules  # noqa: E402
+from app.services.weekly import calculate_nz_tax, calculate_student_loan_payment  # noqa: E402
+
+TAX_YEAR = 2024  # The year the replaced functions hard-coded
+LOAN_BALANCE = 20000.0
+
+def legacy_tax(annual_income: float) -> float:
+    """PAYE as computed before the rules engine"""
+    if annual_income <= 14000:
+        return annual_income * 0.105
+    elif annual_income <= 48000:
+        return 1470 + (annual_income - 14000) * 0.175
+    elif annual_income <= 70000:
+        return 7420 + (annual_income - 48000) * 0.30
+    elif annual_income <= 180000:
+        return 14020 + (annual_income - 70000) * 0.33
+    else:
+        return 50320 + (annual_income - 180000) * 0.39
+
+def legacy_student_loan(loan_balance: float, annual_income: float) -> float:
+    """Student loan repayment as computed before the rules engine"""
+    if annual_income < 22828 or loan_balance <= 0:
+        return 0
+    return max(0, (annual_income - 22828) * 0.12)
+
+def incomes(count: int) -> np.ndarray:
+    """Random incomes up to 300k, plus every bracket and threshold edge and its neighbours"""
+    edges = np.array([0.0, 14000, 22828, 48000, 70000, 180000])
+    edges = np.concatenate([edges - 0.01, edges, edges + 0.01])
+    random = np.random.default_rng(0).uniform(0, 300000, count - len(edges)).round(2)
+    return np.concatenate([edges, random])
+
+def timed(function):
+    started = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--incomes", type=int, default=1_000_000)
+    args = parser.parse_args()
+    
+    values = incomes(args.incomes)
+    scalars = values.tolist()
+    rules = get_tax_rules(TAX_YEAR)
+    
+    (tax, loan), vectorized = timed(lambda: (
+        rules.income_tax(values), rules.student_loan_payment(LOAN_BALANCE, values)
+    ))
+    (scalar_tax, scalar_loan), scalar = timed(lambda: (
+        [calculate_nz_tax(income, TAX_YEAR) for income in scalars],
+        [calculate_student_loan_payment(LOAN_BALANCE, income, TAX_YEAR) for income in scalars]
+    ))
+    (legacy_taxes, legacy_loans), legacy = timed(lambda: (
+        [legacy_tax(income) for income in scalars],
+        [legacy_student_loan(LOAN_BALANCE, income) for income in scalars]
+    ))
+    
+    print(f"incomes                  {len(values)}")
+    print(f"vectorized engine        {vectorized * 1000:.1f} ms")
+    print(f"scalar engine loop       {scalar * 1000:.1f} ms ({scalar / vectorized:.0f}x)")
+    print(f"replaced if/elif loop    {legacy * 1000:.1f} ms ({legacy / vectorized:.0f}x)")
+    print(f"max tax difference       {np.max(np.abs(tax - np.array(legacy_taxes))):.3g} "
+          f"(scalar engine {np.max(np.abs(tax - np.array(scalar_tax))):.3g})")
+    print(f"max loan difference      {np.max(np.abs(loan - np.array(legacy_loans))):.3g} "
+          f"(scalar engine {np.max(np.abs(loan - np.array(scalar_loan))):.3g})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Test configuration: the app runs against a throwaway SQLite database with the market clock off
+"""
+
+import os
+import sys
+import tempfile
+import uuid
+import pytest
+
+TEST_DIR = tempfile.mkdtemp(prefix="openbanqr-tests-")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(TEST_DIR, "openbanqr.db")
+os.environ["MARKET_TICK_SECONDS"] = "0"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def db():
+    """A session on the migrated test database; everything it wrote is rolled back"""
+    from app.database import SessionLocal, create_db_and_tables
+    
+    create_db_and_tables()
+    session = SessionLocal()
+    yield session
+    session.rollback()
+    session.close()
+
+@pytest.fixture(scope="session")
+def app():
+    """The API on the test database, seeded with careers, stocks and events"""
+    from app.database import SessionLocal, create_db_and_tables
+    from main import app
+    from seed_data import seed_careers, seed_financial_events, seed_stocks
+    
+    create_db_and_tables()
+    with SessionLocal() as session:
+        seed_careers(session)
+        seed_stocks(session)
+        seed_financial_events(session)
+    return app
+
+@pytest.fixture
+def client(app):
+    from fastapi.testclient import TestClient
+    
+    return TestClient(app)
+
+@pytest.fixture
+def register(client):
+    """Register and log in a new user, returning their auth headers"""
+    def register(teacher: bool = False) -> dict:
+        username = f"user-{uuid.uuid4().hex[:12]}"
+        response = client.post("/api/auth/register", json={
+            "email": f"{username}@example.com", "username": username, "password": "password", "is_teacher": teacher
+        })
+        assert response.status_code == 200, response.text
+        response = client.post("/api/auth/login", data={"username": username, "password": "password"})
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    return register
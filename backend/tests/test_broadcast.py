@@ -0,0 +1,52 @@
+"""
+Price stream fan-out
+"""
+
+import asyncio
+import threading
+import pytest
+
+from app.services.broadcast import PriceBroadcaster, RESYNC_MESSAGE, format_event
+
+@pytest.mark.asyncio
+async def test_every_subscriber_gets_each_message():
+    broadcaster = PriceBroadcaster(queue_size=4)
+    queues = [broadcaster.subscribe() for _ in range(1000)]
+    
+    broadcaster.publish(format_event("prices", "{}"))
+    
+    assert all(queue.get_nowait() == "event: prices\ndata: {}\n\n" for queue in queues)
+
+@pytest.mark.asyncio
+async def test_slow_consumer_is_told_to_resync():
+    broadcaster = PriceBroadcaster(queue_size=2)
+    slow, fast = broadcaster.subscribe(), broadcaster.subscribe()
+    
+    for version in range(3):
+        broadcaster.publish(format_event("prices", str(version)))
+        fast.get_nowait()
+    
+    assert slow.get_nowait() == RESYNC_MESSAGE
+    assert slow.empty()
+
+@pytest.mark.asyncio
+async def test_publish_from_a_worker_thread():
+    broadcaster = PriceBroadcaster()
+    queue = broadcaster.subscribe()
+    
+    thread = threading.Thread(target=broadcaster.publish, args=(format_event("prices", "{}"),))
+    thread.start()
+    thread.join()
+    
+    assert await asyncio.wait_for(queue.get(), timeout=1) == "event: prices\ndata: {}\n\n"
+
+@pytest.mark.asyncio
+async def test_unsubscribed_clients_are_skipped():
+    broadcaster = PriceBroadcaster()
+    queue = broadcaster.subscribe()
+    broadcaster.unsubscribe(queue)
+    
+    broadcaster.publish(format_event("prices", "{}"))
+    
+    assert broadcaster.subscriber_count == 0
+    assert queue.empty()
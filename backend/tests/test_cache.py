@@ -0,0 +1,109 @@
+"""
+Cache invalidation: a committed write reaches every worker's cache at once
+"""
+
+import uuid
+from sqlalchemy import delete, update
+
+from app.database import SessionLocal
+from app.models import FinancialEvent, FinancialProfile, Portfolio, Transaction, User
+from app.services.compaction import compact_ledger
+from app.services.events import EventDeckCache
+from app.services.market import reconcile_portfolios
+from app.services.summary import SummaryCache
+
+def new_student(**profile) -> int:
+    """Commit a user with a profile and a portfolio, returning their id"""
+    name = uuid.uuid4().hex[:12]
+    with SessionLocal() as session:
+        user = User(email=f"{name}@example.com", username=name, hashed_password="x")
+        session.add(user)
+        session.flush()
+        session.add_all([FinancialProfile(user_id=user.id, **profile), Portfolio(user_id=user.id)])
+        session.commit()
+        return user.id
+
+def test_summary_rebuilds_in_another_worker_after_a_ledger_write(db):
+    name = uuid.uuid4().hex[:12]
+    with SessionLocal() as session:
+        user = User(email=f"{name}@example.com", username=name, hashed_password="x")
+        session.add(user)
+        session.flush()
+        session.add(FinancialProfile(user_id=user.id, savings_balance=100.0))
+        session.commit()
+        user_id = user.id
+    
+    # Two workers, each with its own in-process cache
+    first, second = SummaryCache(16), SummaryCache(16)
+    user = db.get(User, user_id)
+    assert first.get(db, user).recent_transactions == []
+    assert second.get(db, user).recent_transactions == []
+    
+    with SessionLocal() as session:
+        session.add(Transaction(user_id=user_id, transaction_type="deposit", amount=5.0, category="income"))
+        session.commit()
+    db.rollback()
+    
+    user = db.get(User, user_id)
+    assert [row.amount for row in first.get(db, user).recent_transactions] == [5.0]
+    assert [row.amount for row in second.get(db, user).recent_transactions] == [5.0]
+
+def test_event_decks_see_committed_events_and_skip_uncommitted_ones(db):
+    decks = EventDeckCache()
+    before = len(decks.get(db, [None])[0].events)
+    
+    # Written but not committed: compiled for this session only
+    db.add(FinancialEvent(title="Windfall", event_type="bonus", probability=0.1))
+    db.flush()
+    assert len(decks.get(db, [None])[0].events) == before + 1
+    db.rollback()
+    assert len(decks.get(db, [None])[0].events) == before
+    
+    with SessionLocal() as session:
+        event = FinancialEvent(title="Windfall", event_type="bonus", probability=0.1)
+        session.add(event)
+        session.commit()
+        try:
+            db.rollback()
+            assert len(decks.get(db, [None])[0].events) == before + 1
+        finally:
+            session.execute(delete(FinancialEvent).where(FinancialEvent.id == event.id))
+            session.commit()
+    
+    db.rollback()
+    assert len(decks.get(db, [None])[0].events) == before
+
+def test_summary_rebuilds_after_account_and_bulk_writes(db):
+    user_id = new_student(weeks_played=60)
+    with SessionLocal() as session:
+        session.add(Transaction(
+            user_id=user_id, transaction_type="salary", amount=5.0, category="income", week_number=1
+        ))
+        session.commit()
+    summaries = SummaryCache(16)
+    
+    def summary():
+        db.rollback()
+        return summaries.get(db, db.get(User, user_id))
+    
+    assert summary().user.full_name is None
+    with SessionLocal() as session:
+        session.get(User, user_id).full_name = "Renamed Student"
+        session.commit()
+    assert summary().user.full_name == "Renamed Student"
+    
+    # Drift written around the cache, then repaired by one bulk UPDATE
+    with SessionLocal() as session:
+        session.execute(update(Portfolio).where(Portfolio.user_id == user_id).values(total_value=1.0))
+        session.commit()
+    assert summary().portfolio.total_value == 1.0
+    with SessionLocal() as session:
+        reconcile_portfolios(session, fix=True)
+        session.commit()
+    assert summary().portfolio.total_value == 1000.0
+    
+    # Compaction moves the week's rows into a statement with INSERT ... SELECT and a bulk DELETE
+    assert [row.amount for row in summary().recent_transactions] == [5.0]
+    with SessionLocal() as session:
+        compact_ledger(session)
+    assert [row.description for row in summary().recent_transactions] == ["Week 1 income"]
@@ -0,0 +1,38 @@
+"""
+Market time: every simulated trading day gets its own date
+"""
+
+from datetime import timedelta
+from sqlalchemy import insert, select
+
+from app.models import Stock, StockPriceHistory, StockPriceBar
+from app.services.market import advance_market, ensure_market_state, market_timestamps
+
+def test_market_dates_advance_one_trading_day_per_tick(db):
+    ensure_market_state(db)
+    
+    timestamps = market_timestamps(db, 3) + market_timestamps(db, 1) + market_timestamps(db, 1)
+    timestamps += market_timestamps(db, 7)
+    
+    assert all(timestamp.weekday() < 5 for timestamp in timestamps[1:])
+    for previous, current in zip(timestamps, timestamps[1:]):
+        assert timedelta(days=1) <= current - previous <= timedelta(days=3)
+        assert current.time() == previous.time()
+
+def test_single_day_ticks_after_a_long_run_get_their_own_bars(db):
+    db.execute(insert(Stock), [{"symbol": "CLK", "company_name": "Clock", "current_price": 10.0}])
+    stock_id = db.scalar(select(Stock.id).where(Stock.symbol == "CLK"))
+    
+    advance_market(db, days=30)
+    advance_market(db, days=1)
+    advance_market(db, days=1)
+    
+    timestamps = db.scalars(
+        select(StockPriceHistory.timestamp).where(StockPriceHistory.stock_id == stock_id)
+    ).all()
+    days = db.scalars(
+        select(StockPriceBar.period_start).where(StockPriceBar.stock_id == stock_id, StockPriceBar.interval == "day")
+    ).all()
+    assert len(timestamps) == 32
+    assert len({timestamp.date() for timestamp in timestamps}) == 32
+    assert len(days) == 32
@@ -0,0 +1,214 @@
+"""
+Schema migrations: databases built before a change upgrade in place
+"""
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, inspect, text
+import os
+import subprocess
+import sys
+import pytest
+
+from app.database import MIGRATIONS_CONFIG, BASELINE_REVISION
+from app.models import Base
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine("sqlite:///" + str(tmp_path / "upgrade.db"))
+    yield engine
+    engine.dispose()
+
+def migrate(engine, revision):
+    config = Config(MIGRATIONS_CONFIG)
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, revision)
+
+def head():
+    return ScriptDirectory.from_config(Config(MIGRATIONS_CONFIG)).get_current_head()
+
+def columns(engine, table):
+    return {column["name"] for column in inspect(engine).get_columns(table)}
+
+def test_new_database_gets_every_table_at_head(engine):
+    # A fresh interpreter, so nothing has imported the models yet
+    subprocess.run(
+        [sys.executable, "-c", "from app.database import create_db_and_tables; create_db_and_tables()"],
+        cwd=os.path.dirname(MIGRATIONS_CONFIG),
+        env={**os.environ, "DATABASE_URL": str(engine.url)},
+        check=True
+    )
+    
+    assert set(inspect(engine).get_table_names()) == set(Base.metadata.tables) | {"alembic_version"}
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT version_num FROM alembic_version")).scalar() == head()
+
+def test_migrations_build_the_schema_the_models_declare(engine):
+    migrate(engine, "head")
+    
+    with engine.connect() as connection:
+        assert compare_metadata(MigrationContext.configure(connection), Base.metadata) == []
+
+def test_database_built_before_migrations_upgrades_and_ticks(engine):
+    migrate(engine, BASELINE_REVISION)
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE alembic_version"))
+        connection.execute(text(
+            "INSERT INTO stocks (symbol, company_name, current_price, dividend_yield) "
+            "VALUES ('AIR', 'Air New Zealand', 1.5, 2.0)"
+        ))
+    
+    result = subprocess.run(
+        [sys.executable, "-c", (
+            "from app.database import SessionLocal, create_db_and_tables\n"
+            "from app.services.market import advance_market\n"
+            "create_db_and_tables()\n"
+            "with SessionLocal() as db:\n"
+            "    print(advance_market(db, days=3)['prices_recorded'])\n"
+            "    db.commit()"
+        )],
+        cwd=os.path.dirname(MIGRATIONS_CONFIG),
+        env={**os.environ, "DATABASE_URL": str(engine.url)},
+        capture_output=True, text=True, check=True
+    )
+    
+    assert result.stdout.split()[-1] == "3"
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT version_num FROM alembic_version")).scalar() == head()
+
+def test_baseline_stocks_gain_simulation_parameters(engine):
+    migrate(engine, BASELINE_REVISION)
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO stocks (symbol, company_name, current_price) VALUES ('AIR', 'Air New Zealand', 1.5)"
+        ))
+    
+    migrate(engine, "head")
+    
+    assert {"drift", "volatility"} <= columns(engine, "stocks")
+    assert "stock_price_history" in inspect(engine).get_table_names()
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT symbol, drift FROM stocks")).all() == [("AIR", None)]
+
+def test_recorded_closes_roll_into_bars(engine):
+    migrate(engine, "0002")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO stocks (symbol, company_name, current_price) VALUES ('AIR', 'Air New Zealand', 1.5)"
+        ))
+        connection.execute(text(
+            "INSERT INTO stock_price_history (stock_id, price, timestamp) VALUES "
+            "(1, 1.5, '2026-10-12 09:00:00'), (1, 1.7, '2026-10-12 15:00:00'), (1, 1.6, '2026-10-13 09:00:00')"
+        ))
+    
+    migrate(engine, "head")
+    
+    with engine.connect() as connection:
+        bars = connection.execute(text(
+            "SELECT interval, open, high, low, close FROM stock_price_bars ORDER BY interval, period_start"
+        )).all()
+    assert bars == [
+        ("day", 1.5, 1.7, 1.5, 1.7),
+        ("day", 1.6, 1.6, 1.6, 1.6),
+        ("week", 1.5, 1.7, 1.5, 1.6)
+    ]
+
+def test_duplicate_holdings_merge_before_the_unique_constraint(engine):
+    migrate(engine, "0008")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO stock_holdings (portfolio_id, stock_id, shares, average_price, current_value) VALUES "
+            "(1, 1, 2, 10.0, 24.0), (1, 1, 6, 14.0, 72.0), (1, 2, 1, 5.0, 5.0)"
+        ))
+    
+    migrate(engine, "head")
+    
+    with engine.connect() as connection:
+        rows = connection.execute(text(
+            "SELECT id, stock_id, shares, average_price, current_value FROM stock_holdings ORDER BY id"
+        )).all()
+    assert rows == [(1, 1, 8.0, 13.0, 96.0), (3, 2, 1.0, 5.0, 5.0)]
+    assert {"name": "uq_stock_holdings_portfolio_stock", "column_names": ["portfolio_id", "stock_id"]} in [
+        {key: constraint[key] for key in ("name", "column_names")}
+        for constraint in inspect(engine).get_unique_constraints("stock_holdings")
+    ]
+
+def test_portfolio_aggregates_start_from_the_holdings(engine):
+    migrate(engine, "0009")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO portfolios (user_id, cash_balance, total_value) VALUES (1, 400.0, 0.0), (2, 1000.0, 1000.0)"
+        ))
+        connection.execute(text(
+            "INSERT INTO stock_holdings (portfolio_id, stock_id, shares, average_price, current_value) VALUES "
+            "(1, 1, 2, 100.0, 250.0), (1, 2, 5, 70.0, 300.0)"
+        ))
+    
+    migrate(engine, "head")
+    
+    with engine.connect() as connection:
+        rows = connection.execute(text(
+            "SELECT market_value, cost_basis, total_value FROM portfolios ORDER BY id"
+        )).all()
+    assert rows == [(550.0, 550.0, 950.0), (0.0, 0.0, 1000.0)]
+
+def test_existing_classrooms_and_market_get_their_own_seeds(engine):
+    migrate(engine, "0019")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO users (email, username, hashed_password) VALUES ('t@example.com', 'teacher', 'x')"
+        ))
+        connection.execute(text(
+            "INSERT INTO classrooms (name, invite_code, teacher_id) VALUES ('A', 'AAAA', 1), ('B', 'BBBB', 1)"
+        ))
+        connection.execute(text("INSERT INTO market_state (id, version) VALUES (1, 3)"))
+    
+    migrate(engine, "head")
+    
+    with engine.connect() as connection:
+        seeds = connection.execute(text("SELECT simulation_seed FROM classrooms")).scalars().all()
+        market = connection.execute(text("SELECT seed, market_day FROM market_state")).one()
+    assert None not in seeds and len(set(seeds)) == 2
+    assert market.seed is not None and market.market_day == 0
+
+def test_undated_ledger_rows_join_the_week_in_progress(engine):
+    migrate(engine, "0024")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO weekly_statements "
+            "(user_id, week_number, income, tax, housing, expense, debt, investment, other, transaction_count, "
+            "created_at) VALUES (1, 1, 1000, -150, 0, 0, 0, 0, 0, 2, '2026-10-01 09:00:00')"
+        ))
+        connection.execute(text(
+            "INSERT INTO transactions (user_id, transaction_type, amount, category, week_number, created_at) VALUES "
+            "(1, 'buy', -50, 'investment', NULL, '2026-10-01 08:00:00'), "
+            "(1, 'dividend', 2, 'investment', NULL, '2026-10-01 10:00:00'), "
+            "(1, 'salary', 1000, 'income', 2, '2026-10-02 09:00:00'), "
+            "(1, 'manual', -20, NULL, NULL, '2026-10-02 09:00:00'), "
+            "(1, 'sell', 60, 'investment', NULL, '2026-10-03 09:00:00'), "
+            "(2, 'buy', -10, 'investment', NULL, '2026-10-03 09:00:00')"
+        ))
+    
+    migrate(engine, "head")
+    
+    with engine.connect() as connection:
+        weeks = connection.execute(text("SELECT week_number FROM transactions ORDER BY id")).scalars().all()
+        rollups = connection.execute(text(
+            "SELECT user_id, week_number, category, total, transaction_count FROM category_rollups "
+            "ORDER BY user_id, week_number, category"
+        )).all()
+    assert weeks == [1, 2, 2, 3, 3, 1]
+    assert rollups == [
+        (1, 1, "income", 1000.0, 1),
+        (1, 1, "investment", -50.0, 1),
+        (1, 1, "tax", -150.0, 1),
+        (1, 2, "income", 1000.0, 1),
+        (1, 2, "investment", 2.0, 1),
+        (1, 3, "investment", 60.0, 1),
+        (1, 3, "other", -20.0, 1),
+        (2, 1, "investment", -10.0, 1)
+    ]
@@ -0,0 +1,53 @@
+"""
+Batch market orders: applied together or not at all, and invalid orders are rejected up front
+"""
+
+from app.models import Portfolio, StockHolding, Transaction
+
+def order(side, stock_id=1, shares=1.0, price_per_share=100.0):
+    return {"side": side, "stock_id": stock_id, "shares": shares, "price_per_share": price_per_share}
+
+def account_of(db, headers, client):
+    user_id = client.get("/api/users/me", headers=headers).json()["id"]
+    portfolio = db.query(Portfolio).filter(Portfolio.user_id == user_id).one()
+    holdings = {
+        holding.stock_id: holding.shares
+        for holding in db.query(StockHolding).filter(StockHolding.portfolio_id == portfolio.id)
+    }
+    trades = db.query(Transaction).filter(Transaction.user_id == user_id).count()
+    return portfolio.cash_balance, holdings, trades
+
+def test_batch_applies_every_order(client, register, db):
+    headers = register()
+    
+    response = client.post("/api/stocks/orders/batch", headers=headers, json={"orders": [
+        order("buy", shares=3.0), order("buy", stock_id=2, price_per_share=50.0), order("sell", shares=1.0)
+    ]})
+    
+    assert response.status_code == 200, response.text
+    assert [transaction["transaction_type"] for transaction in response.json()] == ["buy", "buy", "sell"]
+    assert account_of(db, headers, client) == (1000.0 - 300.0 - 50.0 + 100.0, {1: 2.0, 2: 1.0}, 3)
+
+def test_rejected_order_rolls_back_the_whole_batch(client, register, db):
+    headers = register()
+    
+    response = client.post("/api/stocks/orders/batch", headers=headers, json={"orders": [
+        order("buy", shares=2.0), order("sell", stock_id=2)
+    ]})
+    
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Order 2: Insufficient shares to sell"
+    assert account_of(db, headers, client) == (1000.0, {}, 0)
+
+def test_invalid_orders_are_unprocessable(client, register, db):
+    headers = register()
+    
+    for orders in ([order("buy", shares=0.0)], [order("sell", price_per_share=-1.0)], []):
+        response = client.post("/api/stocks/orders/batch", headers=headers, json={"orders": orders})
+        assert response.status_code == 422
+    for side in ("buy", "sell"):
+        response = client.post(f"/api/stocks/{side}", headers=headers, json={
+            "transaction_type": side, "amount": 0, "stock_id": 1, "shares": -2.0, "price_per_share": 100.0
+        })
+        assert response.status_code == 422
+    assert account_of(db, headers, client) == (1000.0, {}, 0)
@@ -0,0 +1,54 @@
+"""
+Resting order triggers
+"""
+
+from sqlalchemy import insert, text
+
+from app.models import Order, Stock
+from app.services.orders import TRIGGER_QUERY_STOCKS, trigger_query, triggered_order_ids
+
+def test_triggers_across_more_stocks_than_one_query_holds(db):
+    count = TRIGGER_QUERY_STOCKS + 130
+    db.execute(insert(Stock), [
+        {"symbol": f"T{index}", "company_name": f"Trigger {index}", "current_price": 100.0}
+        for index in range(count)
+    ])
+    stock_ids = db.execute(text("SELECT id FROM stocks WHERE company_name LIKE 'Trigger %' ORDER BY id")).scalars().all()
+    
+    # Per stock: one order of each kind on either side of the day's 95-105 range
+    orders = []
+    for stock_id in stock_ids:
+        for side, order_type, crossed, missed in (
+            ("buy", "limit", 96.0, 94.0),
+            ("sell", "stop", 95.0, 90.0),
+            ("sell", "limit", 104.0, 106.0),
+            ("buy", "stop", 105.0, 110.0),
+        ):
+            for trigger_price in (crossed, missed):
+                orders.append({
+                    "user_id": 1, "portfolio_id": 1, "stock_id": stock_id, "side": side,
+                    "order_type": order_type, "shares": 1.0, "trigger_price": trigger_price, "status": "open"
+                })
+    db.execute(insert(Order), orders)
+    db.execute(text("UPDATE orders SET status = 'filled' WHERE stock_id = :stock_id"), {"stock_id": stock_ids[0]})
+    
+    order_ids = triggered_order_ids(
+        db, {stock_id: 95.0 for stock_id in stock_ids}, {stock_id: 105.0 for stock_id in stock_ids}
+    )
+    
+    expected = db.execute(text(
+        "SELECT id FROM orders WHERE status = 'open' AND trigger_price IN (96, 95, 104, 105)"
+    )).scalars().all()
+    assert len(expected) == 4 * (count - 1)
+    assert sorted(order_ids) == sorted(expected)
+
+def test_every_arm_seeks_a_trigger_price_range(db):
+    query = trigger_query({1: 95.0, 2: 40.0}, {1: 105.0, 2: 44.0})
+    sql = str(query.compile(dialect=db.bind.dialect, compile_kwargs={"literal_binds": True}))
+    plan = [row[-1] for row in db.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+    
+    searches = [detail for detail in plan if "ix_orders_open_trigger" in detail]
+    assert len(searches) == 8
+    for detail in searches:
+        assert "stock_id=? AND status=? AND side=? AND order_type=? AND trigger_price" in detail
+        assert "trigger_price>?" in detail or "trigger_price<?" in detail
@@ -0,0 +1,33 @@
+"""
+Price history ranges
+"""
+
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pytest
+
+from app.models import Stock
+from app.services.price_history import get_price_bars, record_prices
+
+@pytest.fixture
+def stock_id(db):
+    stock = Stock(symbol="HIST", company_name="History Ltd", current_price=10.0)
+    db.add(stock)
+    db.flush()
+    start = datetime(2026, 10, 1, 12)
+    record_prices(
+        db, [stock.id], [start + timedelta(days=day) for day in range(5)],
+        np.array([[10.0], [11.0], [9.0], [12.0], [10.5]])
+    )
+    return stock.id
+
+@pytest.mark.parametrize("start, end, days", [
+    (datetime(2026, 10, 2, tzinfo=timezone.utc), None, [2, 3, 4, 5]),
+    (None, datetime(2026, 10, 4, 23, tzinfo=timezone.utc), [1, 2, 3, 4]),
+    (datetime(2026, 10, 2, 13, tzinfo=timezone(timedelta(hours=13))), datetime(2026, 10, 5), [2, 3, 4, 5]),
+])
+def test_offset_bounds_compare_as_utc(db, stock_id, start, end, days):
+    resolution, bars = get_price_bars(db, stock_id, start, end)
+    
+    assert resolution == "day"
+    assert [bar["timestamp"].day for bar in bars] == days
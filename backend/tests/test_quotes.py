@@ -0,0 +1,21 @@
+"""
+Quote ETags
+"""
+
+import pytest
+
+from app.services.quotes import etag_matches, make_etag
+
+@pytest.mark.parametrize("header", [
+    '"market-7"',
+    'W/"market-7"',
+    '"market-6","market-7"',
+    '"market-6" ,  W/"market-7"',
+    '*',
+])
+def test_if_none_match_lists_the_version(header):
+    assert etag_matches(header, make_etag(7))
+
+@pytest.mark.parametrize("header", ["", '"market-6"', '"market-70"', 'market-7', '"market-6", W/"market-8"'])
+def test_if_none_match_misses_other_versions(header):
+    assert not etag_matches(header, make_etag(7))
@@ -0,0 +1,50 @@
+"""
+Ledger weeks: every write lands in the week in progress, and rollups agree with the ledger
+"""
+
+from datetime import datetime
+from sqlalchemy import func
+
+from app.models import CategoryRollup, Stock, StockPriceHistory, Transaction
+from app.services.dividends import pay_dividends
+
+def test_trades_dividends_and_manual_rows_carry_their_week(client, register, db):
+    headers = register()
+    assert client.put("/api/finance/profile", headers=headers, json={"career_id": 1}).status_code == 200
+    user_id = client.get("/api/users/me", headers=headers).json()["id"]
+    buy = {"transaction_type": "buy", "amount": 0, "stock_id": 1, "shares": 1.0, "price_per_share": 100.0}
+    
+    assert client.post("/api/stocks/buy", headers=headers, json=buy).status_code == 200
+    manual = client.post("/api/finance/transactions", headers=headers, json={
+        "transaction_type": "expense", "amount": -25.0, "category": "food"
+    })
+    assert manual.json()["week_number"] == 1
+    assert client.post("/api/finance/simulate-week", headers=headers).status_code == 200
+    assert client.post("/api/stocks/buy", headers=headers, json=buy).json()["week_number"] == 2
+    
+    paid_at = datetime(2030, 1, 2, 16, 0)
+    db.query(Stock).filter(Stock.id == 1).update({"dividend_yield": 4.0})
+    db.add(StockPriceHistory(stock_id=1, price=100.0, timestamp=paid_at))
+    db.flush()
+    assert pay_dividends(db, paid_at) > 0
+    
+    # Recorded when paid, in ledger order, rather than at the market date of the close
+    dividend = db.query(Transaction).filter(
+        Transaction.user_id == user_id, Transaction.transaction_type == "dividend"
+    ).one()
+    assert dividend.created_at < paid_at
+    
+    weeks = dict(db.query(Transaction.transaction_type, func.max(Transaction.week_number)).filter(
+        Transaction.user_id == user_id
+    ).group_by(Transaction.transaction_type).all())
+    assert (weeks["salary"], weeks["buy"], weeks["dividend"]) == (1, 2, 2)
+    assert db.query(Transaction).filter(Transaction.user_id == user_id, Transaction.week_number.is_(None)).count() == 0
+    
+    ledger = db.query(
+        Transaction.week_number, func.coalesce(Transaction.category, "other"), func.sum(Transaction.amount),
+        func.count()
+    ).filter(Transaction.user_id == user_id).group_by(Transaction.week_number, Transaction.category).all()
+    rollups = db.query(
+        CategoryRollup.week_number, CategoryRollup.category, CategoryRollup.total, CategoryRollup.transaction_count
+    ).filter(CategoryRollup.user_id == user_id).all()
+    assert sorted(rollups) == sorted(ledger)
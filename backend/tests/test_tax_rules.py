@@ -0,0 +1,31 @@
+"""
+Tax rules engine: the array form agrees with the scalar functions
+"""
+
+import numpy as np
+import pytest
+
+from app.services.tax_rules import available_tax_years, get_tax_rules
+from app.services.weekly import calculate_nz_tax, calculate_student_loan_payment
+
+def sample_incomes(rules) -> np.ndarray:
+    edges = np.concatenate([rules.upper_bounds[:-1], [0.0, rules.student_loan_threshold]])
+    random = np.random.default_rng(0).uniform(0, 300000, 500).round(2)
+    return np.concatenate([edges - 0.01, edges, edges + 0.01, random])
+
+@pytest.mark.parametrize("tax_year", available_tax_years())
+def test_array_taxes_match_the_scalar_functions(tax_year):
+    rules = get_tax_rules(tax_year)
+    incomes = sample_incomes(rules)
+    
+    assert rules.income_tax(incomes).tolist() == [calculate_nz_tax(income, tax_year) for income in incomes]
+    assert rules.student_loan_payment(1000.0, incomes).tolist() == [
+        calculate_student_loan_payment(1000.0, income, tax_year) for income in incomes
+    ]
+    assert not rules.student_loan_payment(0.0, incomes).any()
+
+def test_brackets_reproduce_the_2024_schedule():
+    incomes = np.array([14000, 48000, 70000, 180000, 200000], dtype=float)
+    
+    assert get_tax_rules(2024).income_tax(incomes) == pytest.approx([1470, 7420, 14020, 50320, 58120])
+    assert calculate_student_loan_payment(500.0, 32828.0, 2024) == pytest.approx(1200.0)
@@ -0,0 +1,101 @@
+"""
+Stress test: concurrent trades and weeks on one student never lose or overdraw balances
+"""
+
+from collections import Counter
+from fastapi.testclient import TestClient
+import threading
+
+from app.models import FinancialProfile, Portfolio, StockHolding, Transaction
+from app.services.market import reconcile_portfolios
+
+PRICE = 100.0
+
+def run_concurrently(app, headers, jobs):
+    """Run (method, path, payload) jobs, one thread and client each, released together; return statuses"""
+    barrier = threading.Barrier(len(jobs))
+    statuses = [None] * len(jobs)
+    
+    def run(index, method, path, payload):
+        client = TestClient(app)
+        barrier.wait()
+        statuses[index] = client.request(method, path, headers=headers, json=payload).status_code
+    
+    threads = [threading.Thread(target=run, args=(index, *job)) for index, job in enumerate(jobs)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return statuses
+
+def trade(side, shares=1.0):
+    return ("POST", f"/api/stocks/{side}", {
+        "transaction_type": side, "amount": 0, "stock_id": 1, "shares": shares, "price_per_share": PRICE
+    })
+
+def portfolio_of(db, headers, client):
+    user_id = client.get("/api/users/me", headers=headers).json()["id"]
+    portfolio = db.query(Portfolio).filter(Portfolio.user_id == user_id).one()
+    holding = db.query(StockHolding).filter(
+        StockHolding.portfolio_id == portfolio.id, StockHolding.stock_id == 1
+    ).one_or_none()
+    return user_id, portfolio, holding.shares if holding else 0.0
+
+def test_racing_buys_never_overdraw(app, client, register, db):
+    headers = register()
+    
+    statuses = run_concurrently(app, headers, [trade("buy")] * 16)
+    
+    # 1000 starting cash covers exactly ten buys, unless some gave up under contention (409)
+    assert set(statuses) <= {200, 400, 409}
+    bought = statuses.count(200)
+    assert bought == 10 or 409 in statuses
+    _, portfolio, shares = portfolio_of(db, headers, client)
+    assert portfolio.cash_balance == 1000.0 - PRICE * bought >= 0.0
+    assert shares == bought
+
+def test_racing_sells_never_oversell(app, client, register, db):
+    headers = register()
+    assert client.post("/api/stocks/buy", headers=headers, json=trade("buy", 4.0)[2]).status_code == 200
+    
+    statuses = run_concurrently(app, headers, [trade("sell")] * 12)
+    
+    assert set(statuses) <= {200, 400, 409}
+    sold = statuses.count(200)
+    assert sold == 4 or 409 in statuses
+    _, portfolio, shares = portfolio_of(db, headers, client)
+    assert portfolio.cash_balance == 600.0 + PRICE * sold
+    assert shares == 4 - sold >= 0.0
+
+def test_mixed_trades_and_weeks_stay_consistent(app, client, register, db):
+    headers = register()
+    assert client.put("/api/finance/profile", headers=headers, json={"career_id": 1}).status_code == 200
+    assert client.post("/api/stocks/buy", headers=headers, json=trade("buy", 3.0)[2]).status_code == 200
+    
+    jobs = [trade("buy")] * 12 + [trade("sell")] * 12 + [("POST", "/api/finance/simulate-week", None)] * 8
+    statuses = run_concurrently(app, headers, jobs)
+    
+    # Losers either fail their guard (400) or give up after retries (409); none may error
+    assert set(statuses) <= {200, 400, 409}
+    buys = statuses[:12].count(200)
+    sells = statuses[12:24].count(200)
+    weeks = statuses[24:].count(200)
+    
+    user_id, portfolio, shares = portfolio_of(db, headers, client)
+    assert portfolio.cash_balance == 1000.0 - PRICE * (3 + buys - sells)
+    assert shares == 3 + buys - sells
+    
+    profile = db.query(FinancialProfile).filter(FinancialProfile.user_id == user_id).one()
+    assert profile.weeks_played == weeks
+    ledger = Counter(
+        transaction_type for (transaction_type,) in
+        db.query(Transaction.transaction_type).filter(Transaction.user_id == user_id)
+    )
+    assert (ledger["buy"], ledger["sell"], ledger["salary"]) == (1 + buys, sells, weeks)
+    salary_weeks = db.query(Transaction.week_number).filter(
+        Transaction.user_id == user_id, Transaction.transaction_type == "salary"
+    ).order_by(Transaction.week_number)
+    assert [week_number for (week_number,) in salary_weeks] == list(range(1, weeks + 1))
+    
+    report = reconcile_portfolios(db)
+    assert not [drift for drift in report["drift"] if drift["portfolio_id"] == portfolio.id]
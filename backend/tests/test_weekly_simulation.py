@@ -0,0 +1,82 @@
+"""
+Weekly simulation draws: a student's week is the same in any batch
+"""
+
+import uuid
+import numpy as np
+import pytest
+
+from app.models import Classroom, FinancialEvent, FinancialProfile, User, classroom_members
+from app.services.events import decks_for_users
+from app.services.rng import event_uniforms, student_streams
+from app.services.weekly import simulate_profiles_week
+
+@pytest.fixture
+def classroom(db):
+    """A classroom of three students with its own event; one student is also in an earlier classroom"""
+    def user(teacher=False):
+        name = uuid.uuid4().hex[:12]
+        return User(email=f"{name}@example.com", username=name, hashed_password="x", is_teacher=teacher)
+    
+    teacher, students = user(teacher=True), [user() for _ in range(3)]
+    db.add_all([teacher, *students])
+    db.flush()
+    first, second = (
+        Classroom(name=name, teacher_id=teacher.id, simulation_seed=seed) for name, seed in (("A", 11), ("B", 22))
+    )
+    db.add_all([first, second])
+    db.flush()
+    db.execute(classroom_members.insert(), [
+        {"classroom_id": first.id, "user_id": students[0].id},
+        *({"classroom_id": second.id, "user_id": student.id} for student in students)
+    ])
+    db.add_all([
+        FinancialEvent(title="Field trip", event_type="fine", amount_min=10, amount_max=50, probability=0.5,
+                       classroom_id=first.id),
+        FinancialEvent(title="Prize", event_type="bonus", amount_min=20, amount_max=80, probability=1.0,
+                       classroom_id=second.id)
+    ])
+    profiles = [
+        FinancialProfile(
+            user_id=student.id, current_salary=60000.0, weekly_income=60000.0 / 52, student_loan_balance=500.0,
+            housing_weekly_cost=300.0, weekly_expenses=200.0, savings_balance=0.0, weeks_played=weeks,
+            total_tax_paid=0.0
+        )
+        for student, weeks in zip(students, (0, 3, 7))
+    ]
+    db.add_all(profiles)
+    db.flush()
+    return profiles
+
+def simulate(db, profiles):
+    savepoint = db.begin_nested()
+    user_ids = [profile.user_id for profile in profiles]
+    outcome = simulate_profiles_week(db, profiles, *decks_for_users(db, user_ids), student_streams(db, user_ids))
+    savepoint.rollback()
+    db.expire_all()
+    return outcome
+
+def test_classroom_week_matches_each_student_simulated_alone(db, classroom):
+    batch = simulate(db, classroom)
+    
+    for index, profile in enumerate(classroom):
+        alone = simulate(db, [profile])
+        assert alone["week"].remaining_amount[0] == batch["week"].remaining_amount[index]
+        assert alone["results"][0]["event_ids"] == batch["results"][index]["event_ids"]
+    
+    # The earlier classroom's event is only drawn by its member
+    first_event = db.query(FinancialEvent.id).filter(FinancialEvent.title == "Field trip").scalar()
+    prize = db.query(FinancialEvent.id).filter(FinancialEvent.title == "Prize").scalar()
+    assert all(prize in result["event_ids"] for result in batch["results"])
+    assert not any(first_event in result["event_ids"] for result in batch["results"][1:])
+
+def test_event_draws_do_not_depend_on_the_deck_or_run_length():
+    stream, user_id, event_ids = (7, 3), 42, [5, 9, 12]
+    
+    run = event_uniforms(stream, user_id, 4, 6, event_ids)
+    weeks = np.concatenate([event_uniforms(stream, user_id, week, 1, event_ids) for week in range(4, 10)])
+    assert np.array_equal(run, weeks)
+    
+    # A new event takes its own draws and leaves the others' alone
+    grown = event_uniforms(stream, user_id, 4, 6, [5, 7, 9, 12])
+    assert np.array_equal(grown[:, [0, 2, 3]], run)
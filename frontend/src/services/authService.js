@@ -45,6 +45,12 @@ export const authService = {
   async getCurrentUser() {
     const response = await api.get('/users/me')
     return response.data
+  },
+
+  // Profile, portfolio, recent transactions and net worth in one request
+  async getSummary() {
+    const response = await api.get('/users/me/summary')
+    return response.data
   }
 }
 
@@ -98,9 +104,36 @@ export const financeService = {
     return response.data
   },
 
+  async fastForwardWeeks(weeks, summary = false) {
+    const response = await api.post(`/finance/simulate-weeks?weeks=${weeks}&summary=${summary}`)
+    return response.data
+  },
+
+  async getProjection(weeks = 260, paths = 2000) {
+    const response = await api.get(`/finance/projection?weeks=${weeks}&paths=${paths}`)
+    return response.data
+  },
+
+  async simulateClassroomWeek(classroomId) {
+    const response = await api.post(`/finance/classrooms/${classroomId}/simulate-week`)
+    return response.data
+  },
+
+  async getBudget(weeks = 12) {
+    const response = await api.get(`/finance/budget?weeks=${weeks}`)
+    return response.data
+  },
+
   async getTransactions(limit = 50) {
     const response = await api.get(`/finance/transactions?limit=${limit}`)
     return response.data
+  },
+
+  // One page of history; pass the returned nextCursor back to fetch older rows
+  async getTransactionPage({ limit = 50, cursor, category, transactionType } = {}) {
+    const params = { limit, cursor, category, transaction_type: transactionType }
+    const response = await api.get('/finance/transactions', { params })
+    return { transactions: response.data, nextCursor: response.headers['x-next-cursor'] || null }
   }
 }
 
@@ -115,6 +148,11 @@ export const stockService = {
     return response.data
   },
 
+  async getPortfolioAnalytics() {
+    const response = await api.get('/stocks/portfolio/me/analytics')
+    return response.data
+  },
+
   async buyStock(stockData) {
     const response = await api.post('/stocks/buy', stockData)
     return response.data
@@ -128,6 +166,20 @@ export const stockService = {
   async updatePrices() {
     const response = await api.post('/stocks/update-prices')
     return response.data
+  },
+
+  // Subscribe to live price deltas; returns a function that closes the stream
+  streamPrices(onPrices, onResync) {
+    const token = localStorage.getItem('token')
+    const source = new EventSource(`${API_BASE_URL}/stocks/stream?token=${encodeURIComponent(token)}`)
+    source.addEventListener('prices', (event) => {
+      const { v, q } = JSON.parse(event.data)
+      onPrices(v, q.map(([id, current_price, daily_change, daily_change_percent]) => ({
+        id, current_price, daily_change, daily_change_percent
+      })))
+    })
+    source.addEventListener('resync', () => onResync && onResync())
+    return () => source.close()
   }
 }
 